@@ -1,29 +1,108 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
-router = APIRouter()
+from core.db_registry import get_db_registry, DatabaseError
+from core.vector_store import get_vector_store, VECTOR_STORE_BACKEND, EMBEDDING_DIMENSION
+from core.chunk_store import get_chunk_store
+from core.table_store import get_table_store
+from core.image_assets import get_image_assets
+from core.lexical import drop_lexical_index
+from core.blob_storage import get_blob_storage
+from core.answer_cache import answer_cache
+from .files import get_registry, queue_ingest
 
-DATABASES = ["DefaultDB"]
+router = APIRouter()
 
 class DBCreate(BaseModel):
     name: str
+    # Defaults: text-embedding-3-small, EMBEDDING_DIMENSION
+    embedding_model: Optional[str] = None
+    dimension: Optional[int] = None
+
+def get_entry(name: str):
+    entry = get_db_registry().get(name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Database not found")
+    return entry
 
 @router.get("/", response_model=List[str])
 def list_dbs():
-    return DATABASES
+    return get_db_registry().names()
+
+@router.get("/stats")
+def list_db_stats():
+    """Every database with its namespace, embedding model, dimension and counters."""
+    return get_db_registry().list()
 
 @router.post("/create")
 def create_db(db: DBCreate):
-    if db.name in DATABASES:
-        raise HTTPException(status_code=400, detail="Database already exists")
-    DATABASES.append(db.name)
-    # Trigger creation of folder in Drive via Queue or direct drive call
-    return {"status": "created", "name": db.name}
+    if VECTOR_STORE_BACKEND == "pinecone" and db.dimension and db.dimension != EMBEDDING_DIMENSION:
+        # All namespaces of a Pinecone index have the index's dimension
+        raise HTTPException(status_code=400, detail=f"Dimension must be {EMBEDDING_DIMENSION} with Pinecone")
+    try:
+        entry = get_db_registry().create(db.name, embedding_model=db.embedding_model, dimension=db.dimension)
+    except DatabaseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "created", "name": db.name, "database": entry}
+
+@router.get("/{name}")
+def get_db(name: str):
+    return get_entry(name)
+
+def drop_indexed_data(entry):
+    """Removes a database's vectors, chunks, tables, page images and BM25 index; other databases are not touched."""
+    name = entry["name"]
+    store = get_vector_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Vector store unavailable")
+    chunks = get_chunk_store(create=False)
+    if entry["namespace"]:
+        store.delete_namespace(entry["namespace"])
+    elif chunks:
+        # Legacy database in the shared partition: deleted file by file
+        for source in chunks.sources(name):
+            store.delete_by_source(name, source)
+    if chunks:
+        chunks.delete_db(name)
+    tables = get_table_store(create=False)
+    if tables:
+        tables.delete_db(name)
+    get_image_assets().delete_db(name)
+    drop_lexical_index(name)
+    answer_cache.invalidate_db(name)
+
+@router.delete("/{name}")
+def delete_db(name: str):
+    entry = get_entry(name)
+    drop_indexed_data(entry)
+    files = get_registry().delete_db(name)
+    # Blobs are content-addressed and may be shared with other databases
+    storage = get_blob_storage()
+    for f in files:
+        if f["storage_id"] and not get_registry().is_referenced(f["storage_id"]):
+            try:
+                storage.delete(f["storage_id"])
+            except Exception as e:
+                print(f"DEBUG: Could not delete blob {f['storage_id']}: {e}")
+    get_db_registry().delete(name)
+    return {"status": "deleted", "name": name, "files": len(files)}
+
+@router.post("/{name}/rebuild")
+def rebuild_db(name: str, ocr_lang: Optional[str] = None):
+    """
+    Drops the database's index and re-ingests its stored files into its own namespace
+    (this is also how databases from before namespaces are migrated).
+    """
+    entry = get_entry(name)
+    drop_indexed_data(entry)
+    get_db_registry().reset(name)
+    files = get_registry().list(name)
+    job_id = queue_ingest(name, files, ocr_lang)
+    return {"status": "rebuilding", "name": name, "files": len(files), "job_id": job_id}
 
 # Helper to sync DB (used by llm.py)
 async def sync_db_from_drive(db_name: str):
     print(f"Syncing {db_name} from Drive...")
     # Logic: Download ChromaDB folder zip from Drive, unzip to /tmp/chroma_db
     pass
-
@@ -45,12 +45,6 @@ def get_drive_service():
     drive = GoogleDrive(gauth)
     return drive
 
-async def upload_file_to_drive_folder(local_path, filename, db_name):
-    # Mock implementation for now as we don't have valid creds
-    # In real life: Find folder ID for db_name, upload file.
-    # Returning a fake ID for testing flow
-    return f"mock_drive_id_{filename}"
-
 class DriveAuthRequest(BaseModel):
     auth_code: str
 
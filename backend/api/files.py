@@ -1,50 +1,212 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from typing import List
-import shutil
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
 import os
-from .drive import upload_file_to_drive_folder  # We will implement this helper
+
+from core.uploads import FileRegistry, MultipartUploads, UploadError, hash_fileobj
+from core.blob_storage import get_blob_storage
+from core.db_registry import get_db_registry
+from .queue import JobCreate, FileRef, enqueue_job
 
 router = APIRouter()
 
 UPLOAD_DIR = "temp_uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Files written to blob storage (BLOB_STORAGE=local|drive) at the same time, per backend process
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+# Content hashes of stored files, used to skip re-uploads of the same content
+FILE_REGISTRY_PATH = os.getenv("FILE_REGISTRY_PATH", "file_registry.sqlite3")
+# Resumable multipart uploads keep their received parts here until completed
+MULTIPART_DIR = os.path.join(UPLOAD_DIR, "multipart")
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+_upload_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+# (db, sha256) -> future of the upload in progress, so identical files sent at the same time upload once
+_inflight = {}
+_registry = None
+_multipart = None
+
+def get_registry() -> FileRegistry:
+    global _registry
+    if _registry is None:
+        _registry = FileRegistry(FILE_REGISTRY_PATH)
+    return _registry
+
+def get_multipart() -> MultipartUploads:
+    global _multipart
+    if _multipart is None:
+        _multipart = MultipartUploads(MULTIPART_DIR)
+    return _multipart
+
+def _duplicate(filename, existing, digest):
+    print(f"DEBUG: Skipping {filename}, same content already stored as {existing['filename']}")
+    return {"filename": filename, "status": "duplicate", "storage_id": existing["storage_id"],
+            "duplicate_of": existing["filename"], **digest}
+
+async def store_content(db_name, filename, fileobj, digest):
+    """Streams fileobj to blob storage unless the same bytes are already stored in this database."""
+    key = (db_name, digest["sha256"])
+    pending = _inflight.get(key)
+    if pending is not None:
+        return _duplicate(filename, await asyncio.shield(pending), digest)
+    existing = await run_in_threadpool(get_registry().get, db_name, digest["sha256"])
+    if existing:
+        return _duplicate(filename, existing, digest)
+    if key in _inflight:  # started while we were checking the registry
+        return _duplicate(filename, await asyncio.shield(_inflight[key]), digest)
+
+    pending = _inflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        async with _upload_slots:
+            # The whole copy runs in the threadpool, never on the event loop
+            storage_id = await run_in_threadpool(get_blob_storage().put, db_name, filename, fileobj, digest["sha256"])
+        stored = await run_in_threadpool(get_registry().add, db_name, digest["sha256"], filename, digest["size"], storage_id)
+        await run_in_threadpool(count_stored_file, db_name, digest["size"])
+        pending.set_result(stored)
+    except BaseException as e:
+        pending.set_exception(e)
+        pending.exception()  # mark retrieved, waiters get it re-raised
+        raise
+    finally:
+        del _inflight[key]
+    return {"filename": filename, "status": "uploaded", "storage_id": storage_id, **digest}
+
+def count_stored_file(db_name, size):
+    registry = get_db_registry()
+    registry.ensure(db_name)
+    registry.add_files(db_name, 1, size)
+
+async def upload_one(file: UploadFile, db_name: str):
+    # The multipart form parser already spooled the file; hash it in place instead of copying it
+    digest = await run_in_threadpool(hash_fileobj, file.file)
+    return await store_content(db_name, file.filename, file.file, digest)
+
+def queue_ingest(db_name, stored_files, ocr_lang=None):
+    """Adds a job that points the worker at the stored files (content hash + storage reference)."""
+    if not stored_files:
+        return None
+    refs = [FileRef(filename=f["filename"], sha256=f["sha256"], size=f["size"], storage_id=f["storage_id"])
+            for f in stored_files]
+    job = enqueue_job(JobCreate(db=db_name, files=[f["filename"] for f in stored_files],
+                                ocr_lang=ocr_lang, file_refs=refs))
+    return job["id"]
+
 @router.post("/upload")
 async def upload_files(
     files: List[UploadFile] = File(...),
-    db_name: str = Form(...)
+    db_name: str = Form(...),
+    ocr_lang: Optional[str] = Form(None),
+    reprocess: bool = Form(False)  # also ingest files whose content is already stored
 ):
+    # Files are uploaded concurrently (at most UPLOAD_CONCURRENCY at a time)
+    results = await asyncio.gather(*(upload_one(file, db_name) for file in files), return_exceptions=True)
+
     uploaded_files_info = []
-    
-    # Ensure local temp dir exists
-    if not os.path.exists(UPLOAD_DIR):
-        os.makedirs(UPLOAD_DIR)
-
-    for file in files:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        # Save temporarily locally (on Render container)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Upload to Google Drive (Implementation dependency)
-        # We assume a specific folder structure in Drive: RAG_SYSTEM / <db_name> / raw_files
-        try:
-            drive_file_id = await upload_file_to_drive_folder(file_path, file.filename, db_name)
-            uploaded_files_info.append({
-                "filename": file.filename,
-                "drive_id": drive_file_id,
-                "local_path": file_path 
-            })
-        except Exception as e:
-            print(f"Drive Upload Error: {e}")
-            # Even if drive fails, we might want to queue it if worker can access local?
-            # No, Render is remote. Must upload to Drive.
-            raise HTTPException(status_code=500, detail=f"Failed to upload {file.filename} to Drive: {str(e)}")
-        finally:
-            # Clean up local file to save space
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-    return {"status": "success", "files": uploaded_files_info}
+    for file, result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"Storage Upload Error: {result}")
+            # Files that did upload are registered and skipped when the request is retried.
+            raise HTTPException(status_code=500, detail=f"Failed to store {file.filename}: {str(result)}")
+        uploaded_files_info.append(result)
+
+    to_ingest = [f for f in uploaded_files_info if f["status"] == "uploaded" or reprocess]
+    job_id = await run_in_threadpool(queue_ingest, db_name, to_ingest, ocr_lang)
+    return {"status": "success", "files": uploaded_files_info, "job_id": job_id}
+
+# --- Resumable multipart uploads ---
+
+class MultipartCreate(BaseModel):
+    db_name: str
+    filename: str
+    size: int
+    part_size: int = DEFAULT_PART_SIZE
+    sha256: Optional[str] = None  # if known, duplicates are detected before any byte is sent
+    ocr_lang: Optional[str] = None
+
+def _upload_error(e: UploadError):
+    status = 404 if str(e) == "Unknown upload" else 400
+    return HTTPException(status_code=status, detail=str(e))
+
+@router.post("/multipart")
+def create_multipart_upload(req: MultipartCreate):
+    if req.sha256:
+        existing = get_registry().get(req.db_name, req.sha256.lower())
+        if existing:
+            return {"status": "duplicate", "storage_id": existing["storage_id"], "duplicate_of": existing["filename"]}
+    try:
+        session = get_multipart().create(req.db_name, req.filename, req.size, req.part_size,
+                                         req.sha256.lower() if req.sha256 else None, ocr_lang=req.ocr_lang)
+    except UploadError as e:
+        raise _upload_error(e)
+    return {"status": "created", **session}
+
+@router.get("/multipart/{upload_id}")
+def get_multipart_upload(upload_id: str):
+    # Clients resume by re-sending the missing parts
+    try:
+        session = get_multipart().get(upload_id)
+        session["parts_missing"] = get_multipart().missing_parts(upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    return session
+
+@router.put("/multipart/{upload_id}/parts/{part_no}")
+async def upload_part(upload_id: str, part_no: int, request: Request):
+    # Raw request body, streamed to the part file chunk by chunk
+    try:
+        writer = await run_in_threadpool(get_multipart().part_writer, upload_id, part_no)
+        f = await run_in_threadpool(writer.__enter__)
+    except UploadError as e:
+        raise _upload_error(e)
+    size = 0
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(f.write, chunk)
+            size += len(chunk)
+    except BaseException as e:
+        await run_in_threadpool(writer.__exit__, type(e), e, e.__traceback__)
+        if isinstance(e, UploadError):
+            # Oversized part: stop reading the body right away
+            raise _upload_error(e)
+        raise
+    try:
+        await run_in_threadpool(writer.__exit__, None, None, None)
+    except UploadError as e:
+        raise _upload_error(e)
+    return {"upload_id": upload_id, "part": part_no, "size": size}
+
+@router.post("/multipart/{upload_id}/complete")
+async def complete_multipart_upload(upload_id: str):
+    uploads = get_multipart()
+    try:
+        session = await run_in_threadpool(uploads.get, upload_id)
+        digest = await run_in_threadpool(uploads.hash_content, upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    if digest["size"] != session["size"]:
+        raise HTTPException(status_code=400, detail=f"Expected {session['size']} bytes, received {digest['size']}")
+    if session["sha256"] and session["sha256"] != digest["sha256"]:
+        raise HTTPException(status_code=400, detail="Checksum mismatch")
+
+    try:
+        result = await store_content(session["db"], session["filename"], uploads.open_content(upload_id), digest)
+    except Exception as e:
+        print(f"Storage Upload Error: {e}")
+        # Parts are kept, so completing can be retried
+        raise HTTPException(status_code=500, detail=f"Failed to store {session['filename']}: {str(e)}")
+    await run_in_threadpool(uploads.abort, upload_id)
+    job_id = None
+    if result["status"] == "uploaded":
+        job_id = await run_in_threadpool(queue_ingest, session["db"], [result], session.get("ocr_lang"))
+    return {"status": "success", "file": result, "job_id": job_id}
 
+@router.delete("/multipart/{upload_id}")
+def abort_multipart_upload(upload_id: str):
+    try:
+        get_multipart().abort(upload_id)
+    except UploadError as e:
+        raise _upload_error(e)
+    return {"status": "aborted", "upload_id": upload_id}
@@ -1,17 +1,87 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+from typing import Optional
+import base64
+import json
+
+from core.image_assets import get_image_assets, ImageNameTaken, VARIANTS, ORIGINAL
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# URLs carry ?v=<etag>, so a response fetched through one can be cached for good;
+# without it (or with an old v) the client revalidates with If-None-Match
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "public, no-cache"
+
+def encode_cursor(image) -> str:
+    return base64.urlsafe_b64encode(json.dumps([image["source"], image["page"], image["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        source, page, image_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(source), int(page), str(image_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def version(entry, variant: str) -> str:
+    return get_image_assets().etag(entry, variant).strip('"')
+
+def describe(request: Request, entry):
+    def url(variant):
+        return (str(request.url_for("get_image", db_name=entry["db_name"], image_id=entry["id"], variant=variant))
+                + f"?v={version(entry, variant)}")
+    info = {k: entry[k] for k in ("id", "name", "source", "page", "width", "height", "bytes")}
+    info["url"] = url(ORIGINAL)
+    info["thumb_url"] = url("thumb")
+    info["preview_url"] = url("preview")
+    return info
+
 @router.get("/{db_name}")
-def list_extracted_images(db_name: str):
-    # In a real app, this would query a DB or list files in a specific Drive folder
-    return {
-        "images": [
-            {"id": "1", "name": f"{db_name}_page001_img001.jpg", "url": "http://placehold.it/200x200"}
-        ]
-    }
+async def list_extracted_images(request: Request, db_name: str, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None):
+    """Page images of a database in document order (one index query); next page with ?cursor=<next_cursor>."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    images = await run_in_threadpool(get_image_assets().list, db_name, limit + 1, after)
+    next_cursor = encode_cursor(images[limit - 1]) if len(images) > limit else None
+    return {"images": [describe(request, img) for img in images[:limit]], "next_cursor": next_cursor}
+
+@router.get("/{db_name}/{image_id}/{variant}", name="get_image")
+async def get_image(request: Request, db_name: str, image_id: str, variant: str, v: Optional[str] = None):
+    """
+    An image as original, preview or thumb (made on first request).
+    Strong ETag from the image content; If-None-Match answers 304, Range requests are served by FileResponse.
+    """
+    if variant != ORIGINAL and variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown variant")
+    assets = get_image_assets()
+    entry = await run_in_threadpool(assets.get, image_id)
+    if entry is None or entry["db_name"] != db_name:
+        raise HTTPException(status_code=404, detail="Image not found")
+    etag = assets.etag(entry, variant)
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE if v == etag.strip('"') else REVALIDATE_CACHE}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    try:
+        path = await run_in_threadpool(assets.variant_path, entry, variant)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image file missing")
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
 
 @router.post("/{db_name}/rename")
 def rename_image(db_name: str, old_name: str, new_name: str):
-    return {"status": "renamed", "old": old_name, "new": new_name}
-
+    """Renames an image (metadata only: the file and its URLs stay the same)."""
+    new_name = new_name.strip()
+    if not new_name:
+        raise HTTPException(status_code=400, detail="Name must not be empty")
+    try:
+        entry = get_image_assets().rename(db_name, old_name, new_name)
+    except ImageNameTaken as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return {"status": "renamed", "old": old_name, "new": new_name, "id": entry["id"]}
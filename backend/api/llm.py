@@ -6,20 +6,141 @@ import os
 import time
 import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 
-# Try importing Pinecone and OpenAI
+from core.lru import LRUCache
+from core.text import normalize_text
+from core.vector_store import get_vector_store, VECTOR_STORE_BACKEND, Match
+from core.lexical import get_lexical_index, reciprocal_rank_fusion
+from core.chunk_store import get_chunk_store
+from core.context import Candidate, select_context, unique_sources
+from core.embeddings import TokenCounter, request_dimensions
+from core.db_registry import get_db_registry
+from core.llm_gateway import LLMGateway, Provider
+from core import metrics
+from core.answer_cache import answer_cache, history_digest, ANSWER_CACHE_SIMILARITY
+
+# Try importing OpenAI
 try:
-    from pinecone import Pinecone
     import openai
 except ImportError:
     pass
 
 router = APIRouter()
 
+def env_json(name: str) -> Dict[str, Any]:
+    """JSON object from an env variable; a malformed value is logged and ignored instead of breaking startup."""
+    raw = os.getenv(name, "{}")
+    try:
+        value = json.loads(raw)
+        if not isinstance(value, dict):
+            raise ValueError("expected a JSON object")
+        return value
+    except ValueError as e:
+        print(f"DEBUG: Ignoring {name}={raw!r}: {e}")
+        return {}
+
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = "rag-system-index"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Retrieval: blocking vector store calls run in a bounded pool, off the event loop
+RETRIEVAL_THREADS = int(os.getenv("RETRIEVAL_THREADS", "8"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+
+# Hybrid retrieval: dense + BM25 candidates merged by reciprocal rank fusion
+TOP_K = 5
+SCORE_THRESHOLD = 0.70
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+
+# Context assembly: MMR over the fused candidates, near-duplicates dropped, packed into a token budget.
+# CONTEXT_TOKEN_BUDGETS overrides the budget per chat model, e.g. {"gpt-4": 6000, "gpt-3.5-turbo": 2500}
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_TOKEN_BUDGETS = env_json("CONTEXT_TOKEN_BUDGETS")
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.92"))
+
+# LLM gateway: shared clients, concurrency/token-rate limits, first-token timeout, failover and hedging.
+# LLM_FALLBACKS maps "provider/model" (or "*") to fallback "provider/model" specs, tried in order.
+# LLM_TOKENS_PER_MINUTE maps "provider/model" or "model" to a prompt token rate limit.
+LLM_PROVIDER_CONCURRENCY = int(os.getenv("LLM_PROVIDER_CONCURRENCY", "32"))
+LLM_MODEL_CONCURRENCY = int(os.getenv("LLM_MODEL_CONCURRENCY", "16"))
+LLM_TOKENS_PER_MINUTE = env_json("LLM_TOKENS_PER_MINUTE")
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "20"))
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))  # waiting for concurrency/token-rate limits
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # seconds without a token before hedging, 0 = off
+LLM_FALLBACKS = env_json("LLM_FALLBACKS")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# Query path metrics (exposed at /metrics)
+RAG_STAGE_SECONDS = metrics.histogram("rag_query_stage_seconds", "Query stage durations", ["stage"])
+QUERY_EMBEDDING_CACHE = metrics.counter("rag_query_embedding_cache_total", "Query embedding cache lookups", ["result"])
+LLM_FIRST_TOKEN_SECONDS = metrics.histogram("rag_llm_first_token_seconds", "Time to the first answer token", ["provider", "model"])
+LLM_TOKENS_PER_SECOND = metrics.histogram("rag_llm_tokens_per_second", "Answer streaming rate after the first token",
+                                          ["provider", "model"], buckets=(5, 10, 20, 40, 60, 80, 120, 160, 250, 500))
+LLM_REQUESTS = metrics.counter("rag_llm_requests_total", "Chat completions by outcome", ["provider", "model", "status"])
+
+_retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+_query_embedding_cache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+
+# Long-lived clients, created on first use and shared by all requests
+_embedding_client = None
+
+_llm_gateway = None
+
+def get_embedding_client():
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+    return _embedding_client
+
+def get_llm_gateway() -> LLMGateway:
+    global _llm_gateway
+    if _llm_gateway is None:
+        providers = {
+            "openai": Provider("openai", OPENAI_BASE_URL, OPENAI_API_KEY, LLM_PROVIDER_CONCURRENCY),
+            "openrouter": Provider("openrouter", OPENROUTER_BASE_URL, OPENROUTER_API_KEY, LLM_PROVIDER_CONCURRENCY,
+                                   # Extra headers for OpenRouter to identify the app
+                                   extra_headers={"HTTP-Referer": "https://rag-system.local", "X-Title": "RAG System"}),
+        }
+        _llm_gateway = LLMGateway(
+            providers,
+            model_concurrency=LLM_MODEL_CONCURRENCY,
+            tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+            first_token_timeout=LLM_FIRST_TOKEN_TIMEOUT,
+            idle_timeout=LLM_STREAM_IDLE_TIMEOUT,
+            queue_timeout=LLM_QUEUE_TIMEOUT,
+            hedge_after=LLM_HEDGE_AFTER,
+            fallbacks=LLM_FALLBACKS,
+        )
+    return _llm_gateway
+
+def db_entry(db_name: str) -> Optional[Dict[str, Any]]:
+    """Registry entry of a database (namespace, embedding model, dimension); None if it was never registered."""
+    return get_db_registry().get(db_name)
+
+async def embed_query(query: str, model: str = EMBEDDING_MODEL, dimension: Optional[int] = None) -> List[float]:
+    """Query embeddings are cached (LRU), repeated questions skip the embeddings API."""
+    dimensions = request_dimensions(model, dimension)
+    key = (model, dimensions, normalize_text(query))
+    vector = _query_embedding_cache.get(key)
+    if vector is None:
+        QUERY_EMBEDDING_CACHE.inc(result="miss")
+        options = {"dimensions": dimensions} if dimensions else {}
+        with RAG_STAGE_SECONDS.time(stage="query_embedding"):
+            emb_response = await get_embedding_client().embeddings.create(input=query, model=model, **options)
+        vector = emb_response.data[0].embedding
+        _query_embedding_cache.put(key, vector)
+    else:
+        QUERY_EMBEDDING_CACHE.inc(result="hit")
+    return vector
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_retrieval_pool, lambda: fn(*args, **kwargs))
 
 class ChatMessage(BaseModel):
     role: str 
@@ -41,27 +162,8 @@ async def generate_llm_response(context_text: str, context_sources: List[Dict],
     Streams response from OpenAI or OpenRouter based on provider.
     """
     
-    # 1. Configure Client based on Provider
-    api_key = None
-    base_url = None
-    
-    if provider == "openrouter":
-        api_key = OPENROUTER_API_KEY
-        base_url = "https://openrouter.ai/api/v1"
-    else:
-        # Default to OpenAI
-        api_key = OPENAI_API_KEY
-        base_url = None # Default OpenAI URL
-
-    if not api_key:
-        yield f"data: Error: Missing API Key for {provider}.\n\n"
-        yield "data: [DONE]\n\n"
-        return
-
-    client = openai.AsyncOpenAI(
-        api_key=api_key,
-        base_url=base_url
-    )
+    # 1. Provider: OpenRouter, or OpenAI by default
+    provider = "openrouter" if provider == "openrouter" else "openai"
     
     system_prompt = f"""You are a helpful RAG assistant. 
     Answer the user's question using ONLY the context below.
@@ -75,108 +177,224 @@ async def generate_llm_response(context_text: str, context_sources: List[Dict],
     for msg in history:
         messages.append({"role": msg.role, "content": msg.content})
 
+    started = time.perf_counter()
+    first_token_at = None
+    answer = []
     try:
-        # Extra headers for OpenRouter to identify the app
-        extra_headers = {}
-        if provider == "openrouter":
-            extra_headers = {
-                "HTTP-Referer": "https://rag-system.local", # Required by OpenRouter
-                "X-Title": "RAG System"
-            }
-
-        stream = await client.chat.completions.create(
-            model=model,
-            messages=messages,
-            stream=True,
-            extra_headers=extra_headers
-        )
-        
-        # Stream the answer content
-        async for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content:
-                # Clean newlines for SSE data safety
-                safe_content = content.replace("\n", "\\n")
-                yield f"data: {safe_content}\n\n"
+        # Stream the answer content (pooled client, limits, timeouts and failover in the gateway)
+        async for content in get_llm_gateway().stream_chat(provider, model, messages):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                LLM_FIRST_TOKEN_SECONDS.observe(first_token_at - started, provider=provider, model=model)
+            answer.append(content)
+            # Clean newlines for SSE data safety
+            safe_content = content.replace("\n", "\\n")
+            yield f"data: {safe_content}\n\n"
+        record_llm_stream(provider, model, first_token_at, "".join(answer))
         
         # Append Citations
         if context_sources:
             yield f"data: \\n\\n---\\n**Kaynaklar:**\\n\n\n"
             seen = set()
             for src in context_sources:
-                ref = f"• {src['source']} (Sayfa {src.get('page', '?')})"
+                ref = format_citation(src)
                 if ref not in seen:
                     yield f"data: {ref}\\n\n\n"
                     seen.add(ref)
 
     except Exception as e:
+        LLM_REQUESTS.inc(provider=provider, model=model, status="error")
         yield f"data: Error: {str(e)}\n\n"
         
     yield "data: [DONE]\n\n"
 
-def get_context_from_pinecone(query: str, db_name: str):
+def record_llm_stream(provider: str, model: str, first_token_at: Optional[float], answer: str):
+    LLM_REQUESTS.inc(provider=provider, model=model, status="ok")
+    if first_token_at is None:
+        return
+    streaming = time.perf_counter() - first_token_at
+    if streaming > 0:
+        LLM_TOKENS_PER_SECOND.observe(count_tokens(answer, model) / streaming, provider=provider, model=model)
+
+async def embed_db_query(query: str, entry: Optional[Dict[str, Any]]) -> List[float]:
+    # Embedding must match the model the worker used for this database
+    if entry is None:
+        return await embed_query(query)
+    return await embed_query(query, entry["embedding_model"], entry["dimension"])
+
+async def dense_search(query: str, db_name: str, top_k: int, entry: Optional[Dict[str, Any]] = None) -> List[Match]:
+    query_vector = await embed_db_query(query, entry)
+    # Blocking client -> bounded executor. The store (and its connection pool) is created once per process
+    index = await run_blocking(get_vector_store)
+    # Only the database's own namespace is searched; legacy databases share the default one (filtered by name)
+    namespace = entry["namespace"] if entry else None
+    search_filter = None if namespace else {"db_name": db_name}
+    # Values come back too: context assembly uses them for MMR and duplicate checks
+    with RAG_STAGE_SECONDS.time(stage="vector_search"):
+        matches = await run_blocking(index.query, query_vector, top_k=top_k, filter=search_filter,
+                                     include_values=True, namespace=namespace)
+    return [m for m in matches if m.score > SCORE_THRESHOLD]
+
+async def lexical_search(query: str, db_name: str, top_k: int) -> List[Match]:
+    """BM25 over the database's lexical index (if the worker built one where we can read it)."""
+    def search():
+        lexical = get_lexical_index(db_name, create=False)
+        if lexical is None:
+            return []
+        lexical.refresh()
+        return lexical.search(query, top_k)
+
+    with RAG_STAGE_SECONDS.time(stage="lexical_search"):
+        hits = await run_blocking(search)
+    # Text and metadata are filled in by hydrate_matches() after fusion
+    return [Match(doc_id, score, {"db_name": db_name}) for doc_id, score in hits]
+
+def hydrate_matches(matches: List[Match], namespace: Optional[str] = None) -> List[Match]:
+    """
+    Fills in chunk text and citation metadata with one batched chunk store lookup.
+    Chunks not in a chunk store we can read fall back to the text in vector metadata;
+    hits without text anywhere are dropped (they would be citations with no context).
     """
-    Retrieves relevant chunks using OpenAI Embeddings + Pinecone
+    store = get_chunk_store(create=False)
+    records = store.get_many([m.id for m in matches]) if store else {}
+    missing = [m.id for m in matches if m.id not in records and "text" not in m.metadata]
+    fetched = get_vector_store().fetch(missing, namespace=namespace) if missing else {}
+
+    hydrated, dropped = [], []
+    for m in matches:
+        if m.id in records:
+            m = Match(m.id, m.score, {**m.metadata, **records[m.id]}, m.values)
+        elif m.id in fetched:
+            m = Match(m.id, m.score, {**m.metadata, **fetched[m.id].metadata}, m.values or fetched[m.id].values)
+        if m.metadata.get("text"):
+            hydrated.append(m)
+        else:
+            dropped.append(m.id)
+    if dropped:
+        # Text only in a chunk store this process cannot read (see WORKER_VECTOR_METADATA_TEXT)
+        print(f"DEBUG: Dropped {len(dropped)} hits without chunk text, e.g. {dropped[0]}")
+    return hydrated
+
+_token_counters: Dict[str, TokenCounter] = {}
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    counter = _token_counters.get(model or "")
+    if counter is None:
+        counter = _token_counters[model or ""] = TokenCounter(model or "gpt-4")
+    return counter.count(text)
+
+def context_budget(model: Optional[str]) -> int:
+    return int(CONTEXT_TOKEN_BUDGETS.get(model or "", CONTEXT_TOKEN_BUDGET))
+
+def format_citation(src: Dict[str, Any]) -> str:
+    page, page_end = src.get('page') or '?', src.get('page_end')
+    pages = f"{page}-{page_end}" if page_end and page_end != page else f"{page}"
+    return f"• {src['source']} (Sayfa {pages})"
+
+def assemble_context(fused, model: Optional[str] = None):
+    """(match, fused score) pairs -> (context text, deduplicated sources), within the model's token budget."""
+    candidates = [Candidate(m.id, score, m.metadata, m.values) for m, score in fused]
+    chunks = select_context(
+        candidates, context_budget(model), lambda t: count_tokens(t, model),
+        mmr_lambda=MMR_LAMBDA, duplicate_threshold=DUPLICATE_THRESHOLD, max_chunks=TOP_K,
+    )
+    context_text = ""
+    for c in chunks:
+        context_text += f"---\nContent: {c.text}\nSource: {c.metadata.get('source', '')}\n"
+    return context_text, unique_sources(chunks)
+
+async def get_context_from_pinecone(query: str, db_name: str, model: Optional[str] = None):
+    """
+    Retrieves relevant chunks using OpenAI Embeddings + the configured vector store
+    (Pinecone, or the embedded local index with VECTOR_STORE=local), fused with BM25 hits
     """
     # Note: Embedding always uses OpenAI for consistency/quality, 
     # even if Chat uses OpenRouter. 
     # If you want to use OpenRouter for embedding too, you'd need a model that supports it there.
     # For now, we stick to OpenAI for embeddings as it's the most stable for RAG.
     
-    if not PINECONE_API_KEY or not OPENAI_API_KEY:
+    if not OPENAI_API_KEY or (VECTOR_STORE_BACKEND == "pinecone" and not PINECONE_API_KEY):
         return "", []
         
+    started = time.perf_counter()
     try:
-        # 1. Generate Embedding (Must match Worker's model: text-embedding-3-small)
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        
-        emb_response = client.embeddings.create(
-            input=query, 
-            model="text-embedding-3-small"
+        entry = await run_blocking(db_entry, db_name)
+        # 1. Dense and lexical search run concurrently
+        dense, lexical = await asyncio.gather(
+            dense_search(query, db_name, HYBRID_CANDIDATES, entry),
+            lexical_search(query, db_name, HYBRID_CANDIDATES),
+            return_exceptions=True
         )
-        query_vector = emb_response.data[0].embedding
+        if isinstance(dense, Exception):
+            print(f"RAG Error (dense): {dense}")
+            dense = []
+        if isinstance(lexical, Exception):
+            print(f"RAG Error (lexical): {lexical}")
+            lexical = []
 
-        # 2. Query Pinecone
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        index = pc.Index(PINECONE_INDEX_NAME)
-        
-        results = index.query(
-            vector=query_vector,
-            top_k=5,
-            include_metadata=True,
-            filter={"db_name": db_name}
-        )
-        
-        context_text = ""
-        sources = []
-        
-        for match in results.matches:
-            if match.score > 0.70: 
-                meta = match.metadata
-                context_text += f"---\nContent: {meta.get('text', '')}\nSource: {meta.get('source', '')}\n"
-                sources.append({"source": meta.get('source'), "page": meta.get('page')})
-                
-        return context_text, sources
+        # 2. Merge by reciprocal rank fusion, then load the text of the candidates only
+        fused = reciprocal_rank_fusion([dense, lexical], top_k=2 * HYBRID_CANDIDATES, with_scores=True)
+        scores = {m.id: score for m, score in fused}
+        with RAG_STAGE_SECONDS.time(stage="hydrate"):
+            hydrated = await run_blocking(hydrate_matches, [m for m, _ in fused], entry["namespace"] if entry else None)
+
+        # 3. MMR + near-duplicate suppression + token budget
+        with RAG_STAGE_SECONDS.time(stage="context_build"):
+            return await run_blocking(assemble_context, [(m, scores[m.id]) for m in hydrated], model)
 
     except Exception as e:
         print(f"RAG Error: {e}")
         return "", []
+    finally:
+        RAG_STAGE_SECONDS.observe(time.perf_counter() - started, stage="retrieval")
+
+async def replay_cached_answer(events: List[str]):
+    for event in events:
+        yield event
+
+async def record_answer(stream, db_name: str, model: str, question: str, history: str, embedding, generation: int):
+    """Passes the SSE stream through and caches it once it finished without errors."""
+    events = []
+    async for event in stream:
+        events.append(event)
+        yield event
+    if events and events[-1] == "data: [DONE]\n\n" and not any(e.startswith("data: Error") for e in events):
+        answer_cache.put(db_name, model, question, events, history=history, embedding=embedding, generation=generation)
 
 @router.post("/chat")
 async def chat_rag(request: QueryRequest):
-    # 1. Embed Query & Search Pinecone
     last_user_msg = request.messages[-1].content
-    context_text, context_sources = get_context_from_pinecone(last_user_msg, request.db_name)
+    history = history_digest([m.content for m in request.messages[:-1] if m.role == "user"])
+    cache_model = f"{request.llm_provider}/{request.llm_model}"
+
+    # 0. Answer cache: exact question first, then near-duplicates by query embedding
+    cached = answer_cache.get(request.db_name, cache_model, last_user_msg, history=history)
+    embedding = None
+    if cached is None and ANSWER_CACHE_SIMILARITY > 0 and OPENAI_API_KEY:
+        try:
+            # Same LRU-cached embedding the retrieval step uses
+            embedding = await embed_db_query(last_user_msg, await run_blocking(db_entry, request.db_name))
+            cached = answer_cache.get(request.db_name, cache_model, last_user_msg, history=history, embedding=embedding)
+        except Exception as e:
+            print(f"Answer cache lookup error: {e}")
+    if cached is not None:
+        return StreamingResponse(replay_cached_answer(cached), media_type="text/event-stream")
+
+    # 1. Embed Query & Search Pinecone
+    generation = answer_cache.generation(request.db_name)
+    context_text, context_sources = await get_context_from_pinecone(last_user_msg, request.db_name, model=request.llm_model)
     
     # 2. Stream Response
     return StreamingResponse(
-        generate_llm_response(
-            context_text, 
-            context_sources, 
-            request.messages, 
-            provider=request.llm_provider, 
-            model=request.llm_model
+        record_answer(
+            generate_llm_response(
+                context_text, 
+                context_sources, 
+                request.messages, 
+                provider=request.llm_provider, 
+                model=request.llm_model
+            ),
+            request.db_name, cache_model, last_user_msg, history, embedding, generation
         ), 
         media_type="text/event-stream"
     )
@@ -1,28 +1,61 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
 import datetime
 import json
 import os
+import time
+import base64
+import hashlib
+
+from core.queue_store import QueueStore, LeaseError
+from core.notify import ChangeSignal
+from core.answer_cache import answer_cache
+from core.db_registry import get_db_registry
 
 router = APIRouter()
 
-# Persistent Queue File
+# Persistent Queue Store (SQLite WAL). The legacy JSON file is imported once on startup.
+QUEUE_DB_PATH = os.getenv("QUEUE_DB_PATH", "queue_db.sqlite3")
 QUEUE_FILE = "queue_db.json"
 
+# Worker leases: a claimed job goes back to pending if not renewed in time
+DEFAULT_LEASE_SECONDS = int(os.getenv("QUEUE_LEASE_SECONDS", "60"))
+MAX_JOB_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+
+# Long-poll: /claim?wait=N holds the request until a job arrives (capped)
+MAX_CLAIM_WAIT_SECONDS = 30
+
+# Job listing: page size limits, and how often an idle event stream sends a keep-alive comment
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EVENTS_KEEPALIVE_SECONDS = 15
+
+# Fired whenever a job becomes pending, wakes up long-polling workers
+job_signal = ChangeSignal()
+# Fired after every job change, wakes up /events streams
+job_changes = ChangeSignal()
+
+_store = None
+
+def get_store() -> QueueStore:
+    global _store
+    if _store is None:
+        _store = QueueStore(QUEUE_DB_PATH, on_change=job_changes.notify, on_pending=job_signal.notify)
+        migrated = _store.import_json(QUEUE_FILE)
+        if migrated:
+            print(f"DEBUG: Migrated {migrated} jobs from {QUEUE_FILE}")
+    return _store
+
 def load_queue():
-    if not os.path.exists(QUEUE_FILE):
-        return []
-    try:
-        with open(QUEUE_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return []
+    return get_store().list_jobs()
 
 def save_queue(queue_data):
-    with open(QUEUE_FILE, "w") as f:
-        json.dump(queue_data, f)
+    # Kept for compatibility: upserts the given jobs instead of rewriting everything
+    get_store().upsert_jobs(queue_data)
 
 class Job(BaseModel):
     id: str
@@ -30,60 +63,208 @@ class Job(BaseModel):
     files: List[str]
     status: str  # pending, processing, completed, failed
     created_at: str
+    updated_at: Optional[str] = None
     result: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+    ocr_lang: Optional[str] = None
+    file_refs: Optional[List[Dict[str, Any]]] = None
+
+class FileRef(BaseModel):
+    # Where the worker fetches a file from: blob storage reference plus content hash (cache key)
+    filename: str
+    sha256: str
+    size: int
+    storage_id: str
 
 class JobCreate(BaseModel):
     db: str
     files: List[str]
+    ocr_lang: Optional[str] = None  # OCR language for scanned pages/images, worker default if not set
+    file_refs: Optional[List[FileRef]] = None
 
-@router.get("/", response_model=Dict[str, List[Dict]])
-def get_queue():
-    queue = load_queue()
-    print(f"DEBUG: Checking Queue. Count: {len(queue)}") # Log for debug
-    return {"jobs": queue}
+class ClaimRequest(BaseModel):
+    worker_id: str
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
 
-@router.post("/add", response_model=Job)
-def add_job(job_in: JobCreate):
-    queue = load_queue()
+class HeartbeatRequest(BaseModel):
+    worker_id: str
+    lease_seconds: int = DEFAULT_LEASE_SECONDS
+
+def encode_cursor(job: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps([job["created_at"], job["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/")
+def get_queue(request: Request, response: Response, status: Optional[str] = None, db: Optional[str] = None,
+              limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, since: Optional[int] = None,
+              order: str = "asc"):
+    """
+    Jobs, one page at a time.
+    - listing: ordered by creation (order=asc|desc), next page with ?cursor=<next_cursor>
+    - change feed: ?since=<seq> returns only jobs changed after that sequence number,
+      in change order; poll again with the returned seq
+    `seq` is the store's change sequence at the time of the call. Responses carry an ETag,
+    and If-None-Match makes an unchanged poll a 304 without touching the jobs table.
+    """
+    store = get_store()
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    seq = store.current_seq()  # read first: a change racing with the query is reported again, never lost
+    params = json.dumps([status, db, limit, cursor, since, order])
+    etag = f'W/"{seq}-{hashlib.sha1(params.encode()).hexdigest()[:12]}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+    if since is not None:
+        jobs = store.list_changes(since, status=status, db=db, limit=limit)
+        has_more = len(jobs) == limit
+        last = jobs[-1]["seq"] if jobs else since
+        return {"jobs": jobs, "seq": last if has_more else max(seq, last), "has_more": has_more}
+
+    after = decode_cursor(cursor) if cursor else None
+    jobs = store.list_page(status=status, db=db, limit=limit, after=after, descending=order == "desc")
+    next_cursor = encode_cursor(jobs[-1]) if len(jobs) == limit else None
+    print(f"DEBUG: Checking Queue. Page: {len(jobs)}") # Log for debug
+    return {"jobs": jobs, "seq": seq, "next_cursor": next_cursor}
+
+@router.get("/events")
+async def job_events(request: Request, since: Optional[int] = None, status: Optional[str] = None, db: Optional[str] = None):
+    """
+    Server-sent events: one `job` event (id = seq) per job change after `since` (or Last-Event-ID,
+    so a reconnecting EventSource resumes where it stopped). Without either, only new changes.
+    """
+    store = get_store()
+    last_event_id = request.headers.get("last-event-id")
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since is None:
+        since = await run_in_threadpool(store.current_seq)
+
+    async def stream():
+        cursor = since
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            version = job_changes.version
+            jobs = await run_in_threadpool(store.list_changes, cursor, status, db, MAX_PAGE_SIZE)
+            for job in jobs:
+                cursor = job["seq"]
+                yield f"id: {cursor}\nevent: job\ndata: {json.dumps(job)}\n\n"
+            if len(jobs) == MAX_PAGE_SIZE:
+                continue
+            if not await job_changes.wait(version, EVENTS_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def enqueue_job(job_in: JobCreate) -> Dict[str, Any]:
     new_job = {
         "id": str(uuid.uuid4()),
         "db": job_in.db,
         "files": job_in.files,
         "status": "pending",
         "created_at": datetime.datetime.now().isoformat(),
-        "result": None
+        "result": None,
+        "ocr_lang": job_in.ocr_lang,
+        "file_refs": [dict(ref) for ref in job_in.file_refs] if job_in.file_refs else None
     }
-    queue.append(new_job)
-    save_queue(queue)
+    new_job = get_store().add_job(new_job)
+    job_signal.notify()
     print(f"DEBUG: Added Job {new_job['id']} to queue.")
-    return Job(**new_job)
+    return new_job
+
+@router.post("/add", response_model=Job)
+def add_job(job_in: JobCreate):
+    return Job(**enqueue_job(job_in))
+
+def database_settings(name: str) -> Dict[str, Any]:
+    """What a worker needs to ingest into a database; sent with the claimed job."""
+    entry = get_db_registry().ensure(name)
+    return {k: entry[k] for k in ("namespace", "embedding_model", "dimension")}
+
+def record_db_stats(name: str, stats: Dict[str, Any]):
+    """Vector/chunk counts the worker counted after a job."""
+    try:
+        registry = get_db_registry()
+        registry.ensure(name)
+        registry.set_counts(name, ingested=True, vectors=stats.get("vectors"), chunks=stats.get("chunks"))
+    except Exception as e:
+        print(f"DEBUG: Could not record stats of {name}: {e}")
 
 @router.post("/update/{job_id}")
-def update_job(job_id: str, status: str, result: Optional[Dict[str, Any]] = None):
-    queue = load_queue()
-    job_found = False
-    updated_job = None
-    
-    for job in queue:
-        if job["id"] == job_id:
-            job["status"] = status
-            if result:
-                job["result"] = result
-            job_found = True
-            updated_job = job
-            break
-            
-    if job_found:
-        save_queue(queue)
+def update_job(job_id: str, status: str, result: Optional[Dict[str, Any]] = None, worker_id: Optional[str] = None):
+    try:
+        updated_job = get_store().update_job(job_id, status, result, worker_id=worker_id)
+    except LeaseError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if updated_job:
+        if status == "pending":
+            job_signal.notify()
+        elif status in ("completed", "failed"):
+            # The job upserted vectors into this database, cached chat answers may be outdated
+            answer_cache.invalidate_db(updated_job["db"])
+            if result and isinstance(result.get("db_stats"), dict):
+                record_db_stats(updated_job["db"], result["db_stats"])
         print(f"DEBUG: Updated Job {job_id} to {status}")
         return {"message": "Updated", "job": updated_job}
-        
+
     raise HTTPException(status_code=404, detail="Job not found")
 
 @router.get("/pending", response_model=List[Dict])
 def get_pending_jobs():
-    queue = load_queue()
-    pending = [job for job in queue if job["status"] == "pending"]
+    pending = get_store().list_jobs(status="pending")
     if pending:
         print(f"DEBUG: Returning {len(pending)} pending jobs to worker.")
     return pending
+
+@router.post("/claim")
+async def claim_job(req: ClaimRequest, wait: float = 0):
+    """
+    Hands out the oldest pending job under a lease. 204 when there is nothing to do.
+    With wait > 0 the request is held open until a job is added, a lease expires
+    (the job is requeued) or the wait runs out.
+    """
+    deadline = time.monotonic() + min(max(wait, 0), MAX_CLAIM_WAIT_SECONDS)
+    while True:
+        version = job_signal.version
+        job = await run_in_threadpool(get_store().claim_job, req.worker_id, req.lease_seconds, MAX_JOB_ATTEMPTS)
+        if job:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return Response(status_code=204)
+        # Expired leases are requeued by claim_job: wake up when the next one runs out
+        expiry = await run_in_threadpool(get_store().next_lease_expiry)
+        if expiry is not None:
+            remaining = min(remaining, max(expiry - time.time(), 0) + 0.05)
+        await job_signal.wait(version, remaining)
+    job["database"] = await run_in_threadpool(database_settings, job["db"])
+    print(f"DEBUG: Job {job['id']} claimed by {req.worker_id} (attempt {job['attempts']}).")
+    return job
+
+@router.post("/heartbeat/{job_id}")
+def heartbeat_job(job_id: str, req: HeartbeatRequest):
+    expires_at = get_store().heartbeat(job_id, req.worker_id, req.lease_seconds)
+    if expires_at is None:
+        raise HTTPException(status_code=409, detail="Lease lost")
+    return {"job_id": job_id, "lease_expires_at": expires_at}
+
+@router.post("/archive")
+def archive_jobs(older_than_days: int = 7, compact: bool = False):
+    """Moves completed/failed jobs older than N days out of the hot table."""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=older_than_days)).isoformat()
+    store = get_store()
+    archived = store.archive_jobs(cutoff)
+    if compact:
+        store.compact()
+    print(f"DEBUG: Archived {archived} jobs older than {older_than_days} days.")
+    return {"archived": archived, "compacted": compact}
@@ -1,10 +1,51 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import base64
+import json
+
+from core.table_store import get_table_store
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+DEFAULT_ROWS = 100
+MAX_ROWS = 1000
+
+def encode_cursor(table) -> str:
+    return base64.urlsafe_b64encode(json.dumps([table["source"], table["page"], table["table_no"]]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        source, page, table_no = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(source), int(page), int(table_no)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/{db_name}")
-def list_tables(db_name: str):
-    return {
-        "tables": []
-    }
+async def list_tables(db_name: str, source: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                      cursor: Optional[str] = None):
+    """Tables of a database in document order (header and size, no rows); next page with ?cursor=<next_cursor>."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    store = get_table_store(create=False)
+    if store is None:
+        return {"tables": [], "next_cursor": None}
+    tables = await run_in_threadpool(store.list, db_name, source, limit + 1, after)
+    next_cursor = encode_cursor(tables[limit - 1]) if len(tables) > limit else None
+    return {"tables": tables[:limit], "next_cursor": next_cursor}
 
+@router.get("/{db_name}/{table_id}")
+async def get_table(db_name: str, table_id: str, offset: int = 0, limit: int = DEFAULT_ROWS):
+    """One table with a page of its rows; next page with ?offset=<next_offset>."""
+    offset = max(offset, 0)
+    limit = max(1, min(limit, MAX_ROWS))
+    store = get_table_store(create=False)
+    table = await run_in_threadpool(store.rows, table_id, offset, limit) if store else None
+    if table is None or table["db_name"] != db_name:
+        raise HTTPException(status_code=404, detail="Table not found")
+    end = offset + len(table["rows"])
+    table["offset"] = offset
+    table["next_offset"] = end if end < table["n_rows"] else None
+    return table
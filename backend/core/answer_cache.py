@@ -0,0 +1,113 @@
+import os
+import hashlib
+import threading
+from typing import List, Optional, Tuple, Dict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.lru import LRUCache
+from core.lexical import tokenize
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and punctuation differences map to the same question."""
+    return " ".join(tokenize(question))
+
+def history_digest(previous_turns: List[str]) -> str:
+    """Earlier turns change the meaning of follow-up questions, so they are part of the key."""
+    if not previous_turns:
+        return ""
+    return hashlib.sha1("\n".join(normalize_question(t) for t in previous_turns).encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    """
+    Caches finished chat answers as the exact list of SSE events that were streamed.
+
+    Key: (db_name, model, history digest, normalized question). With an embedding, near-duplicate
+    questions (cosine >= similarity) in the same (db_name, model, history) group also hit.
+    Entries expire by TTL/LRU; invalidate_db() drops everything for a database.
+    An entry's embedding goes with it, so there are never more than maxsize embeddings
+    (or groups), however many conversations come and go.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600, similarity: float = 0.95):
+        self.similarity = similarity
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl, on_evict=self._forget)
+        # (db_name, model, history) -> {key: unit embedding}, for near-duplicate lookups
+        self._vectors: Dict[Tuple, Dict[Tuple, "np.ndarray"]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, db_name, model, question, history):
+        return (db_name, model, history, normalize_question(question))
+
+    def get(self, db_name: str, model: str, question: str, history: str = "",
+            embedding: Optional[List[float]] = None) -> Optional[List[str]]:
+        key = self._key(db_name, model, question, history)
+        events = self._lookup(key)
+        if events is not None or embedding is None or np is None or self.similarity <= 0:
+            return events
+
+        q = _unit(embedding)
+        with self._lock:
+            group = list(self._vectors.get(key[:3], {}).items())
+        best_key, best_score = None, self.similarity
+        for other_key, vec in group:
+            score = float(vec @ q)
+            if score >= best_score:
+                best_key, best_score = other_key, score
+        return self._lookup(best_key) if best_key else None
+
+    def _lookup(self, key) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, events = entry
+        if generation != self._generations.get(key[0], 0):
+            self._entries.pop(key)
+            return None
+        return events
+
+    def generation(self, db_name: str) -> int:
+        return self._generations.get(db_name, 0)
+
+    def put(self, db_name: str, model: str, question: str, events: List[str], history: str = "",
+            embedding: Optional[List[float]] = None, generation: Optional[int] = None):
+        """`generation` should be read before retrieval, so an answer built from outdated context is never stored as fresh."""
+        key = self._key(db_name, model, question, history)
+        with self._lock:
+            if generation is None:
+                generation = self._generations.get(db_name, 0)
+            if embedding is not None and np is not None:
+                self._vectors.setdefault(key[:3], {})[key] = _unit(embedding)
+        self._entries.put(key, (generation, list(events)))
+
+    def _forget(self, key, entry):
+        """The answer of `key` was evicted, expired or invalidated: its embedding goes too."""
+        with self._lock:
+            group = self._vectors.get(key[:3])
+            if group is not None:
+                group.pop(key, None)
+                if not group:
+                    del self._vectors[key[:3]]
+
+    def invalidate_db(self, db_name: str):
+        """Called when new vectors land in a database: its cached answers may be outdated."""
+        with self._lock:
+            self._generations[db_name] = self._generations.get(db_name, 0) + 1
+            for group in [g for g in self._vectors if g[0] == db_name]:
+                del self._vectors[group]
+
+def _unit(vector) -> "np.ndarray":
+    v = np.asarray(vector, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+# Process-wide cache used by the chat endpoint
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))  # 0 = exact matches only
+
+answer_cache = AnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_SIMILARITY)
@@ -0,0 +1,146 @@
+import os
+import re
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable
+
+from core.blob_storage import BlobStorage
+
+class BlobCache:
+    """
+    Size-bounded LRU read-through cache of stored files on the worker, keyed by content hash.
+
+    get() returns a local path, downloading the blob on a miss; prefetch() starts the
+    downloads of a whole job in parallel. Concurrent requests for the same hash share
+    one download. Files in use (pinned) are never evicted.
+    """
+
+    def __init__(self, path: str, storage: BlobStorage, max_bytes: int = 5 * 1024**3,
+                 download_workers: int = 4, verify: bool = True, log: Callable[[str], None] = print):
+        self.path = path
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.verify = verify
+        self.log = log
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # sha256 -> size, oldest first
+        self._size = 0
+        self._pins: Dict[str, int] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(download_workers, 1), thread_name_prefix="blob-download")
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # Resume with what is already on disk, least recently used first
+        files = []
+        for name in os.listdir(self.path):
+            full = os.path.join(self.path, name)
+            if name.endswith(".tmp"):
+                os.remove(full)
+            elif re.fullmatch(r"[0-9a-f]{64}", name):
+                st = os.stat(full)
+                files.append((st.st_atime, name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._size += size
+
+    def _file(self, sha256: str) -> str:
+        return os.path.join(self.path, sha256)
+
+    def get(self, sha256: str, ref: str) -> str:
+        """Local path of the blob with this content hash; `ref` is its storage reference."""
+        with self._lock:
+            if sha256 in self._entries and os.path.exists(self._file(sha256)):
+                self._entries.move_to_end(sha256)
+                self.hits += 1
+                return self._file(sha256)
+            future = self._inflight.get(sha256)
+            if future is None:
+                self.misses += 1
+                future = self._inflight[sha256] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return future.result()
+
+        try:
+            path = self._download(sha256, ref)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[sha256]
+
+    def _download(self, sha256: str, ref: str) -> str:
+        tmp = os.path.join(self.path, f"{sha256}.{uuid.uuid4().hex}.tmp")
+        try:
+            self.storage.get(ref, tmp)
+            if self.verify and _sha256_file(tmp) != sha256:
+                raise ValueError(f"Downloaded content does not match {sha256}")
+            os.replace(tmp, self._file(sha256))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        size = os.path.getsize(self._file(sha256))
+        with self._lock:
+            # An entry whose file was removed behind our back is replaced, not counted twice
+            self._size += size - self._entries.pop(sha256, 0)
+            self._entries[sha256] = size
+            self._evict()
+        return self._file(sha256)
+
+    def _evict(self):
+        for sha256 in list(self._entries):
+            if self._size <= self.max_bytes:
+                return
+            if self._pins.get(sha256):
+                continue
+            size = self._entries.pop(sha256)
+            self._size -= size
+            try:
+                os.remove(self._file(sha256))
+            except FileNotFoundError:
+                pass
+
+    def prefetch(self, blobs: Iterable[Dict]) -> Dict[str, Future]:
+        """Starts fetching [{"sha256", "storage_id"}...] in parallel and pins them until unpin()."""
+        futures = {}
+        for blob in blobs:
+            sha256 = blob["sha256"]
+            if sha256 in futures:
+                continue
+            with self._lock:
+                self._pins[sha256] = self._pins.get(sha256, 0) + 1
+            futures[sha256] = self._pool.submit(self.get, sha256, blob["storage_id"])
+        return futures
+
+    def unpin(self, sha256s: Iterable[str]):
+        with self._lock:
+            for sha256 in sha256s:
+                left = self._pins.get(sha256, 0) - 1
+                if left > 0:
+                    self._pins[sha256] = left
+                else:
+                    self._pins.pop(sha256, None)
+            self._evict()
+
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,205 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import BinaryIO, Callable, Dict, Optional
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def drive_quote(value: str) -> str:
+    """Escapes a value for a single-quoted string in a Drive query (database names may contain quotes)."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+class BlobNotFound(Exception):
+    """Raised when a stored file cannot be found under its reference."""
+
+class BlobStorage:
+    """
+    Where raw uploaded files live between the backend and the workers.
+    put() stores a readable stream and returns a reference (storage_id) that
+    get() accepts on any machine configured with the same backend.
+    """
+
+    name = "base"
+
+    def put(self, db_name: str, filename: str, fileobj: BinaryIO, sha256: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def get(self, ref: str, dest_path: str):
+        """Downloads the blob to dest_path."""
+        raise NotImplementedError
+
+    def exists(self, ref: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, ref: str):
+        raise NotImplementedError
+
+class LocalBlobStorage(BlobStorage):
+    """
+    Content-addressed files on a local or shared filesystem: <root>/ab/cd/<sha256>.
+    The same content is stored once, whatever its name or database.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ref: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{64}", ref):
+            raise BlobNotFound(f"Invalid blob reference: {ref}")
+        return os.path.join(self.root, ref[:2], ref[2:4], ref)
+
+    def put(self, db_name, filename, fileobj, sha256=None):
+        # Stream to a temp file in the same directory tree while hashing, then move into place
+        tmp = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as out:
+                while True:
+                    chunk = fileobj.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+            ref = digest.hexdigest()
+            if sha256 and sha256 != ref:
+                raise ValueError("Checksum mismatch while storing blob")
+            path = self.path(ref)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+            return ref
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get(self, ref, dest_path):
+        try:
+            shutil.copyfile(self.path(ref), dest_path)
+        except FileNotFoundError:
+            raise BlobNotFound(ref)
+
+    def exists(self, ref):
+        return os.path.exists(self.path(ref))
+
+    def delete(self, ref):
+        try:
+            os.remove(self.path(ref))
+        except FileNotFoundError:
+            pass
+
+class DriveBlobStorage(BlobStorage):
+    """
+    Google Drive: RAG_SYSTEM / <db_name> / raw_files / <filename>. References are Drive file ids.
+    Credentials are loaded like api/drive.py (mycreds.txt).
+    """
+
+    name = "drive"
+    FOLDER_MIME = "application/vnd.google-apps.folder"
+
+    def __init__(self, credentials_file: str = "mycreds.txt", root_folder: str = "RAG_SYSTEM"):
+        self.credentials_file = credentials_file
+        self.root_folder = root_folder
+        self._drive = None
+        self._folders: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _service(self):
+        with self._lock:
+            if self._drive is None:
+                from pydrive2.auth import GoogleAuth
+                from pydrive2.drive import GoogleDrive
+
+                gauth = GoogleAuth()
+                gauth.LoadCredentialsFile(self.credentials_file)
+                if gauth.credentials is None:
+                    raise RuntimeError(f"Drive credentials missing ({self.credentials_file})")
+                if gauth.access_token_expired:
+                    gauth.Refresh()
+                else:
+                    gauth.Authorize()
+                self._drive = GoogleDrive(gauth)
+            return self._drive
+
+    def _folder(self, title: str, parent: str) -> str:
+        key = f"{parent}/{title}"
+        with self._lock:
+            if key in self._folders:
+                return self._folders[key]
+        drive = self._service()
+        query = (f"title = '{drive_quote(title)}' and '{drive_quote(parent)}' in parents"
+                 f" and mimeType = '{self.FOLDER_MIME}' and trashed = false")
+        found = drive.ListFile({"q": query}).GetList()
+        if found:
+            folder_id = found[0]["id"]
+        else:
+            folder = drive.CreateFile({"title": title, "mimeType": self.FOLDER_MIME, "parents": [{"id": parent}]})
+            folder.Upload()
+            folder_id = folder["id"]
+        with self._lock:
+            self._folders[key] = folder_id
+        return folder_id
+
+    def put(self, db_name, filename, fileobj, sha256=None):
+        parent = self._folder("raw_files", self._folder(db_name, self._folder(self.root_folder, "root")))
+        # Drive's resumable media upload needs a seekable stream; spool anything else first
+        spooled = None
+        if not (hasattr(fileobj, "seekable") and fileobj.seekable()):
+            spooled = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+            shutil.copyfileobj(fileobj, spooled, COPY_CHUNK_SIZE)
+            spooled.seek(0)
+            fileobj = spooled
+        try:
+            meta = {"title": filename, "parents": [{"id": parent}]}
+            if sha256:
+                meta["description"] = f"sha256:{sha256}"
+            f = self._service().CreateFile(meta)
+            f.content = fileobj
+            f.Upload()
+            return f["id"]
+        finally:
+            if spooled is not None:
+                spooled.close()
+
+    def get(self, ref, dest_path):
+        try:
+            self._service().CreateFile({"id": ref}).GetContentFile(dest_path)
+        except Exception as e:
+            if "404" in str(e):
+                raise BlobNotFound(ref)
+            raise
+
+    def exists(self, ref):
+        try:
+            self._service().CreateFile({"id": ref}).FetchMetadata(fields="id")
+            return True
+        except Exception:
+            return False
+
+    def delete(self, ref):
+        self._service().CreateFile({"id": ref}).Delete()
+
+# --- Factory ---
+
+BLOB_STORAGE_BACKEND = os.getenv("BLOB_STORAGE", "local").lower()  # local | drive
+BLOB_STORAGE_PATH = os.getenv("BLOB_STORAGE_PATH", "./local_storage/blobs")
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_blob_storage(log: Callable[[str], None] = print) -> BlobStorage:
+    """Process-wide storage backend; backend and workers must use the same configuration."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if BLOB_STORAGE_BACKEND == "drive":
+                _storage = DriveBlobStorage(os.getenv("DRIVE_CREDENTIALS_FILE", "mycreds.txt"))
+            else:
+                _storage = LocalBlobStorage(BLOB_STORAGE_PATH)
+            log(f"Blob storage: {_storage.name}")
+        return _storage
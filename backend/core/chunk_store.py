@@ -0,0 +1,107 @@
+import os
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    db_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER,
+    page_end INTEGER,
+    text BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(db_name, source);
+"""
+
+class ChunkStore:
+    """
+    Chunk text and citation metadata, keyed by vector id (SQLite, zlib-compressed text).
+    Vectors only carry the filter fields; query hits are hydrated from here in one lookup.
+    """
+
+    def __init__(self, path: str, compress_level: int = 6):
+        self.path = path
+        self.compress_level = compress_level
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put_many(self, chunks: List[Dict[str, Any]]):
+        """chunks: [{"id", "text", "db_name", "source", "page", "page_end"}]; existing ids are replaced."""
+        rows = [
+            (c["id"], c["db_name"], c["source"], c.get("page"), c.get("page_end"),
+             zlib.compress(c["text"].encode("utf-8"), self.compress_level))
+            for c in chunks
+        ]
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, db_name, source, page, page_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns {id: {"text", "db_name", "source", "page", "page_end"}} for the ids that exist."""
+        found = {}
+        ids = list(dict.fromkeys(ids))
+        for start in range(0, len(ids), 500):  # stay below SQLite's variable limit
+            part = ids[start:start + 500]
+            marks = ",".join("?" for _ in part)
+            for row in self._conn().execute(f"SELECT * FROM chunks WHERE id IN ({marks})", part):
+                record = dict(row)
+                record["text"] = zlib.decompress(record["text"]).decode("utf-8")
+                found[record.pop("id")] = record
+        return found
+
+    def delete_source(self, db_name: str, source: str) -> int:
+        cur = self._conn().execute("DELETE FROM chunks WHERE db_name = ? AND source = ?", (db_name, source))
+        return cur.rowcount
+
+    def delete_db(self, db_name: str) -> int:
+        cur = self._conn().execute("DELETE FROM chunks WHERE db_name = ?", (db_name,))
+        return cur.rowcount
+
+    def sources(self, db_name: str) -> List[str]:
+        return [r[0] for r in self._conn().execute("SELECT DISTINCT source FROM chunks WHERE db_name = ?", (db_name,))]
+
+    def db_names(self) -> List[str]:
+        return [r[0] for r in self._conn().execute("SELECT DISTINCT db_name FROM chunks ORDER BY db_name")]
+
+    def count(self, db_name: Optional[str] = None) -> int:
+        if db_name:
+            return self._conn().execute("SELECT COUNT(*) FROM chunks WHERE db_name = ?", (db_name,)).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+# Shared by the worker (writes) and the backend (reads); both must see the same file
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", "./local_storage/chunk_store.sqlite3")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_chunk_store(create: bool = True) -> Optional[ChunkStore]:
+    """Returns the chunk store, or None if it does not exist yet and create is False."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if not create and not os.path.exists(CHUNK_STORE_PATH):
+                return None
+            os.makedirs(os.path.dirname(CHUNK_STORE_PATH) or ".", exist_ok=True)
+            _store = ChunkStore(CHUNK_STORE_PATH)
+        return _store
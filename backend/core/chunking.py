@@ -0,0 +1,66 @@
+import re
+from typing import Iterable, Iterator, Tuple, List, Dict, Callable
+
+# Sentence end followed by whitespace; paragraphs are separated by blank lines
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+def split_units(text: str) -> List[str]:
+    """Splits page text into paragraphs, and paragraphs into sentences."""
+    units = []
+    for para in _PARAGRAPH.split(text):
+        para = " ".join(para.split())
+        if para:
+            units.extend(s for s in _SENTENCE_END.split(para) if s)
+    return units
+
+def _split_long(unit: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Falls back to word boundaries for a single sentence longer than the budget."""
+    parts, current = [], []
+    for word in unit.split(" "):
+        if current and count_tokens(" ".join(current + [word])) > max_tokens:
+            parts.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+def chunk_pages(pages: Iterable[Tuple[int, str]], max_tokens: int = 200, overlap_tokens: int = 0,
+                count_tokens: Callable[[str], int] = lambda t: len(t) // 4 + 1) -> Iterator[Dict]:
+    """
+    Packs sentences/paragraphs from (page_number, text) pairs into chunks of at most
+    max_tokens, never cutting inside a word. Yields {"text", "page_start", "page_end"}.
+    With overlap_tokens, the trailing sentences of a chunk are repeated at the start of the next.
+    Consumes pages lazily, so only the current chunk is held in memory.
+    """
+    current: List[Tuple[int, str, int]] = []  # (page, unit, tokens)
+    current_tokens = 0
+
+    def emit():
+        return {
+            "text": " ".join(u for _, u, _ in current),
+            "page_start": current[0][0],
+            "page_end": current[-1][0],
+        }
+
+    for page_no, text in pages:
+        for unit in split_units(text or ""):
+            n = count_tokens(unit)
+            pieces = [(unit, n)] if n <= max_tokens else [(p, count_tokens(p)) for p in _split_long(unit, max_tokens, count_tokens)]
+            for piece, n in pieces:
+                if current and current_tokens + n > max_tokens:
+                    yield emit()
+                    # Carry trailing units over as overlap
+                    carried, carried_tokens = [], 0
+                    for entry in reversed(current):
+                        if carried_tokens + entry[2] > overlap_tokens or carried_tokens + entry[2] + n > max_tokens:
+                            break
+                        carried.insert(0, entry)
+                        carried_tokens += entry[2]
+                    current, current_tokens = carried, carried_tokens
+                current.append((page_no, piece, n))
+                current_tokens += n
+
+    if current:
+        yield emit()
@@ -0,0 +1,84 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from core.lexical import tokenize
+
+class Candidate:
+    """A retrieved chunk: fused relevance, text/citation metadata and (if available) its vector."""
+
+    def __init__(self, id: str, relevance: float, metadata: Dict, values: Optional[Sequence[float]] = None):
+        self.id = id
+        self.relevance = relevance
+        self.metadata = metadata
+        self.text = metadata.get("text", "")
+        self.values = _unit(values) if values is not None and np is not None else None
+        self.terms = set(tokenize(self.text))
+        self.tokens = 0
+
+    def __repr__(self):
+        return f"Candidate(id={self.id!r}, relevance={self.relevance:.4f})"
+
+def _unit(values):
+    v = np.asarray(values, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+def similarity(a: Candidate, b: Candidate) -> float:
+    """Cosine of the vectors when both have one, otherwise word-set Jaccard (lexical-only hits)."""
+    if a.values is not None and b.values is not None and a.values.shape == b.values.shape:
+        return float(a.values @ b.values)
+    if not a.terms or not b.terms:
+        return 0.0
+    return len(a.terms & b.terms) / len(a.terms | b.terms)
+
+def select_context(candidates: List[Candidate], budget_tokens: int, count_tokens: Callable[[str], int],
+                   mmr_lambda: float = 0.7, duplicate_threshold: float = 0.92,
+                   max_chunks: Optional[int] = None) -> List[Candidate]:
+    """
+    Maximal marginal relevance under a token budget:
+    picks max(lambda * relevance - (1 - lambda) * similarity to what is already picked),
+    drops candidates that are near-duplicates of a picked chunk, and skips chunks that
+    no longer fit the remaining budget. Returns the picked chunks in pick order.
+    """
+    candidates = [c for c in candidates if c.text.strip()]
+    if not candidates:
+        return []
+    top = max(c.relevance for c in candidates) or 1.0
+    for c in candidates:
+        c.tokens = count_tokens(c.text)
+
+    picked: List[Candidate] = []
+    remaining = list(candidates)
+    redundancy = {c.id: 0.0 for c in candidates}  # max similarity to any picked chunk
+    budget = budget_tokens
+    while remaining and (max_chunks is None or len(picked) < max_chunks):
+        best = max(remaining, key=lambda c: mmr_lambda * c.relevance / top - (1 - mmr_lambda) * redundancy[c.id])
+        remaining.remove(best)
+        if best.tokens > budget:
+            continue
+        picked.append(best)
+        budget -= best.tokens
+        kept = []
+        for c in remaining:
+            sim = similarity(best, c)
+            if sim >= duplicate_threshold:
+                continue  # near-duplicate of a picked chunk
+            redundancy[c.id] = max(redundancy[c.id], sim)
+            kept.append(c)
+        remaining = kept
+    return picked
+
+def unique_sources(chunks: List[Candidate]) -> List[Dict]:
+    """Citations once per (source, page span), in order of first use."""
+    seen, sources = set(), []
+    for c in chunks:
+        meta = c.metadata
+        key = (meta.get("source"), meta.get("page"), meta.get("page_end"))
+        if key not in seen:
+            seen.add(key)
+            sources.append({"source": key[0], "page": key[1], "page_end": key[2]})
+    return sources
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS databases (
+    name TEXT PRIMARY KEY,
+    namespace TEXT,
+    embedding_model TEXT NOT NULL,
+    dimension INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    vectors INTEGER NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    files INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_ingest_at TEXT
+);
+"""
+
+COUNTERS = ("vectors", "chunks", "files", "bytes")
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+class DatabaseError(Exception):
+    """Invalid registry operation (duplicate or unknown database)."""
+
+class DatabaseRegistry:
+    """
+    Persistent list of databases (SQLite) with their vector namespace, embedding model,
+    dimension and live counters.
+
+    namespace is the vector store partition of the database. It is None for databases
+    ingested before namespaces existed: their vectors are in the shared default partition
+    and queries fall back to a db_name filter until the database is rebuilt.
+
+    has_legacy_data(name) decides this for databases that are not registered yet
+    (default: never legacy).
+    """
+
+    def __init__(self, path: str, embedding_model: str = "text-embedding-3-small", dimension: int = 1536,
+                 has_legacy_data: Optional[Callable[[str], bool]] = None):
+        self.path = path
+        self.embedding_model = embedding_model
+        self.dimension = dimension
+        self.has_legacy_data = has_legacy_data or (lambda name: False)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM databases WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in self._conn().execute("SELECT * FROM databases ORDER BY created_at, name")]
+
+    def names(self) -> List[str]:
+        return [r[0] for r in self._conn().execute("SELECT name FROM databases ORDER BY created_at, name")]
+
+    def _insert(self, name, namespace, embedding_model, dimension, or_ignore=False):
+        verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+        self._conn().execute(
+            f"{verb} INTO databases (name, namespace, embedding_model, dimension, created_at) VALUES (?, ?, ?, ?, ?)",
+            (name, namespace, embedding_model or self.embedding_model, dimension or self.dimension, now_iso()),
+        )
+
+    def create(self, name: str, embedding_model: Optional[str] = None, dimension: Optional[int] = None) -> Dict[str, Any]:
+        """Registers a new database in its own namespace (named after it), or the shared one if it has legacy vectors."""
+        namespace = None if self.has_legacy_data(name) else name
+        try:
+            self._insert(name, namespace, embedding_model, dimension)
+        except sqlite3.IntegrityError:
+            raise DatabaseError("Database already exists")
+        return self.get(name)
+
+    def ensure(self, name: str, legacy: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Returns the entry of a database, registering it with the defaults if it is unknown.
+        legacy=None: checked with has_legacy_data (vectors already in the shared partition).
+        """
+        entry = self.get(name)
+        if entry is None:
+            if legacy is None:
+                legacy = self.has_legacy_data(name)
+            self._insert(name, None if legacy else name, None, None, or_ignore=True)
+            entry = self.get(name)
+        return entry
+
+    def set_counts(self, name: str, ingested: bool = False, **counts: int):
+        """Sets counters to absolute values (e.g. counted in the stores after a job)."""
+        fields = {k: int(v) for k, v in counts.items() if v is not None}
+        if set(fields) - set(COUNTERS):
+            raise ValueError(f"Unknown counters: {sorted(set(fields) - set(COUNTERS))}")
+        if ingested:
+            fields["last_ingest_at"] = now_iso()
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(f"UPDATE databases SET {assignments} WHERE name = ?", (*fields.values(), name))
+
+    def add_files(self, name: str, files: int, size: int):
+        self._conn().execute("UPDATE databases SET files = files + ?, bytes = bytes + ? WHERE name = ?",
+                             (files, size, name))
+
+    def reset(self, name: str) -> Dict[str, Any]:
+        """Empties the vector/chunk counters and moves the database into its own namespace (used by rebuilds)."""
+        cur = self._conn().execute(
+            "UPDATE databases SET namespace = name, vectors = 0, chunks = 0, last_ingest_at = NULL WHERE name = ?", (name,))
+        if not cur.rowcount:
+            raise DatabaseError("Unknown database")
+        return self.get(name)
+
+    def delete(self, name: str) -> bool:
+        return self._conn().execute("DELETE FROM databases WHERE name = ?", (name,)).rowcount > 0
+
+# Shared by the backend and the worker, like the chunk store
+DB_REGISTRY_PATH = os.getenv("DB_REGISTRY_PATH", "./local_storage/db_registry.sqlite3")
+DEFAULT_DATABASE = "DefaultDB"
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def has_shared_vectors(name: str) -> bool:
+    """
+    True if the vector store's shared partition has vectors of the database. When the store
+    cannot be asked, the database stays in the shared partition: queried with a db_name filter
+    that is always correct, where a new namespace would hide existing vectors.
+    """
+    from core.vector_store import get_vector_store
+
+    try:
+        store = get_vector_store()
+        return True if store is None else store.has_shared_vectors(name)
+    except Exception as e:
+        print(f"DEBUG: Could not look for legacy vectors of {name}: {e}")
+        return True
+
+def get_db_registry() -> DatabaseRegistry:
+    """
+    Process-wide registry. When the registry file is first created, databases that already
+    have chunks are registered without a namespace (their vectors are in the shared partition);
+    databases registered later (DefaultDB, names first seen in a job) check the vector store.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            from core.vector_store import EMBEDDING_DIMENSION
+            from core.chunk_store import get_chunk_store
+
+            os.makedirs(os.path.dirname(DB_REGISTRY_PATH) or ".", exist_ok=True)
+            fresh = not os.path.exists(DB_REGISTRY_PATH)
+            registry = DatabaseRegistry(DB_REGISTRY_PATH, embedding_model=DEFAULT_EMBEDDING_MODEL,
+                                        dimension=EMBEDDING_DIMENSION, has_legacy_data=has_shared_vectors)
+            chunks = get_chunk_store(create=False) if fresh else None
+            for name in chunks.db_names() if chunks else []:
+                registry.ensure(name, legacy=True)
+                registry.set_counts(name, chunks=chunks.count(name))
+            registry.ensure(DEFAULT_DATABASE)
+            _registry = registry
+        return _registry
@@ -0,0 +1,173 @@
+import time
+import random
+import threading
+import email.utils
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Optional: exact token counts when tiktoken is installed
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Native output size of the OpenAI embedding models; other sizes are requested with `dimensions`
+MODEL_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+def request_dimensions(model: str, dimension: Optional[int]) -> Optional[int]:
+    """The `dimensions` value to send for a model, or None when the model's native size is wanted."""
+    if not dimension or MODEL_DIMENSIONS.get(model) == dimension:
+        return None
+    return dimension
+
+class EmbeddingError(Exception):
+    pass
+
+class TokenCounter:
+    """Counts tokens with tiktoken if available, otherwise estimates ~4 characters per token."""
+
+    def __init__(self, model: str):
+        self._enc = None
+        if tiktoken is not None:
+            try:
+                self._enc = tiktoken.encoding_for_model(model)
+            except Exception:
+                self._enc = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text: str) -> int:
+        if self._enc is not None:
+            return len(self._enc.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+class EmbeddingExecutor:
+    """
+    Embeds texts through an OpenAI-compatible /embeddings endpoint.
+
+    - packs inputs into batches by token budget (and max inputs per request)
+    - runs up to `concurrency` batches at once over one pooled HTTP session
+    - retries 429/5xx/connection errors per batch with jittered exponential backoff,
+      honoring Retry-After; successful batches are never re-sent
+    """
+
+    def __init__(self, api_key: str, model: str = "text-embedding-3-small",
+                 base_url: str = "https://api.openai.com/v1", max_batch_tokens: int = 100_000,
+                 max_batch_items: int = 2048, concurrency: int = 4, max_retries: int = 6,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, timeout: float = 60.0,
+                 dimensions: Optional[int] = None, log: Optional[Callable[[str], None]] = None):
+        self.model = model
+        self.dimensions = dimensions
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.log = log or (lambda msg: None)
+        self.tokens = TokenCounter(model)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+        # Shared by all callers, so this is the global limit on in-flight requests
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+
+    def make_batches(self, texts: List[str]) -> List[List[int]]:
+        """Splits input positions into batches that fit the token and item budget."""
+        batches, current, current_tokens = [], [], 0
+        for i, text in enumerate(texts):
+            n = self.tokens.count(text)
+            if current and (current_tokens + n > self.max_batch_tokens or len(current) >= self.max_batch_items):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += n
+        if current:
+            batches.append(current)
+        return batches
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = self.make_batches(texts)
+        futures = [self._pool.submit(self._embed_batch, [texts[i] for i in batch]) for batch in batches]
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        errors = []
+        for batch, fut in zip(batches, futures):
+            try:
+                for i, vector in zip(batch, fut.result()):
+                    results[i] = vector
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise EmbeddingError(f"{len(errors)}/{len(batches)} embedding batches failed: {errors[0]}")
+        return results
+
+    def _embed_batch(self, inputs: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                with self._lock:
+                    self.requests_sent += 1
+                payload = {"input": inputs, "model": self.model}
+                if self.dimensions:
+                    payload["dimensions"] = self.dimensions
+                resp = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if resp.status_code == 200:
+                    data = sorted(resp.json()["data"], key=lambda d: d["index"])
+                    return [d["embedding"] for d in data]
+                if resp.status_code not in RETRY_STATUS:
+                    raise EmbeddingError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                error = EmbeddingError(f"HTTP {resp.status_code}")
+                retry_after = parse_retry_after(resp.headers)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            self.log(f"Embedding batch ({len(inputs)} inputs) failed: {error}. Retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter; a server-provided Retry-After is a lower bound
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, self.backoff_base)
+        return delay
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self.session.close()
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Reads retry-after-ms / Retry-After (seconds or HTTP date)."""
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
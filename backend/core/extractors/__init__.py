@@ -0,0 +1,158 @@
+"""
+Extractor registry: which module turns which file type into page texts.
+
+Entries only describe an extractor (extensions, MIME types, cost, required packages);
+the implementing module, and with it libraries like pdfplumber or PaddleOCR, is imported
+the first time the extractor is used. A worker that only ever sees .txt files never
+loads a PDF parser or an OCR model.
+
+Implementation modules provide:
+    extract(path, first_page, last_page, options) -> {"pages": [(page_number, text)], "timings": [(stage, seconds)]}
+        (the pdf extractor adds "tables": [{"page", "rows"}] when options.tables is set)
+    page_count(path) -> int          (paged formats only; used to split work into page ranges)
+"""
+import os
+import mimetypes
+import importlib
+import importlib.util
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Resource cost of loading and running an extractor
+LIGHT = "light"    # standard library only
+MEDIUM = "medium"  # a parser library, tens of MB
+HEAVY = "heavy"    # OCR models or rendering: seconds to load, hundreds of MB per process
+COSTS = (LIGHT, MEDIUM, HEAVY)
+
+class ExtractorUnavailable(Exception):
+    """No (enabled, installed) extractor for a file."""
+
+class Extractor:
+    def __init__(self, name: str, module: str, extensions: Iterable[str] = (), mime_types: Iterable[str] = (),
+                 cost: str = LIGHT, requires: Iterable[str] = (), paged: bool = False, description: str = ""):
+        if cost not in COSTS:
+            raise ValueError(f"Unknown cost {cost}")
+        self.name = name
+        self.module = module
+        self.extensions = tuple(e.lower().lstrip(".") for e in extensions)
+        self.mime_types = tuple(mime_types)
+        self.cost = cost
+        self.requires = tuple(requires)
+        self.paged = paged
+        self.description = description
+        self._impl = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Extractor({self.name!r}, cost={self.cost!r})"
+
+    @property
+    def loaded(self) -> bool:
+        return self._impl is not None
+
+    def missing(self) -> List[str]:
+        """
+        Required packages that are not installed (checked without importing them).
+        "a|b" is satisfied by either package, e.g. an OCR engine and its fallback.
+        """
+        return [r for r in self.requires if all(importlib.util.find_spec(p) is None for p in r.split("|"))]
+
+    def load(self):
+        with self._lock:
+            if self._impl is None:
+                missing = self.missing()
+                if missing:
+                    raise ExtractorUnavailable(f"Extractor '{self.name}' needs {', '.join(missing)} (not installed)")
+                self._impl = importlib.import_module(self.module)
+            return self._impl
+
+    def extract(self, path: str, first_page: int, last_page: int, options: "ExtractOptions"):
+        return self.load().extract(path, first_page, last_page, options)
+
+    def page_count(self, path: str) -> int:
+        return self.load().page_count(path) if self.paged else 1
+
+    def describe(self) -> Dict:
+        return {"name": self.name, "extensions": list(self.extensions), "mime_types": list(self.mime_types),
+                "cost": self.cost, "requires": list(self.requires), "loaded": self.loaded}
+
+class ExtractOptions:
+    """Settings passed to extract(); the worker builds them from its environment."""
+
+    def __init__(self, db_name: str = "", ocr_lang: str = "en", ocr: bool = True, ocr_min_chars: int = 50,
+                 ocr_image_area_ratio: float = 0.5, ocr_dpi: int = 200, ocr_render_threads: int = 1,
+                 save_page_image: Optional[Callable[[int, object], None]] = None, tables: bool = False, table_min_rulings: int = 3,
+                 log: Callable[[str], None] = print):
+        self.db_name = db_name
+        self.ocr_lang = ocr_lang
+        self.ocr = ocr  # False: scanned PDF pages keep their (thin) text layer
+        self.ocr_min_chars = ocr_min_chars
+        self.ocr_image_area_ratio = ocr_image_area_ratio
+        self.ocr_dpi = ocr_dpi
+        self.ocr_render_threads = ocr_render_threads
+        self.save_page_image = save_page_image  # (page_number, PIL image) of every OCR'd page, if set
+        self.tables = tables  # run the tables extractor on PDF pages with ruling lines
+        self.table_min_rulings = table_min_rulings
+        self.log = log
+
+EXTRACTORS: Dict[str, Extractor] = {}
+
+def register(extractor: Extractor) -> Extractor:
+    """Adds (or replaces) an extractor; later registrations win for shared extensions."""
+    EXTRACTORS[extractor.name] = extractor
+    return extractor
+
+def enabled_names(spec: Optional[str] = None) -> List[str]:
+    """
+    Parses WORKER_EXTRACTORS-style settings: "all" (default), or a comma separated list
+    of names, or "max:<cost>" to enable every extractor up to a cost.
+    """
+    spec = (spec or "all").strip()
+    if spec == "all":
+        return list(EXTRACTORS)
+    if spec.startswith("max:"):
+        limit = COSTS.index(spec[4:])
+        return [name for name, e in EXTRACTORS.items() if COSTS.index(e.cost) <= limit]
+    names = [n.strip() for n in spec.split(",") if n.strip()]
+    unknown = [n for n in names if n not in EXTRACTORS]
+    if unknown:
+        raise ValueError(f"Unknown extractors: {', '.join(unknown)}")
+    return names
+
+def for_file(filename: str, mime_type: Optional[str] = None, enabled: Optional[Iterable[str]] = None) -> Extractor:
+    """The extractor of a file, by extension, then by MIME type (given or guessed from the name)."""
+    candidates = [EXTRACTORS[n] for n in (enabled if enabled is not None else EXTRACTORS)]
+    ext = os.path.splitext(filename)[1].lower().lstrip(".")
+    mime_type = mime_type or mimetypes.guess_type(filename)[0]
+    for matches in (lambda e: ext and ext in e.extensions, lambda e: mime_type and mime_type in e.mime_types):
+        found = [e for e in candidates if matches(e)]
+        if found:
+            return found[-1]
+    if any(ext in e.extensions for e in EXTRACTORS.values()):
+        raise ExtractorUnavailable(f"No enabled extractor for .{ext} on this worker")
+    raise ExtractorUnavailable(f"Unsupported file type: {filename}")
+
+def uses(name: str, enabled: Optional[Iterable[str]] = None) -> bool:
+    return name in (enabled if enabled is not None else EXTRACTORS)
+
+# --- Built-in extractors ---
+
+# PaddleOCR, or pytesseract (plus the tesseract binary) for the fallback
+OCR_ENGINES = "paddleocr|pytesseract"
+
+register(Extractor("text", "core.extractors.text", extensions=("txt", "md"),
+                   mime_types=("text/plain", "text/markdown"), cost=LIGHT,
+                   description="Plain text, one page per file"))
+register(Extractor("docx", "core.extractors.word", extensions=("docx",),
+                   mime_types=("application/vnd.openxmlformats-officedocument.wordprocessingml.document",),
+                   cost=LIGHT, description="Word paragraphs and tables (document.xml, no extra packages)"))
+register(Extractor("pdf", "core.extractors.pdf", extensions=("pdf",), mime_types=("application/pdf",),
+                   cost=MEDIUM, requires=("pdfplumber",), paged=True,
+                   description="PDF text layer; pages without one go to pdf_ocr if it is enabled"))
+register(Extractor("pdf_ocr", "core.extractors.pdf_ocr", cost=HEAVY, requires=("pdf2image", OCR_ENGINES),
+                   description="Renders single PDF pages and OCRs them (PaddleOCR, Tesseract fallback)"))
+register(Extractor("image", "core.extractors.image", extensions=("jpg", "jpeg", "png"),
+                   mime_types=("image/jpeg", "image/png"), cost=HEAVY, requires=(OCR_ENGINES,),
+                   description="OCR of scanned pages and photos"))
+register(Extractor("tables", "core.extractors.tables", cost=HEAVY, requires=("camelot",),
+                   description="camelot on the PDF pages the pdf extractor detected ruled tables on"))
@@ -0,0 +1,11 @@
+import os
+import time
+
+from core import ocr
+
+def extract(path, first_page, last_page, options):
+    # Uses this process's warm engine; Tesseract fallback is logged with the reason
+    started = time.perf_counter()
+    text = ocr.ocr_page(1, path, options.ocr_lang, log=options.log, label=os.path.basename(path))["text"]
+    seconds = time.perf_counter() - started
+    return {"pages": [(1, text)], "timings": [("ocr_page", seconds), ("extract_page", seconds)]}
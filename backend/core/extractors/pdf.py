@@ -0,0 +1,89 @@
+import time
+
+import pdfplumber
+
+from core import ocr
+from core.extractors import EXTRACTORS, ExtractorUnavailable
+
+def page_count(path):
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+def page_needs_ocr(page, text, options):
+    image_areas = [abs((img["x1"] - img["x0"]) * (img["bottom"] - img["top"])) for img in page.images]
+    return ocr.needs_ocr(text, float(page.width * page.height), image_areas,
+                         min_chars=options.ocr_min_chars, image_area_ratio=options.ocr_image_area_ratio)
+
+def has_table(page, min_rulings=3):
+    """
+    Cheap table detector: a ruled (lattice) table shows up as several long horizontal rules
+    crossed by vertical ones. Reads only the page's line/rect edges, no text layout analysis.
+    """
+    width, height = float(page.width), float(page.height)
+    horizontal = sum(1 for e in page.horizontal_edges if abs(e["x1"] - e["x0"]) >= 0.15 * width)
+    if horizontal < min_rulings:
+        return False
+    vertical = sum(1 for e in page.vertical_edges if abs(e["bottom"] - e["top"]) >= 0.03 * height)
+    return vertical >= 2
+
+def _tables_extractor(options):
+    """The tables module, or None when table extraction is off or camelot is missing."""
+    if not options.tables:
+        return None
+    try:
+        return EXTRACTORS["tables"].load()
+    except ExtractorUnavailable as e:
+        options.log(f"⚠️ {e}; tables are not extracted.")
+        options.tables = False
+        return None
+
+def _ocr_extractor(options):
+    """The pdf_ocr module, or None on workers without it (pages then keep their text layer)."""
+    if not options.ocr:
+        return None
+    try:
+        return EXTRACTORS["pdf_ocr"].load()
+    except ExtractorUnavailable as e:
+        options.log(f"⚠️ {e}; scanned pages keep their text layer.")
+        options.ocr = False
+        return None
+
+def extract(path, first_page, last_page, options):
+    pages, timings, table_pages = [], [], []
+    with pdfplumber.open(path) as pdf:
+        for page_no in range(first_page, last_page + 1):
+            started = time.perf_counter()
+            page = pdf.pages[page_no - 1]
+            text = page.extract_text() or ""
+            if page_needs_ocr(page, text, options):
+                renderer = _ocr_extractor(options)
+                if renderer is not None:
+                    ocr_started = time.perf_counter()
+                    try:
+                        ocr_text = renderer.ocr_page(path, page_no, options)
+                        # Keep the text layer when OCR found less (e.g. a figure on a text page)
+                        if len(ocr_text.strip()) > len(text.strip()):
+                            text = ocr_text
+                    except Exception as e:
+                        options.log(f"OCR failed for {path} page {page_no}: {e}")
+                    timings.append(("ocr_page", time.perf_counter() - ocr_started))
+            pages.append((page_no, text))
+            if options.tables and has_table(page, options.table_min_rulings):
+                table_pages.append(page_no)
+            page.flush_cache()  # keep memory flat on large documents
+            timings.append(("extract_page", time.perf_counter() - started))
+
+    result = {"pages": pages, "timings": timings}
+    # camelot runs on the detected pages only, in this (extract pool) process
+    tables = _tables_extractor(options) if table_pages else None
+    if tables is not None:
+        started = time.perf_counter()
+        try:
+            result["tables"] = tables.extract_tables(path, table_pages)
+        except Exception as e:
+            options.log(f"Table extraction failed for {path} pages {table_pages}: {e}")
+            result["tables"] = []
+        timings.append(("table_extract", time.perf_counter() - started))
+    elif options.tables:
+        result["tables"] = []
+    return result
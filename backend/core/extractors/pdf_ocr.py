@@ -0,0 +1,19 @@
+import os
+
+from pdf2image import convert_from_path
+
+from core import ocr
+
+def ocr_page(pdf_path, page_no, options):
+    """Renders a single page (never the whole document), saves it as the page image and OCRs it."""
+    images = convert_from_path(pdf_path, dpi=options.ocr_dpi, first_page=page_no, last_page=page_no,
+                               thread_count=options.ocr_render_threads)
+    if not images:
+        return ""
+    img = images[0]
+    try:
+        if options.save_page_image:
+            options.save_page_image(page_no, img)
+        return ocr.ocr_page(page_no, img, options.ocr_lang, log=options.log, label=os.path.basename(pdf_path))["text"]
+    finally:
+        img.close()
@@ -0,0 +1,18 @@
+from typing import Dict, List
+
+import camelot
+
+def extract_tables(path: str, pages: List[int], flavor: str = "lattice") -> List[Dict]:
+    """Tables of the given pages: [{"page", "rows": [[cell, ...], ...]}]."""
+    if not pages:
+        return []
+    found = camelot.read_pdf(path, pages=",".join(str(p) for p in pages), flavor=flavor)
+    return [{"page": int(t.page), "rows": t.df.values.tolist()} for t in found]
+
+def extract(path, first_page, last_page, options):
+    """Tables as text pages (rows joined with " | "), for ingesting table-only documents."""
+    pages = []
+    for table in extract_tables(path, list(range(first_page, last_page + 1))):
+        text = "\n".join(" | ".join(str(c).strip() for c in row) for row in table["rows"])
+        pages.append((table["page"], text))
+    return {"pages": pages, "timings": []}
@@ -0,0 +1,7 @@
+import time
+
+def extract(path, first_page, last_page, options):
+    started = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return {"pages": [(1, text)], "timings": [("extract_page", time.perf_counter() - started)]}
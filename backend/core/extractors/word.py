@@ -0,0 +1,70 @@
+"""
+.docx text without python-docx: paragraphs (and table cells, row by row) are read from
+word/document.xml. Page numbers follow explicit page breaks and the breaks Word recorded
+when the file was last saved (one page per break, even when Word wrote both markers),
+so citations point at roughly the right page.
+"""
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _events(p):
+    """("text", str) and ("break", "page" | "rendered") of a paragraph, in document order."""
+    for node in p.iter():
+        if node.tag == W + "t" and node.text:
+            yield "text", node.text
+        elif node.tag == W + "tab":
+            yield "text", "\t"
+        elif node.tag == W + "br" and node.get(W + "type") == "page":
+            yield "break", "page"
+        elif node.tag == W + "lastRenderedPageBreak":
+            yield "break", "rendered"
+
+def _paragraph(p) -> str:
+    return "".join(value for kind, value in _events(p) if kind == "text")
+
+def read_pages(path):
+    with zipfile.ZipFile(path) as z:
+        root = ET.fromstring(z.read("word/document.xml"))
+    body = root.find(W + "body")
+    pages, current = [], []
+    # Word records the page start of an explicit break again as a rendered break:
+    # a rendered break with no text since the last explicit one is the same break
+    after_explicit = False
+    for block in body if body is not None else []:
+        if block.tag == W + "p":
+            parts = []
+            for kind, value in _events(block):
+                if kind == "text":
+                    parts.append(value)
+                    after_explicit = after_explicit and not value.strip()
+                    continue
+                if value == "rendered" and after_explicit:
+                    after_explicit = False
+                    continue
+                # The paragraph is split at the break: text before it stays on the old page
+                text = "".join(parts)
+                if text.strip():
+                    current.append(text)
+                parts = []
+                pages.append("\n\n".join(current))
+                current = []
+                after_explicit = value == "page"
+            text = "".join(parts)
+            if text.strip():
+                current.append(text)
+        elif block.tag == W + "tbl":
+            for row in block.iter(W + "tr"):
+                cells = [" ".join(_paragraph(p) for p in tc.iter(W + "p")).strip() for tc in row.iter(W + "tc")]
+                if any(cells):
+                    current.append(" | ".join(cells))
+                    after_explicit = False
+    pages.append("\n\n".join(current))
+    return pages
+
+def extract(path, first_page, last_page, options):
+    started = time.perf_counter()
+    pages = [(n, text) for n, text in enumerate(read_pages(path), start=1) if text.strip()]
+    return {"pages": pages, "timings": [("extract_page", time.perf_counter() - started)]}
@@ -0,0 +1,240 @@
+import os
+import re
+import uuid
+import shutil
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.text import unique_slug
+
+# Pillow makes the size variants; without it the original is served for every variant
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Variant name -> longest side in pixels ("original" is the stored render itself)
+VARIANTS = {"thumb": 256, "preview": 1024}
+ORIGINAL = "original"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id TEXT PRIMARY KEY,
+    db_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_db ON images(db_name, source, page, id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_images_name ON images(db_name, name);
+"""
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^\w.-]", "_", value)[:80]
+
+class ImageNameTaken(Exception):
+    """Another image of the database already has the name."""
+
+class ImageAssets:
+    """
+    Page images of every database: originals on disk, an SQLite index (listing a database
+    is one indexed query, not a directory scan) and cached size variants.
+
+    Originals are written once per (database, source, page); names are metadata, so a
+    rename never moves a file. Variants live under .variants/ keyed by the original's
+    content hash: a re-rendered page gets new variants and a new ETag.
+    """
+
+    def __init__(self, root: str, quality: int = 85):
+        self.root = root
+        self.quality = quality
+        self._variants_dir = os.path.join(root, ".variants")
+        os.makedirs(self._variants_dir, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Writes (worker) ---
+
+    @staticmethod
+    def image_id(db_name: str, source: str, page: int) -> str:
+        return hashlib.sha1(f"{db_name}\0{source}\0{page}".encode("utf-8")).hexdigest()[:20]
+
+    def add(self, db_name: str, source: str, page: int, image, variants: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Stores the render of a page (a PIL image, or the path of an image file) and indexes it.
+        The same page stored again replaces the file; its name is kept. `variants` are made right away.
+        """
+        image_id = self.image_id(db_name, source, page)
+        # Unique per database and page: similar names must not share a directory or overwrite a file
+        rel_path = os.path.join(unique_slug(db_name), f"{_slug(source)}_page{page:03d}_{image_id}.jpg")
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if isinstance(image, str):
+                shutil.copyfile(image, tmp)
+                size = Image.open(tmp).size if Image is not None else (None, None)
+            else:
+                image.convert("RGB").save(tmp, "JPEG", quality=self.quality)
+                size = image.size
+            sha256 = _file_sha256(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        old = self.get(image_id)
+        now = now_iso()
+        self._conn().execute(
+            """INSERT INTO images (id, db_name, name, source, page, path, sha256, width, height, bytes, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET path = excluded.path, sha256 = excluded.sha256, width = excluded.width,
+                   height = excluded.height, bytes = excluded.bytes, updated_at = excluded.updated_at""",
+            (image_id, db_name, self._free_name(db_name, f"{source}_page{page:03d}.jpg", image_id), source, page,
+             rel_path, sha256, size[0], size[1], os.path.getsize(path), now, now),
+        )
+        if old and old["sha256"] != sha256:
+            self._drop_variants(old)
+        entry = self.get(image_id)
+        for variant in variants:
+            self.variant_path(entry, variant)
+        return entry
+
+    def _free_name(self, db_name: str, name: str, image_id: str) -> str:
+        """name, or name with a counter if another image of the database already uses it."""
+        base, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while True:
+            row = self._conn().execute("SELECT id FROM images WHERE db_name = ? AND name = ?", (db_name, candidate)).fetchone()
+            if row is None or row[0] == image_id:
+                return candidate
+            n += 1
+            candidate = f"{base}_{n}{ext}"
+
+    # --- Reads ---
+
+    def get(self, image_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM images WHERE id = ?", (image_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find(self, db_name: str, name: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM images WHERE db_name = ? AND name = ?", (db_name, name)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, db_name: str, limit: int = 100, after: Optional[Tuple[str, int, str]] = None) -> List[Dict[str, Any]]:
+        """Images in document order; after = (source, page, id) of the previous page's last image."""
+        sql = "SELECT * FROM images WHERE db_name = ?"
+        params: List[Any] = [db_name]
+        if after:
+            sql += " AND (source, page, id) > (?, ?, ?)"
+            params.extend(after)
+        sql += " ORDER BY source, page, id LIMIT ?"
+        params.append(limit)
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def count(self, db_name: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM images WHERE db_name = ?", (db_name,)).fetchone()[0]
+
+    @staticmethod
+    def etag(entry: Dict[str, Any], variant: str = ORIGINAL) -> str:
+        """Strong validator: content hash of the original plus the variant (the file actually served)."""
+        if Image is None:
+            variant = ORIGINAL
+        return f'"{entry["sha256"][:32]}-{variant}"'
+
+    def variant_path(self, entry: Dict[str, Any], variant: str = ORIGINAL) -> str:
+        """File of a variant, made on first request. Without Pillow every variant is the original."""
+        original = os.path.join(self.root, entry["path"])
+        if variant == ORIGINAL or Image is None:
+            return original
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown variant {variant}")
+        path = os.path.join(self._variants_dir, f"{entry['id']}-{variant}-{entry['sha256'][:16]}.jpg")
+        if not os.path.exists(path):
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with Image.open(original) as img:
+                    img = img.convert("RGB")
+                    img.thumbnail((VARIANTS[variant], VARIANTS[variant]))
+                    img.save(tmp, "JPEG", quality=self.quality, optimize=True, progressive=True)
+                os.replace(tmp, path)  # concurrent requests write the same bytes
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return path
+
+    # --- Metadata ---
+
+    def rename(self, db_name: str, old_name: str, new_name: str) -> Optional[Dict[str, Any]]:
+        """Changes the display name only; files and URLs (by id) stay the same. None if old_name is unknown."""
+        entry = self.find(db_name, old_name)
+        if entry is None:
+            return None
+        try:
+            self._conn().execute("UPDATE images SET name = ?, updated_at = ? WHERE id = ?", (new_name, now_iso(), entry["id"]))
+        except sqlite3.IntegrityError:
+            raise ImageNameTaken(f"An image named {new_name} already exists")
+        return self.get(entry["id"])
+
+    def _drop_variants(self, entry: Dict[str, Any]):
+        for variant in VARIANTS:
+            try:
+                os.remove(os.path.join(self._variants_dir, f"{entry['id']}-{variant}-{entry['sha256'][:16]}.jpg"))
+            except FileNotFoundError:
+                pass
+
+    def delete_db(self, db_name: str) -> int:
+        entries = self.list(db_name, limit=-1)
+        for entry in entries:
+            self._drop_variants(entry)
+            # File by file: images stored before per-database directories were unique share a directory
+            try:
+                os.remove(os.path.join(self.root, entry["path"]))
+            except FileNotFoundError:
+                pass
+        self._conn().execute("DELETE FROM images WHERE db_name = ?", (db_name,))
+        shutil.rmtree(os.path.join(self.root, unique_slug(db_name)), ignore_errors=True)
+        return len(entries)
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Written by the worker at extraction time, served by the backend; both must use the same directory
+IMAGE_ASSETS_PATH = os.getenv("IMAGE_ASSETS_PATH", "./local_storage/images")
+
+_assets = None
+_assets_lock = threading.Lock()
+
+def get_image_assets() -> ImageAssets:
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            _assets = ImageAssets(IMAGE_ASSETS_PATH)
+        return _assets
@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import math
+import pickle
+import shutil
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Optional, Iterable
+
+from core.text import unique_slug
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Words, numbers and identifiers like "AB-1234", "v2.1", "12/2023"
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_TR_UPPER = str.maketrans({"I": "ı", "İ": "i"})
+
+def tokenize(text: str) -> List[str]:
+    """
+    Turkish-aware lowercasing (I -> ı, İ -> i). Compound identifiers are kept whole
+    and also split into their parts, so "AB-1234" matches both "AB-1234" and "1234".
+    """
+    tokens = []
+    for tok in _TOKEN.findall(text.translate(_TR_UPPER).lower()):
+        tokens.append(tok)
+        if not tok.isalnum():
+            tokens.extend(p for p in re.split(r"[-./]", tok) if p)
+    return tokens
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index for one database.
+
+    Posting lists are two typed arrays per term (doc numbers, term frequencies).
+    Every add/remove is appended to journal.jsonl and applied by replaying it;
+    compact() folds the journal into snapshot.pkl. Other processes pick up
+    changes with refresh(). A lock file serializes appends and compactions across
+    processes (and keeps readers out while the journal is truncated), so no append
+    can land between a snapshot write and the truncate.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: str, compact_every: int = 20_000):
+        self.path = path
+        self.compact_every = compact_every
+        self._snapshot_path = os.path.join(path, "snapshot.pkl")
+        self._journal_path = os.path.join(path, "journal.jsonl")
+        self._lock_path = os.path.join(path, "index.lock")
+        self._lock = threading.RLock()
+        self._file_lock_depth = 0
+        self._reset()
+        self._snapshot_mtime = None
+        self._journal_offset = 0
+        self.refresh()
+
+    def _reset(self):
+        self.vocab: Dict[str, int] = {}
+        self.post_docs: List[array] = []
+        self.post_tfs: List[array] = []
+        self.doc_ids: List[str] = []
+        self.doc_sources: List[str] = []
+        self.doc_len = array("I")
+        self.alive = bytearray()
+        self.id_to_doc: Dict[str, int] = {}
+        self.total_len = 0
+        self.n_live = 0
+        self._journal_entries = 0
+
+    # --- Mutations ---
+
+    def add(self, ids: List[str], texts: List[str], sources: List[str]):
+        entries = [
+            {"op": "add", "id": doc_id, "source": source, "tf": Counter(tokenize(text))}
+            for doc_id, text, source in zip(ids, texts, sources)
+        ]
+        self._commit(entries)
+
+    def remove_source(self, source: str):
+        self._commit([{"op": "remove_source", "source": source}])
+
+    def _commit(self, entries: List[dict]):
+        # Changes are applied by replaying the journal, so writes from other
+        # worker processes to the same database are applied in the same order.
+        with self._lock, self._file_lock():
+            self._append_journal(entries)
+            self.refresh()
+            if self._journal_entries >= self.compact_every:
+                self.compact()
+
+    def _apply_add(self, doc_id: str, source: str, tf: Dict[str, int]):
+        old = self.id_to_doc.get(doc_id)
+        if old is not None:
+            self._kill(old)
+        doc = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_sources.append(source)
+        length = sum(tf.values())
+        self.doc_len.append(length)
+        self.alive.append(1)
+        self.id_to_doc[doc_id] = doc
+        self.total_len += length
+        self.n_live += 1
+        for term, count in tf.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.post_docs)
+                self.post_docs.append(array("I"))
+                self.post_tfs.append(array("I"))
+            self.post_docs[term_id].append(doc)
+            self.post_tfs[term_id].append(count)
+
+    def _apply_remove_source(self, source: str) -> int:
+        removed = 0
+        for doc, (doc_source, live) in enumerate(zip(self.doc_sources, self.alive)):
+            if live and doc_source == source:
+                self._kill(doc)
+                removed += 1
+        return removed
+
+    def _kill(self, doc: int):
+        # Tombstone; postings are dropped at the next compaction
+        if self.alive[doc]:
+            self.alive[doc] = 0
+            self.total_len -= self.doc_len[doc]
+            self.n_live -= 1
+            if self.id_to_doc.get(self.doc_ids[doc]) == doc:
+                del self.id_to_doc[self.doc_ids[doc]]
+
+    # --- Persistence ---
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """
+        Cross-process lock on index.lock (flock; on Windows msvcrt, always exclusive).
+        Re-entrant within this instance; callers hold self._lock.
+        """
+        if self._file_lock_depth:
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._lock_path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass  # LK_LOCK gives up after 10 seconds; keep waiting
+            self._file_lock_depth = 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth = 0
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _append_journal(self, entries: List[dict]):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+
+    def compact(self):
+        """Rewrites the snapshot without dead documents and truncates the journal."""
+        with self._lock, self._file_lock():
+            self.refresh()  # everything appended so far goes into the snapshot
+            live = [d for d in range(len(self.doc_ids)) if self.alive[d]]
+            remap = {old: new for new, old in enumerate(live)}
+            vocab, post_docs, post_tfs = {}, [], []
+            for term, term_id in self.vocab.items():
+                docs, tfs = array("I"), array("I")
+                for d, c in zip(self.post_docs[term_id], self.post_tfs[term_id]):
+                    if d in remap:
+                        docs.append(remap[d])
+                        tfs.append(c)
+                if docs:
+                    vocab[term] = len(post_docs)
+                    post_docs.append(docs)
+                    post_tfs.append(tfs)
+            self.vocab, self.post_docs, self.post_tfs = vocab, post_docs, post_tfs
+            self.doc_ids = [self.doc_ids[d] for d in live]
+            self.doc_sources = [self.doc_sources[d] for d in live]
+            self.doc_len = array("I", (self.doc_len[d] for d in live))
+            self.alive = bytearray(b"\x01" * len(live))
+            self.id_to_doc = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._snapshot_path + ".tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump({
+                    "vocab": self.vocab, "post_docs": self.post_docs, "post_tfs": self.post_tfs,
+                    "doc_ids": self.doc_ids, "doc_sources": self.doc_sources, "doc_len": self.doc_len,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._snapshot_path)
+            open(self._journal_path, "w").close()
+            self._snapshot_mtime = os.path.getmtime(self._snapshot_path)
+            self._journal_offset = 0
+            self._journal_entries = 0
+
+    def refresh(self):
+        """Loads the snapshot if it changed, then replays new journal lines."""
+        with self._lock:
+            if not os.path.isdir(self.path):
+                if self._snapshot_mtime is not None or self._journal_offset:
+                    # Index dropped (by another process): start empty instead of resurrecting it at compaction
+                    self._reset()
+                    self._snapshot_mtime = None
+                    self._journal_offset = 0
+                return
+            with self._file_lock(shared=True):
+                self._load_changes()
+
+    def _load_changes(self):
+        """Snapshot (if it changed) and new journal lines; called with the file lock held."""
+        if os.path.exists(self._snapshot_path):
+            mtime = os.path.getmtime(self._snapshot_path)
+            if mtime != self._snapshot_mtime:
+                with open(self._snapshot_path, "rb") as f:
+                    snap = pickle.load(f)
+                self._reset()
+                self.vocab, self.post_docs, self.post_tfs = snap["vocab"], snap["post_docs"], snap["post_tfs"]
+                self.doc_ids, self.doc_sources, self.doc_len = snap["doc_ids"], snap["doc_sources"], snap["doc_len"]
+                self.alive = bytearray(b"\x01" * len(self.doc_ids))
+                self.id_to_doc = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+                self.total_len = sum(self.doc_len)
+                self.n_live = len(self.doc_ids)
+                self._snapshot_mtime = mtime
+                self._journal_offset = 0
+
+        if not os.path.exists(self._journal_path):
+            return
+        if os.path.getsize(self._journal_path) < self._journal_offset:
+            self._journal_offset = 0  # truncated by another process's compaction
+        with open(self._journal_path, "r", encoding="utf-8") as f:
+            f.seek(self._journal_offset)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break  # partially written line, read it next time
+                e = json.loads(line)
+                if e["op"] == "add":
+                    self._apply_add(e["id"], e["source"], e["tf"])
+                elif e["op"] == "remove_source":
+                    self._apply_remove_source(e["source"])
+                self._journal_entries += 1
+                self._journal_offset = f.tell()
+
+    # --- Search ---
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
+        with self._lock:
+            if not self.n_live:
+                return []
+            n_docs = len(self.doc_ids)
+            avg_len = self.total_len / self.n_live
+            alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+            doc_len = np.frombuffer(self.doc_len, dtype=np.uint32).astype(np.float32)
+            norm = self.K1 * (1 - self.B + self.B * doc_len / avg_len)
+            scores = np.zeros(n_docs, dtype=np.float32)
+
+            for term in set(tokenize(query)):
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    continue
+                docs = np.frombuffer(self.post_docs[term_id], dtype=np.uint32).astype(np.int64)
+                tfs = np.frombuffer(self.post_tfs[term_id], dtype=np.uint32).astype(np.float32)
+                live = alive[docs]
+                docs, tfs = docs[live], tfs[live]
+                df = len(docs)
+                if not df:
+                    continue
+                idf = math.log(1 + (self.n_live - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * tfs * (self.K1 + 1) / (tfs + norm[docs])
+
+            hits = np.flatnonzero(scores)
+            if not len(hits):
+                return []
+            k = min(top_k, len(hits))
+            top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self.doc_ids[d], float(scores[d])) for d in top]
+
+# --- Per-database registry ---
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "./local_storage/lexical_index")
+
+_indexes: Dict[str, BM25Index] = {}
+_indexes_lock = threading.Lock()
+
+def _index_path(db_name: str) -> str:
+    """Slug plus hash: "a b" and "a_b" must not share (or drop) one index."""
+    path = os.path.join(LEXICAL_INDEX_PATH, unique_slug(db_name))
+    # Indexes written before were named by the slug alone. Adopt one only if the slug is the name
+    # itself; otherwise it may hold another database's chunks (re-process the files to rebuild it)
+    legacy = os.path.join(LEXICAL_INDEX_PATH, db_name)
+    if re.fullmatch(r"[\w.-]+", db_name) and db_name not in (".", "..") \
+            and not os.path.isdir(path) and os.path.isdir(legacy):
+        try:
+            os.rename(legacy, path)
+        except OSError:
+            pass  # another process moved it first
+    return path
+
+def get_lexical_index(db_name: str, create: bool = True) -> Optional[BM25Index]:
+    """Returns the BM25 index of a database, or None if it has none and create is False."""
+    with _indexes_lock:
+        index = _indexes.get(db_name)
+        if index is None:
+            path = _index_path(db_name)
+            if not create and not os.path.isdir(path):
+                return None
+            index = _indexes[db_name] = BM25Index(path)
+        return index
+
+def drop_lexical_index(db_name: str):
+    """Deletes a database's BM25 index (files and the cached instance)."""
+    with _indexes_lock:
+        _indexes.pop(db_name, None)
+        shutil.rmtree(_index_path(db_name), ignore_errors=True)
+
+def reciprocal_rank_fusion(result_lists: Iterable[List], top_k: int, k: int = 60, with_scores: bool = False) -> List:
+    """
+    Merges ranked lists of hits (anything with an `id`) by RRF: score = sum 1 / (k + rank).
+    The first occurrence of each id is returned, ordered by fused score
+    (as (hit, score) pairs with with_scores=True).
+    """
+    scores, hits = {}, {}
+    for results in result_lists:
+        for rank, hit in enumerate(results):
+            scores[hit.id] = scores.get(hit.id, 0.0) + 1.0 / (k + rank + 1)
+            hits.setdefault(hit.id, hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    if with_scores:
+        return [(hits[i], scores[i]) for i in ranked]
+    return [hits[i] for i in ranked]
@@ -0,0 +1,260 @@
+import time
+import asyncio
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+
+class LLMGatewayError(Exception):
+    """Raised when no provider/model in the chain produced an answer."""
+
+class Provider:
+    """An OpenAI-compatible endpoint. One long-lived keep-alive client is shared by all requests."""
+
+    def __init__(self, name: str, base_url: Optional[str], api_key: Optional[str],
+                 max_concurrency: int = 32, extra_headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.extra_headers = extra_headers or {}
+        self._client = None
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        if self._client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+                # Stalls are detected by the gateway's first-token / idle timeouts
+                timeout=httpx.Timeout(10.0, read=None),
+            )
+            # Retries are replaced by failover to the next model in the chain
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                              http_client=http_client, max_retries=0)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+class TokenBucket:
+    """Token-rate limit (tokens per minute). acquire() waits until the budget allows the request."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(len(m.get("content") or "") // 4 + 4 for m in messages)
+
+class _Attempt:
+    """One streaming call to (provider, model); holds its concurrency slots until closed."""
+
+    def __init__(self, gateway: "LLMGateway", provider: Provider, model: str, messages: List[Dict[str, str]]):
+        self.gateway = gateway
+        self.provider = provider
+        self.model = model
+        self.messages = messages
+        self.label = f"{provider.name}/{model}"
+        self._stack = AsyncExitStack()
+        self._stream = None
+        self._iter = None
+
+    async def acquire(self):
+        """Waits for the concurrency slots and the token budget."""
+        gw = self.gateway
+        await self._stack.enter_async_context(gw._semaphore(self.provider.name, None))
+        await self._stack.enter_async_context(gw._semaphore(self.provider.name, self.model))
+        bucket = gw._bucket(self.provider.name, self.model)
+        if bucket is not None:
+            await bucket.acquire(estimate_tokens(self.messages))
+
+    async def start(self) -> str:
+        """Opens the stream (limits already acquired) and returns the first text delta."""
+        self._stream = await self.provider.client.chat.completions.create(
+            model=self.model, messages=self.messages, stream=True,
+            extra_headers=self.provider.extra_headers or None,
+        )
+        self._iter = self._stream.__aiter__()
+        return await self._next_text() or ""
+
+    async def _next_text(self) -> Optional[str]:
+        """Next non-empty text delta, None at the end of the stream."""
+        while True:
+            try:
+                chunk = await self._iter.__anext__()
+            except StopAsyncIteration:
+                return None
+            if chunk.choices and chunk.choices[0].delta.content:
+                return chunk.choices[0].delta.content
+
+    async def rest(self) -> AsyncIterator[str]:
+        """Remaining deltas; a stall longer than the idle timeout ends the stream with an error."""
+        while True:
+            try:
+                text = await asyncio.wait_for(self._next_text(), self.gateway.idle_timeout)
+            except asyncio.TimeoutError:
+                raise LLMGatewayError(f"{self.label} stalled for {self.gateway.idle_timeout:.0f}s")
+            if text is None:
+                return
+            yield text
+
+    async def close(self):
+        try:
+            if self._stream is not None:
+                await self._stream.close()
+        except Exception:
+            pass
+        await self._stack.aclose()
+
+class LLMGateway:
+    """
+    Chat completions over shared provider clients.
+
+    - per-provider and per-model concurrency limits, optional per-model token-rate limits
+    - queue timeout: a call still waiting for its limits after queue_timeout counts as failed
+    - first-token timeout: a call that has not produced text in time counts as failed;
+      the clock starts once the limits are acquired, so queueing does not eat into it
+    - failover: on errors/timeouts before the first token the next model in the chain is tried
+    - hedging: with hedge_after, a second model is started if the first is still silent;
+      whichever answers first is used and the other one is cancelled
+    """
+
+    def __init__(self, providers: Dict[str, Provider], model_concurrency: int = 16,
+                 tokens_per_minute: Optional[Dict[str, int]] = None, first_token_timeout: float = 20.0,
+                 idle_timeout: float = 30.0, queue_timeout: float = 30.0, hedge_after: float = 0.0,
+                 fallbacks: Optional[Dict[str, List[str]]] = None):
+        self.providers = providers
+        self.model_concurrency = model_concurrency
+        self.tokens_per_minute = tokens_per_minute or {}
+        self.first_token_timeout = first_token_timeout
+        self.idle_timeout = idle_timeout
+        self.queue_timeout = queue_timeout
+        self.hedge_after = hedge_after
+        self.fallbacks = fallbacks or {}
+        self._semaphores: Dict[Tuple, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _semaphore(self, provider: str, model: Optional[str]) -> asyncio.Semaphore:
+        key = (provider, model)
+        sem = self._semaphores.get(key)
+        if sem is None:
+            limit = self.providers[provider].max_concurrency if model is None else self.model_concurrency
+            sem = self._semaphores[key] = asyncio.Semaphore(max(limit, 1))
+        return sem
+
+    def _bucket(self, provider: str, model: str) -> Optional[TokenBucket]:
+        key = f"{provider}/{model}"
+        tpm = self.tokens_per_minute.get(key, self.tokens_per_minute.get(model))
+        if not tpm:
+            return None
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(tpm)
+        return self._buckets[key]
+
+    def chain(self, provider: str, model: str) -> List[Tuple[Provider, str]]:
+        """The requested model followed by its configured fallbacks ("provider/model"), skipping unusable providers."""
+        chain, seen = [], set()
+        for spec in [f"{provider}/{model}"] + self.fallbacks.get(f"{provider}/{model}", []) + self.fallbacks.get("*", []):
+            name, _, fallback_model = spec.partition("/")
+            p = self.providers.get(name)
+            if p is None or not p.api_key or spec in seen:
+                continue
+            seen.add(spec)
+            chain.append((p, fallback_model))
+        return chain
+
+    async def _first_token(self, attempt: _Attempt) -> str:
+        try:
+            await asyncio.wait_for(attempt.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMGatewayError(f"no free slot within {self.queue_timeout:.0f}s")
+        return await asyncio.wait_for(attempt.start(), self.first_token_timeout)
+
+    async def _race(self, chain: List[Tuple[Provider, str]], messages, errors: List[str]):
+        pending = list(chain)
+        running: Dict[asyncio.Task, _Attempt] = {}
+        hedged = False
+
+        def launch():
+            provider, model = pending.pop(0)
+            attempt = _Attempt(self, provider, model, messages)
+            running[asyncio.ensure_future(self._first_token(attempt))] = attempt
+
+        async def discard(task, attempt):
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            await attempt.close()
+
+        launch()
+        try:
+            while running:
+                timeout = self.hedge_after if self.hedge_after > 0 and not hedged and pending else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    print(f"DEBUG: LLM hedging, no token after {self.hedge_after}s")
+                    launch()
+                    continue
+                for task in done:
+                    attempt = running.pop(task)
+                    if task.exception() is None:
+                        for other, other_attempt in list(running.items()):
+                            running.pop(other)
+                            await discard(other, other_attempt)
+                        return attempt, task.result()
+                    error = task.exception()
+                    if isinstance(error, asyncio.TimeoutError):
+                        error = f"no token within {self.first_token_timeout:.0f}s"
+                    errors.append(f"{attempt.label}: {error}")
+                    print(f"DEBUG: LLM attempt failed, {errors[-1]}")
+                    await attempt.close()
+                if not running and pending:
+                    launch()
+            return None, None
+        finally:
+            for task, attempt in list(running.items()):
+                await discard(task, attempt)
+
+    async def stream_chat(self, provider: str, model: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Yields text deltas of the first model in the chain that answers."""
+        chain = self.chain(provider, model)
+        if not chain:
+            raise LLMGatewayError(f"Missing API Key for {provider}.")
+        errors: List[str] = []
+        attempt, first = await self._race(chain, messages, errors)
+        if attempt is None:
+            raise LLMGatewayError("All models failed: " + "; ".join(errors))
+        try:
+            if attempt.label != f"{provider}/{model}":
+                print(f"DEBUG: LLM answered by fallback {attempt.label}")
+            if first:
+                yield first
+            async for text in attempt.rest():
+                yield text
+        finally:
+            await attempt.close()
+
+    async def aclose(self):
+        for provider in self.providers.values():
+            await provider.aclose()
@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+class ChangeSignal:
+    """
+    Wakes up async waiters when something changes (e.g. a job was added).
+    notify() may be called from any thread, including FastAPI's sync endpoint threadpool.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def notify(self):
+        with self._lock:
+            self.version += 1
+            waiters = list(self._waiters)
+            self._waiters.clear()
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_resolve, fut)
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Waits until the version moves past `version`. Returns False on timeout."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        waiter = (loop, fut)
+        with self._lock:
+            if self.version != version:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(True)
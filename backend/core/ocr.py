@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+OCR_LANG = os.getenv("OCR_LANG", "en")
+
+# PaddleOCR language codes -> Tesseract language codes (used by the fallback)
+TESSERACT_LANGS = {"en": "eng", "tr": "tur", "german": "deu", "french": "fra", "ch": "chi_sim"}
+
+# Loaded engines of this process, by language. Model loading is the expensive part,
+# so an engine is created once per process and reused for every page after that.
+_engines: Dict[str, Any] = {}
+_engines_lock = threading.Lock()
+
+def needs_ocr(text: str, page_area: float, image_areas: List[float],
+              min_chars: int = 50, image_area_ratio: float = 0.5) -> bool:
+    """
+    Page triage: a page is rasterized for OCR only if its text layer is missing/too short,
+    or embedded images cover a large part of it (scans with a thin text layer, figures with text).
+    """
+    if len((text or "").strip()) < min_chars:
+        return True
+    return page_area > 0 and sum(image_areas) / page_area >= image_area_ratio
+
+def get_engine(lang: str, log: Callable[[str], None] = print):
+    """Returns the warm PaddleOCR engine for a language, or None if PaddleOCR cannot be loaded."""
+    with _engines_lock:
+        if lang not in _engines:
+            started = time.perf_counter()
+            try:
+                from paddleocr import PaddleOCR
+                _engines[lang] = PaddleOCR(use_angle_cls=True, lang=lang, show_log=False)
+                log(f"OCR engine '{lang}' loaded in {time.perf_counter() - started:.1f}s (pid {os.getpid()})")
+            except Exception as e:
+                log(f"⚠️ PaddleOCR unavailable for '{lang}', using Tesseract: {e}")
+                _engines[lang] = None
+        return _engines[lang]
+
+def warm_up(lang: Optional[str] = None):
+    """Process pool initializer: loads the default engine before the first job arrives."""
+    get_engine(lang or OCR_LANG)
+
+def _paddle(engine, image) -> Tuple[str, Optional[float]]:
+    if np is not None and not isinstance(image, str):
+        image = np.array(image.convert("RGB"))
+    result = engine.ocr(image, cls=True)
+    if not result or not result[0]:
+        return "", None
+    lines = [line[1] for line in result[0]]  # (text, confidence)
+    return "\n".join(text for text, _ in lines), sum(conf for _, conf in lines) / len(lines)
+
+def _tesseract(image, lang: str) -> Tuple[str, Optional[float]]:
+    """One Tesseract pass: the text is rebuilt from image_to_data's words (lines, blank line between blocks)."""
+    import pytesseract
+
+    if isinstance(image, str):
+        from PIL import Image
+        image = Image.open(image)
+    data = pytesseract.image_to_data(image, lang=TESSERACT_LANGS.get(lang, lang), output_type=pytesseract.Output.DICT)
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confs = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip() or float(data["conf"][i]) < 0:
+            continue
+        lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), []).append(word)
+        confs.append(float(data["conf"][i]))
+    if not confs:
+        return "", None
+    text, previous = [], None
+    for (block, par, _), words in lines.items():
+        if previous is not None and previous != (block, par):
+            text.append("")
+        text.append(" ".join(words))
+        previous = (block, par)
+    return "\n".join(text), sum(confs) / len(confs) / 100
+
+def ocr_image(image, lang: str = OCR_LANG, log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    OCRs one image (file path or PIL image) with the warm PaddleOCR engine, falling back to
+    Tesseract. Returns {"text", "confidence" (0-1 or None), "engine", "seconds"} plus
+    "fallback" (why Tesseract was used) or "error" (when both failed).
+    """
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"text": "", "confidence": None, "engine": "paddle"}
+
+    engine = get_engine(lang, log)
+    if engine is not None:
+        try:
+            result["text"], result["confidence"] = _paddle(engine, image)
+        except Exception as e:
+            result["fallback"] = f"paddle failed: {e}"
+    else:
+        result["fallback"] = "paddle unavailable"
+
+    if "fallback" in result:
+        result["engine"] = "tesseract"
+        try:
+            result["text"], result["confidence"] = _tesseract(image, lang)
+        except Exception as e:
+            result["engine"] = None
+            result["error"] = str(e)
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def ocr_page(page_no: int, image, lang: str = OCR_LANG,
+             log: Callable[[str], None] = print, label: str = "") -> Dict[str, Any]:
+    """ocr_image() for one page of a document, logging its timing, engine and confidence."""
+    res = ocr_image(image, lang, log)
+    res["page"] = page_no
+    conf = f"{res['confidence']:.2f}" if res["confidence"] is not None else "-"
+    msg = f"OCR {label} page {page_no}: {res['engine'] or 'failed'} [{lang}] {res['seconds']:.2f}s, confidence {conf}"
+    if "fallback" in res:
+        msg += f" (fallback: {res['fallback']})"
+    if "error" in res:
+        msg += f" (error: {res['error']})"
+    log(msg)
+    return res
@@ -0,0 +1,294 @@
+import queue
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
+
+# Marks the end of a stage's input
+_STOP = object()
+
+class ExtractError(Exception):
+    """Wraps an exception raised by extract_fn, so the stage is reported correctly."""
+
+class PipelineCancelled(Exception):
+    """The run was stopped through its cancel event (e.g. the job lease was lost)."""
+
+class IngestPipeline:
+    """
+    Staged ingestion: extract -> chunk -> embed -> upsert.
+
+    - split_fn turns a file into extraction tasks (e.g. page ranges of a PDF)
+    - extract runs the tasks in a process pool (CPU bound: PDF parsing, OCR)
+    - chunking runs in one thread; it receives each file's extracted parts in order
+      and splits them into embedding batches
+    - embed and upsert each run in their own thread pool (network bound)
+
+    Stages are connected by bounded queues and at most extract_workers + queue_size
+    extraction results are held at once, so a slow stage applies backpressure
+    instead of letting extracted text pile up in memory.
+
+    Pass a long-lived `executor` to keep extraction processes (and what they loaded,
+    e.g. OCR models) alive across runs; it is not shut down by the pipeline.
+
+    Setting the `cancel` event stops the run: no new extraction tasks, embedding or
+    upsert calls; run() then raises PipelineCancelled once the stages have drained.
+
+    Callables:
+        split_fn(item) -> list of tasks     (default: [item])
+        extract_fn(task) -> part            (must be picklable when extract_workers > 0)
+        chunk_fn(item, parts iterator) -> iterable of batches (lists of chunk dicts)
+        embed_fn(item, batch) -> vectors for the batch
+        upsert_fn(item, vectors) -> None
+    Items are tuples whose last element names the file in the stats; a name that repeats
+    within one run gets a " (2)", " (3)", ... suffix instead of merging into the first.
+    """
+
+    def __init__(self, extract_fn: Callable, chunk_fn: Callable, embed_fn: Callable, upsert_fn: Callable,
+                 split_fn: Optional[Callable] = None, executor: Optional[Executor] = None,
+                 extract_workers: int = 2, embed_workers: int = 4, upsert_workers: int = 2, queue_size: int = 8,
+                 log: Optional[Callable[[str], None]] = None, cancel: Optional[threading.Event] = None):
+        self.extract_fn = extract_fn
+        self.chunk_fn = chunk_fn
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.split_fn = split_fn or (lambda item: [item])
+        self.executor = executor
+        self.extract_workers = extract_workers
+        self.embed_workers = max(embed_workers, 1)
+        self.upsert_workers = max(upsert_workers, 1)
+        self.queue_size = max(queue_size, 1)
+        self.log = log or (lambda msg: None)
+        self.cancel = cancel or threading.Event()
+
+    def run(self, items: Iterable[Tuple]) -> Dict[str, Dict[str, Any]]:
+        items = list(items)
+        # Tracked per position: items with the same name are still separate files
+        stats = [{"status": "ok", "chunks": 0, "vectors": 0} for _ in items]
+        stats_lock = threading.Lock()
+
+        embed_q = queue.Queue(maxsize=self.queue_size)
+        upsert_q = queue.Queue(maxsize=self.queue_size)
+
+        def fail(n, stage, e):
+            with stats_lock:
+                entry = stats[n]
+                if entry["status"] != "failed":
+                    entry["status"] = "failed"
+                    entry["error"] = f"{stage}: {e}"
+            self.log(f"❌ {stage} failed for {self._key(items[n])}: {e}")
+
+        def failed(n):
+            with stats_lock:
+                return stats[n]["status"] == "failed"
+
+        def chunk_stage():
+            for n, item, parts in self._extract(items, fail):
+                if parts is None:
+                    continue
+                if self.cancel.is_set():
+                    parts.close()
+                    break
+                try:
+                    empty = True
+                    for batch in self.chunk_fn(item, parts):
+                        if self.cancel.is_set():
+                            break
+                        if not batch:
+                            continue
+                        empty = False
+                        with stats_lock:
+                            stats[n]["chunks"] += len(batch)
+                        embed_q.put((n, item, batch))  # blocks when embedding falls behind
+                    if empty:
+                        with stats_lock:
+                            stats[n]["status"] = "empty"
+                except ExtractError as e:
+                    fail(n, "extract", e.__cause__ or e)
+                except Exception as e:
+                    fail(n, "chunk", e)
+                finally:
+                    parts.close()
+            for _ in range(self.embed_workers):
+                embed_q.put(_STOP)
+
+        def embed_stage():
+            while True:
+                task = embed_q.get()
+                if task is _STOP:
+                    return
+                n, item, batch = task
+                if failed(n) or self.cancel.is_set():
+                    continue
+                try:
+                    vectors = self.embed_fn(item, batch)
+                    if not vectors:
+                        raise RuntimeError("no embeddings returned")
+                    upsert_q.put((n, item, vectors))
+                except Exception as e:
+                    fail(n, "embed", e)
+
+        def upsert_stage():
+            while True:
+                task = upsert_q.get()
+                if task is _STOP:
+                    return
+                n, item, vectors = task
+                if failed(n) or self.cancel.is_set():
+                    continue
+                try:
+                    self.upsert_fn(item, vectors)
+                    with stats_lock:
+                        stats[n]["vectors"] += len(vectors)
+                except Exception as e:
+                    fail(n, "upsert", e)
+
+        chunker = threading.Thread(target=chunk_stage, daemon=True)
+        embedders = [threading.Thread(target=embed_stage, daemon=True) for _ in range(self.embed_workers)]
+        upserters = [threading.Thread(target=upsert_stage, daemon=True) for _ in range(self.upsert_workers)]
+        for t in [chunker, *embedders, *upserters]:
+            t.start()
+
+        chunker.join()
+        for t in embedders:
+            t.join()
+        for _ in upserters:
+            upsert_q.put(_STOP)
+        for t in upserters:
+            t.join()
+        if self.cancel.is_set():
+            raise PipelineCancelled()
+        return self._by_name(items, stats)
+
+    @staticmethod
+    def _key(item) -> str:
+        return item[-1]
+
+    @classmethod
+    def _by_name(cls, items: List[Tuple], stats: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        by_name: Dict[str, Dict[str, Any]] = {}
+        for item, entry in zip(items, stats):
+            name, n = cls._key(item), 1
+            while name in by_name:
+                n += 1
+                name = f"{cls._key(item)} ({n})"
+            by_name[name] = entry
+        return by_name
+
+    def _extract(self, items: List[Tuple], fail) -> Iterator[Tuple[int, Tuple, Optional[Iterator]]]:
+        """
+        Yields (position, item, parts) per file, in order. `parts` iterates the file's extraction
+        results in task order while later tasks (and files) are still being extracted.
+        """
+        if self.extract_workers <= 0:
+            for n, item in enumerate(items):
+                try:
+                    tasks = self.split_fn(item)
+                except Exception as e:
+                    fail(n, "extract", e)
+                    yield n, item, None
+                    continue
+                yield n, item, _Parts(self._run_inline(t) for t in tasks)
+            return
+
+        slots = threading.Semaphore(self.extract_workers + self.queue_size)
+        file_queues = [queue.Queue() for _ in items]
+        stop = threading.Event()
+
+        pool = self.executor or ProcessPoolExecutor(max_workers=self.extract_workers)
+        try:
+            def submit_all():
+                for n, (item, q) in enumerate(zip(items, file_queues)):
+                    try:
+                        tasks = self.split_fn(item)
+                    except Exception as e:
+                        q.put(e)
+                        continue
+                    for task in tasks:
+                        slots.acquire()
+                        if stop.is_set() or self.cancel.is_set():
+                            # End this and the remaining files, so a waiting consumer moves on
+                            for rest in file_queues[n:]:
+                                rest.put(_STOP)
+                            return
+                        try:
+                            q.put(pool.submit(self.extract_fn, task))
+                        except Exception as e:
+                            # e.g. a broken pool: fail the task instead of stalling the file
+                            fut = Future()
+                            fut.set_exception(e)
+                            q.put(fut)
+                    q.put(_STOP)
+
+            submitter = threading.Thread(target=submit_all, daemon=True)
+            submitter.start()
+            try:
+                for n, (item, q) in enumerate(zip(items, file_queues)):
+                    first = q.get()
+                    if isinstance(first, Exception):
+                        fail(n, "extract", first)
+                        yield n, item, None
+                        continue
+                    yield n, item, _FutureParts(first, q, slots)
+            finally:
+                stop.set()
+                slots.release()
+                submitter.join()
+        finally:
+            if pool is not self.executor:
+                pool.shutdown()
+
+    def _run_inline(self, task):
+        try:
+            return self.extract_fn(task)
+        except Exception as e:
+            raise ExtractError(str(e)) from e
+
+class _Parts:
+    """Iterator over a file's extraction results that can be closed early."""
+
+    def __init__(self, gen):
+        self._gen = iter(gen)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._gen)
+
+    def close(self):
+        close = getattr(self._gen, "close", None)
+        if close:
+            close()
+
+class _FutureParts:
+    """
+    Iterates one file's extraction futures in task order. Every consumed or
+    discarded future frees its slot, so closing early never stalls the submitter.
+    """
+
+    def __init__(self, first, q: queue.Queue, slots: threading.Semaphore):
+        self._pending = first  # next future, or _STOP
+        self._q = q
+        self._slots = slots
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        fut = self._pending
+        if fut is _STOP:
+            raise StopIteration
+        try:
+            result = fut.result()
+        except Exception as e:
+            raise ExtractError(str(e)) from e
+        finally:
+            self._slots.release()
+            self._pending = self._q.get()
+        return result
+
+    def close(self):
+        # Stopped early (error): discard the rest of this file's tasks
+        while self._pending is not _STOP:
+            self._pending.cancel()
+            self._slots.release()
+            self._pending = self._q.get()
@@ -0,0 +1,399 @@
+import sqlite3
+import threading
+import json
+import os
+import datetime
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterable, Callable, Tuple
+
+# Job columns stored as JSON text
+JSON_COLUMNS = ("files", "result", "file_refs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    db TEXT NOT NULL,
+    files TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_db_created ON jobs(db, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+
+CREATE TABLE IF NOT EXISTS jobs_archive (
+    id TEXT PRIMARY KEY,
+    db TEXT NOT NULL,
+    files TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    result TEXT,
+    archived_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archive_db_created ON jobs_archive(db, created_at);
+
+CREATE TABLE IF NOT EXISTS queue_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Columns added after the first schema version: (name, DDL)
+MIGRATIONS = [
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("lease_owner", "TEXT"),
+    ("lease_expires_at", "REAL"),
+    ("ocr_lang", "TEXT"),
+    ("file_refs", "TEXT"),
+    ("seq", "INTEGER NOT NULL DEFAULT 0"),  # change sequence, see QueueStore._next_seq
+]
+
+LEASE_EXPIRED_RESULT = json.dumps({"error": "Lease expired too many times"})
+
+class LeaseError(Exception):
+    """Raised when a worker touches a job whose lease it no longer holds."""
+
+def now_iso():
+    return datetime.datetime.now().isoformat()
+
+class QueueStore:
+    """
+    SQLite (WAL) backed job store. Every operation touches only the rows it needs,
+    so poll/update cost does not grow with the job history.
+
+    Every visible change gives the job a new, store-wide increasing `seq`, so clients
+    can ask for "what changed since seq N" (lease renewals are not changes).
+    on_change is called after each commit that changed jobs, on_pending after each commit
+    that put jobs back to pending (expired leases).
+    """
+
+    def __init__(self, path: str, on_change: Optional[Callable[[], None]] = None,
+                 on_pending: Optional[Callable[[], None]] = None):
+        self.path = path
+        self.on_change = on_change
+        self.on_pending = on_pending
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        conn = self._conn()
+        existing = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)").fetchall()}
+        for name, ddl in MIGRATIONS:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {ddl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_lease ON jobs(status, lease_expires_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_seq ON jobs(seq)")
+        if conn.execute("SELECT 1 FROM queue_meta WHERE key = 'job_seq'").fetchone() is None:
+            # Existing jobs get sequence numbers in creation order
+            with self.transaction() as conn:
+                ids = [r["id"] for r in conn.execute("SELECT id FROM jobs ORDER BY created_at, id")]
+                conn.executemany("UPDATE jobs SET seq = ? WHERE id = ?", [(i + 1, job_id) for i, job_id in enumerate(ids)])
+                conn.execute("INSERT INTO queue_meta (key, value) VALUES ('job_seq', ?)", (len(ids),))
+
+    # --- Connection Handling ---
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (FastAPI runs sync endpoints in a threadpool)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # updates serialize instead of overwriting each other.
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.changed = False
+        self._local.requeued = False
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if self._local.changed and self.on_change:
+            self.on_change()
+        if self._local.requeued and self.on_pending:
+            self.on_pending()
+
+    def _next_seq(self, conn, n: int = 1) -> int:
+        """Reserves n sequence numbers inside the current transaction; returns the first one."""
+        conn.execute("UPDATE queue_meta SET value = value + ? WHERE key = 'job_seq'", (n,))
+        last = conn.execute("SELECT value FROM queue_meta WHERE key = 'job_seq'").fetchone()[0]
+        self._local.changed = True
+        return last - n + 1
+
+    def current_seq(self) -> int:
+        """Sequence number of the latest change (cheap: one row)."""
+        row = self._conn().execute("SELECT value FROM queue_meta WHERE key = 'job_seq'").fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Row Helpers ---
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job = dict(row)
+        for col in JSON_COLUMNS:
+            if col in job and job[col] is not None:
+                job[col] = json.loads(job[col])
+        return job
+
+    @staticmethod
+    def _job_to_row(job: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(job)
+        row.setdefault("created_at", now_iso())
+        row.setdefault("updated_at", row["created_at"])
+        row.setdefault("result", None)
+        row.setdefault("attempts", 0)
+        row.setdefault("lease_owner", None)
+        row.setdefault("lease_expires_at", None)
+        row.setdefault("ocr_lang", None)
+        row.setdefault("file_refs", None)
+        for col in JSON_COLUMNS:
+            if row.get(col) is not None:
+                row[col] = json.dumps(row[col])
+        return row
+
+    # --- Jobs ---
+
+    def add_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        row = self._job_to_row(job)
+        with self.transaction() as conn:
+            row["seq"] = self._next_seq(conn)
+            conn.execute(
+                "INSERT INTO jobs (id, db, files, status, created_at, updated_at, result, ocr_lang, file_refs, seq) "
+                "VALUES (:id, :db, :files, :status, :created_at, :updated_at, :result, :ocr_lang, :file_refs, :seq)",
+                row,
+            )
+        return self.get_job(job["id"])
+
+    def upsert_jobs(self, jobs: Iterable[Dict[str, Any]]) -> int:
+        rows = [self._job_to_row(job) for job in jobs]
+        if not rows:
+            return 0
+        with self.transaction() as conn:
+            first = self._next_seq(conn, len(rows))
+            for i, row in enumerate(rows):
+                row["seq"] = first + i
+            conn.executemany(
+                "INSERT INTO jobs (id, db, files, status, created_at, updated_at, result, attempts, "
+                "lease_owner, lease_expires_at, ocr_lang, file_refs, seq) "
+                "VALUES (:id, :db, :files, :status, :created_at, :updated_at, :result, :attempts, "
+                ":lease_owner, :lease_expires_at, :ocr_lang, :file_refs, :seq) "
+                "ON CONFLICT(id) DO UPDATE SET db=excluded.db, files=excluded.files, status=excluded.status, "
+                "updated_at=excluded.updated_at, result=excluded.result, attempts=excluded.attempts, "
+                "lease_owner=excluded.lease_owner, lease_expires_at=excluded.lease_expires_at, "
+                "ocr_lang=excluded.ocr_lang, file_refs=excluded.file_refs, seq=excluded.seq",
+                rows,
+            )
+        return len(rows)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, status: Optional[str] = None, db: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT * FROM jobs"
+        where, params = self._filters(status, db)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._conn().execute(sql, params).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    @staticmethod
+    def _filters(status: Optional[str], db: Optional[str]) -> Tuple[List[str], List[Any]]:
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if db:
+            where.append("db = ?")
+            params.append(db)
+        return where, params
+
+    def list_page(self, status: Optional[str] = None, db: Optional[str] = None, limit: int = 100,
+                  after: Optional[Tuple[str, str]] = None, descending: bool = False) -> List[Dict[str, Any]]:
+        """
+        One page of jobs by (created_at, id). `after` is the (created_at, id) of the last job of
+        the previous page (keyset pagination: no OFFSET scans, stable while jobs are added).
+        """
+        where, params = self._filters(status, db)
+        if after:
+            where.append("(created_at, id) < (?, ?)" if descending else "(created_at, id) > (?, ?)")
+            params.extend(after)
+        sql = "SELECT * FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        order = "DESC" if descending else "ASC"
+        sql += f" ORDER BY created_at {order}, id {order} LIMIT ?"
+        rows = self._conn().execute(sql, [*params, limit]).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def list_changes(self, since: int, status: Optional[str] = None, db: Optional[str] = None,
+                     limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Jobs changed after sequence number `since`, oldest change first; continue with the
+        last job's seq. Filters apply to the job's current state. Archived jobs are not reported.
+        """
+        where, params = self._filters(status, db)
+        where.append("seq > ?")
+        params.append(since)
+        sql = "SELECT * FROM jobs WHERE " + " AND ".join(where) + " ORDER BY seq LIMIT ?"
+        rows = self._conn().execute(sql, [*params, limit]).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def update_job(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                   worker_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Single-row update. Keeps the previous result when none is given.
+        If worker_id is given, the update only applies while that worker holds the lease.
+        """
+        with self.transaction() as conn:
+            if worker_id:
+                row = conn.execute("SELECT lease_owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row and row["lease_owner"] != worker_id:
+                    raise LeaseError(f"Job {job_id} is not leased by {worker_id}")
+            if conn.execute("SELECT 1 FROM jobs WHERE id = ?", (job_id,)).fetchone() is None:
+                return None
+            # Leases only make sense while processing
+            keep_lease = status == "processing"
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, result = COALESCE(?, result), "
+                "lease_owner = CASE WHEN ? THEN lease_owner ELSE NULL END, "
+                "lease_expires_at = CASE WHEN ? THEN lease_expires_at ELSE NULL END, seq = ? "
+                "WHERE id = ?",
+                (status, now_iso(), json.dumps(result) if result else None, keep_lease, keep_lease,
+                 self._next_seq(conn), job_id),
+            )
+        return self.get_job(job_id)
+
+    # --- Leases ---
+
+    def _requeue_expired(self, conn, max_attempts: int) -> int:
+        """Puts jobs with expired leases back to pending, or fails them after max_attempts."""
+        ids = [r["id"] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status = 'processing' AND lease_expires_at < ?", (time.time(),)
+        )]
+        if not ids:
+            return 0
+        first = self._next_seq(conn, len(ids))
+        conn.executemany(
+            "UPDATE jobs SET "
+            "status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "result = CASE WHEN attempts >= ? THEN ? ELSE result END, "
+            "lease_owner = NULL, lease_expires_at = NULL, updated_at = ?, seq = ? "
+            "WHERE id = ?",
+            [(max_attempts, max_attempts, LEASE_EXPIRED_RESULT, now_iso(), first + i, job_id)
+             for i, job_id in enumerate(ids)],
+        )
+        self._local.requeued = True
+        return len(ids)
+
+    def next_lease_expiry(self) -> Optional[float]:
+        """Earliest lease expiry (epoch seconds) of the jobs being processed, None if there are none."""
+        row = self._conn().execute("SELECT MIN(lease_expires_at) FROM jobs WHERE status = 'processing'").fetchone()
+        return row[0]
+
+    def requeue_expired(self, max_attempts: int) -> int:
+        with self.transaction() as conn:
+            return self._requeue_expired(conn, max_attempts)
+
+    def claim_job(self, worker_id: str, lease_seconds: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """Atomically hands the oldest pending job to worker_id under a time-limited lease."""
+        with self.transaction() as conn:
+            requeued = self._requeue_expired(conn, max_attempts)
+            if requeued:
+                print(f"DEBUG: Requeued {requeued} jobs with expired leases.")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', lease_owner = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, updated_at = ?, seq = ? WHERE id = ?",
+                (worker_id, time.time() + lease_seconds, now_iso(), self._next_seq(conn), row["id"]),
+            )
+        return self.get_job(row["id"])
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float) -> Optional[float]:
+        """Extends the lease. Returns the new expiry, or None if the lease was lost."""
+        expires_at = time.time() + lease_seconds
+        with self.transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'processing'",
+                (expires_at, job_id, worker_id),
+            )
+            if cur.rowcount == 0:
+                return None
+        return expires_at
+
+    def count_jobs(self, status: Optional[str] = None) -> int:
+        if status:
+            return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    # --- Maintenance ---
+
+    def archive_jobs(self, older_than: str, statuses=("completed", "failed")) -> int:
+        """Moves finished jobs created before `older_than` (ISO timestamp) to jobs_archive."""
+        marks = ",".join("?" for _ in statuses)
+        params = (*statuses, older_than)
+        with self.transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs_archive (id, db, files, status, created_at, updated_at, result, archived_at) "
+                f"SELECT id, db, files, status, created_at, updated_at, result, ? FROM jobs "
+                f"WHERE status IN ({marks}) AND created_at < ?",
+                (now_iso(), *params),
+            )
+            cur = conn.execute(f"DELETE FROM jobs WHERE status IN ({marks}) AND created_at < ?", params)
+            if cur.rowcount:
+                self._next_seq(conn)  # listings changed (ETags must change too)
+            return cur.rowcount
+
+    def purge_archive(self, older_than: str) -> int:
+        with self.transaction() as conn:
+            cur = conn.execute("DELETE FROM jobs_archive WHERE archived_at < ?", (older_than,))
+            return cur.rowcount
+
+    def compact(self):
+        """Reclaims space after archiving/purging and truncates the WAL file."""
+        conn = self._conn()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def import_json(self, json_path: str) -> int:
+        """One-time migration from the legacy queue_db.json file."""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                jobs = json.load(f)
+        except Exception as e:
+            print(f"Queue migration error: {e}")
+            return 0
+        count = self.upsert_jobs(jobs)
+        os.replace(json_path, json_path + ".migrated")
+        return count
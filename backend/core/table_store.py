@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import zlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    id TEXT PRIMARY KEY,
+    db_name TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    table_no INTEGER NOT NULL,
+    n_rows INTEGER NOT NULL,
+    n_cols INTEGER NOT NULL,
+    header TEXT NOT NULL,
+    columns BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tables_db ON tables(db_name, source, page, table_no);
+"""
+
+_NUMBER = re.compile(r"^[-+(]?[\d.,%\s]+[)]?$")
+
+def split_header(rows: List[List[str]]) -> Tuple[List[str], List[List[str]]]:
+    """First row is the header if it has no numeric cells; otherwise columns are named col1, col2, ..."""
+    rows = [[str(c).strip() for c in row] for row in rows]
+    width = max((len(r) for r in rows), default=0)
+    rows = [r + [""] * (width - len(r)) for r in rows]
+    if rows and any(rows[0]) and not any(_NUMBER.match(c) for c in rows[0] if c):
+        return [c or f"col{i + 1}" for i, c in enumerate(rows[0])], rows[1:]
+    return [f"col{i + 1}" for i in range(width)], rows
+
+def table_id(db_name: str, source: str, page: int, table_no: int) -> str:
+    # Same prefix as the file's vector ids, so per-source deletes by prefix also match
+    return f"{db_name}_{source}_p{page}_t{table_no}"
+
+class TableStore:
+    """
+    Tables extracted from documents (SQLite, one row per table).
+    Cells are stored by column, zlib-compressed: repeated values within a column
+    (units, categories, empty cells) compress well and a column reads in one pass.
+    """
+
+    def __init__(self, path: str, compress_level: int = 6):
+        self.path = path
+        self.compress_level = compress_level
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def replace_source(self, db_name: str, source: str, tables: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replaces the tables of a file. tables: [{"page", "rows": [[cell, ...], ...]}] in document order.
+        Returns their metadata (with "header" and data "rows" split, for chunking).
+        """
+        stored, records, per_page = [], [], {}
+        for t in tables:
+            header, rows = split_header(t["rows"])
+            if not rows:
+                continue
+            table_no = per_page[t["page"]] = per_page.get(t["page"], 0) + 1
+            tid = table_id(db_name, source, t["page"], table_no)
+            columns = [list(col) for col in zip(*rows)]
+            records.append((tid, db_name, source, t["page"], table_no, len(rows), len(header),
+                            json.dumps(header, ensure_ascii=False),
+                            zlib.compress(json.dumps(columns, ensure_ascii=False).encode("utf-8"), self.compress_level)))
+            stored.append({"id": tid, "source": source, "page": t["page"], "table_no": table_no,
+                           "header": header, "rows": rows})
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM tables WHERE db_name = ? AND source = ?", (db_name, source))
+            conn.executemany("INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return stored
+
+    @staticmethod
+    def _meta(row) -> Dict[str, Any]:
+        meta = {k: row[k] for k in ("id", "db_name", "source", "page", "table_no", "n_rows", "n_cols")}
+        meta["header"] = json.loads(row["header"])
+        return meta
+
+    def list(self, db_name: str, source: Optional[str] = None, limit: int = 50,
+             after: Optional[Tuple[str, int, int]] = None) -> List[Dict[str, Any]]:
+        """Table metadata in document order; after = (source, page, table_no) of the previous page's last table."""
+        sql = "SELECT id, db_name, source, page, table_no, n_rows, n_cols, header FROM tables WHERE db_name = ?"
+        params: List[Any] = [db_name]
+        if source:
+            sql += " AND source = ?"
+            params.append(source)
+        if after:
+            sql += " AND (source, page, table_no) > (?, ?, ?)"
+            params.extend(after)
+        sql += " ORDER BY source, page, table_no LIMIT ?"
+        params.append(limit)
+        return [self._meta(r) for r in self._conn().execute(sql, params)]
+
+    def get(self, tid: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM tables WHERE id = ?", (tid,)).fetchone()
+        if row is None:
+            return None
+        table = self._meta(row)
+        table["columns"] = json.loads(zlib.decompress(row["columns"]).decode("utf-8"))
+        return table
+
+    def rows(self, tid: str, offset: int = 0, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """Table metadata plus a page of rows (row-major)."""
+        table = self.get(tid)
+        if table is None:
+            return None
+        columns = table.pop("columns")
+        table["rows"] = [list(r) for r in zip(*(c[offset:offset + limit] for c in columns))]
+        return table
+
+    def delete_db(self, db_name: str) -> int:
+        return self._conn().execute("DELETE FROM tables WHERE db_name = ?", (db_name,)).rowcount
+
+    def count(self, db_name: Optional[str] = None) -> int:
+        if db_name:
+            return self._conn().execute("SELECT COUNT(*) FROM tables WHERE db_name = ?", (db_name,)).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM tables").fetchone()[0]
+
+def format_rows(header: List[str], rows: List[List[str]]) -> str:
+    """Rows as "Column: value; ..." lines, so every number keeps its column name in the embedded text."""
+    return "\n".join("; ".join(f"{h}: {v}" for h, v in zip(header, row) if v) for row in rows)
+
+# Shared by the worker (writes) and the backend (reads), like the chunk store
+TABLE_STORE_PATH = os.getenv("TABLE_STORE_PATH", "./local_storage/table_store.sqlite3")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_table_store(create: bool = True) -> Optional[TableStore]:
+    """Returns the table store, or None if it does not exist yet and create is False."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if not create and not os.path.exists(TABLE_STORE_PATH):
+                return None
+            os.makedirs(os.path.dirname(TABLE_STORE_PATH) or ".", exist_ok=True)
+            _store = TableStore(TABLE_STORE_PATH)
+        return _store
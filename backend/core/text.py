@@ -0,0 +1,15 @@
+import re
+import hashlib
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+_UNSAFE = re.compile(r"[^\w.-]")
+
+def normalize_text(text: str) -> str:
+    """Same text with different whitespace/unicode forms maps to one key (embedding and query caches)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def unique_slug(value: str, length: int = 60) -> str:
+    """File/directory name for a value: readable prefix plus a hash, so distinct values never collide."""
+    digest = hashlib.sha1(value.encode("utf-8")).hexdigest()[:10]
+    return f"{_UNSAFE.sub('_', value)[:length]}-{digest}"
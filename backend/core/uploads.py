@@ -0,0 +1,245 @@
+import os
+import re
+import json
+import uuid
+import hashlib
+import sqlite3
+import threading
+import datetime
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def now_iso():
+    return datetime.datetime.now().isoformat()
+
+def iter_fileobj(fileobj: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def hash_fileobj(fileobj: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Dict[str, Any]:
+    """SHA-256 and size of a seekable file, read in chunks; rewinds it afterwards."""
+    digest, size = hashlib.sha256(), 0
+    fileobj.seek(0)
+    for chunk in iter_fileobj(fileobj, chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return {"sha256": digest.hexdigest(), "size": size}
+
+class ChunkReader:
+    """Minimal read-only file object over a chunk iterator (not seekable)."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def seekable(self) -> bool:
+        return False
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+class FileRegistry:
+    """
+    Content hashes of the files stored per database (SQLite).
+    Uploads whose hash is already registered for the database are skipped.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS files (
+        db TEXT NOT NULL,
+        sha256 TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        storage_id TEXT,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (db, sha256)
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(self.SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, db: str, sha256: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM files WHERE db = ? AND sha256 = ?", (db, sha256)).fetchone()
+        return dict(row) if row else None
+
+    def add(self, db: str, sha256: str, filename: str, size: int, storage_id: Optional[str] = None) -> Dict[str, Any]:
+        self._conn().execute(
+            "INSERT OR IGNORE INTO files (db, sha256, filename, size, storage_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (db, sha256, filename, size, storage_id, now_iso()),
+        )
+        return self.get(db, sha256)
+
+    def list(self, db: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT * FROM files WHERE db = ? ORDER BY created_at", (db,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def delete_db(self, db: str) -> List[Dict[str, Any]]:
+        """Forgets the files of a database; returns the removed rows."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [dict(r) for r in conn.execute("SELECT * FROM files WHERE db = ?", (db,))]
+            conn.execute("DELETE FROM files WHERE db = ?", (db,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def is_referenced(self, storage_id: str) -> bool:
+        """True while any database still has a file stored under storage_id (content is shared)."""
+        return self._conn().execute("SELECT 1 FROM files WHERE storage_id = ? LIMIT 1", (storage_id,)).fetchone() is not None
+
+class UploadError(Exception):
+    """Invalid multipart upload request (unknown session, bad part number, incomplete upload)."""
+
+class _BoundedFile:
+    """Write-only file that raises UploadError as soon as more than `limit` bytes are written."""
+
+    def __init__(self, f: BinaryIO, limit: int, message: str):
+        self._f = f
+        self.limit = limit
+        self.message = message
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        if self.written > self.limit:
+            raise UploadError(self.message)
+        return self._f.write(data)
+
+    def close(self):
+        self._f.close()
+
+class MultipartUploads:
+    """
+    Resumable uploads for big files. A session is a directory with session.json and one
+    file per received part; parts can arrive in any order and be re-sent after a failure.
+    complete() streams the parts in order, so the file is never assembled on disk.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> str:
+        if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+            raise UploadError("Unknown upload")
+        return os.path.join(self.root, upload_id)
+
+    def create(self, db: str, filename: str, size: int, part_size: int, sha256: Optional[str] = None,
+               ocr_lang: Optional[str] = None) -> Dict[str, Any]:
+        if size < 0 or part_size <= 0:
+            raise UploadError("Invalid size")
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id, "db": db, "filename": filename, "size": size,
+            "part_size": part_size, "parts_total": max(1, -(-size // part_size)),
+            "sha256": sha256, "ocr_lang": ocr_lang, "created_at": now_iso(),
+        }
+        path = self._dir(upload_id)
+        os.makedirs(path)
+        with open(os.path.join(path, "session.json"), "w") as f:
+            json.dump(session, f)
+        return session
+
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._dir(upload_id), "session.json")) as f:
+                session = json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Unknown upload")
+        session["parts_received"] = self.received_parts(upload_id)
+        return session
+
+    def received_parts(self, upload_id: str) -> List[int]:
+        path = self._dir(upload_id)
+        return sorted(int(name[5:]) for name in os.listdir(path) if re.fullmatch(r"part-\d+", name))
+
+    @contextmanager
+    def part_writer(self, upload_id: str, part_no: int):
+        """
+        Opens part `part_no` (1-based) for writing. The part only becomes visible when the
+        block exits without error, so an interrupted part is simply missing; re-sending replaces it.
+        A write beyond part_size raises UploadError right away instead of after the whole body.
+        """
+        session = self.get(upload_id)
+        if not 1 <= part_no <= session["parts_total"]:
+            raise UploadError(f"Part number must be between 1 and {session['parts_total']}")
+        path = os.path.join(self._dir(upload_id), f"part-{part_no:05d}")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        f = _BoundedFile(open(tmp, "wb"), session["part_size"], f"Part {part_no} is larger than part_size")
+        try:
+            yield f
+            f.close()
+            os.replace(tmp, path)
+        finally:
+            f.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def write_part(self, upload_id: str, part_no: int, chunks: Iterator[bytes]) -> int:
+        written = 0
+        with self.part_writer(upload_id, part_no) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+        return written
+
+    def missing_parts(self, upload_id: str) -> List[int]:
+        session = self.get(upload_id)
+        received = set(session["parts_received"])
+        return [n for n in range(1, session["parts_total"] + 1) if n not in received]
+
+    def iter_content(self, upload_id: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        missing = self.missing_parts(upload_id)
+        if missing:
+            raise UploadError(f"Missing parts: {missing[:10]}")
+        path = self._dir(upload_id)
+        for n in self.received_parts(upload_id):
+            with open(os.path.join(path, f"part-{n:05d}"), "rb") as f:
+                yield from iter_fileobj(f, chunk_size)
+
+    def open_content(self, upload_id: str) -> ChunkReader:
+        return ChunkReader(self.iter_content(upload_id))
+
+    def hash_content(self, upload_id: str) -> Dict[str, Any]:
+        digest, size = hashlib.sha256(), 0
+        for chunk in self.iter_content(upload_id):
+            digest.update(chunk)
+            size += len(chunk)
+        return {"sha256": digest.hexdigest(), "size": size}
+
+    def abort(self, upload_id: str):
+        path = self._dir(upload_id)
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                os.remove(os.path.join(path, name))
+            os.rmdir(path)
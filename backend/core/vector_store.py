@@ -0,0 +1,560 @@
+import os
+import json
+import time
+import shutil
+import importlib.util
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+
+from core.text import unique_slug
+
+# Optional dependencies: numpy for the local index, pinecone for the hosted one
+# (pinecone is imported when the store is created, processes using the local index never load it)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Metadata keys that the local store can filter on with an index
+INDEXED_FILTER_KEYS = ("db_name", "source")
+
+class Match:
+    """One query hit. Same attribute names as Pinecone's matches."""
+
+    def __init__(self, id: str, score: float, metadata: Optional[Dict[str, Any]] = None, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata or {}
+        self.values = values
+
+    def __repr__(self):
+        return f"Match(id={self.id!r}, score={self.score:.4f})"
+
+class VectorStore:
+    """
+    Interface every vector backend implements.
+    Vectors are dicts: {"id": str, "values": [float], "metadata": {...}}
+    Filters use Pinecone syntax for equality: {"db_name": "X"} or {"db_name": {"$eq": "X"}}
+
+    A namespace is a separate partition (one per database): queries only scan their own
+    namespace and dropping one does not touch the others. None is the shared default partition.
+    """
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None,
+              include_values: bool = False, namespace: Optional[str] = None) -> List[Match]:
+        raise NotImplementedError
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, Match]:
+        """Looks up vectors by id (score 0). Missing ids are left out."""
+        raise NotImplementedError
+
+    def delete_by_source(self, db_name: str, source: str, namespace: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def delete_namespace(self, namespace: str):
+        raise NotImplementedError
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        raise NotImplementedError
+
+    def has_shared_vectors(self, db_name: str) -> bool:
+        """True if the shared default partition holds vectors of the database (written before namespaces)."""
+        raise NotImplementedError
+
+def _filter_equals(filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Flattens {"k": v} / {"k": {"$eq": v}} into {"k": v}."""
+    out = {}
+    for key, cond in (filter or {}).items():
+        if isinstance(cond, dict):
+            if set(cond) != {"$eq"}:
+                raise ValueError(f"Unsupported filter operator for {key}: {cond}")
+            cond = cond["$eq"]
+        out[key] = cond
+    return out
+
+# --- Pinecone ---
+
+class PineconeVectorStore(VectorStore):
+
+    def __init__(self, api_key: str, index_name: str, dimension: int = 1536, log=print):
+        if importlib.util.find_spec("pinecone") is None:
+            raise RuntimeError("pinecone package is not installed")
+        self.api_key = api_key
+        self.index_name = index_name
+        self.dimension = dimension
+        self.log = log
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self._connect()
+            return self._index
+
+    def _connect(self):
+        from pinecone import Pinecone, ServerlessSpec
+
+        pc = Pinecone(api_key=self.api_key)
+        existing_indexes = [i.name for i in pc.list_indexes()]
+        if self.index_name not in existing_indexes:
+            self.log(f"Creating Pinecone Index: {self.index_name}")
+            try:
+                pc.create_index(
+                    name=self.index_name,
+                    dimension=self.dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                )
+                time.sleep(10) # Wait for init
+            except Exception as e:
+                self.log(f"Index creation error: {e}")
+        return pc.Index(self.index_name)
+
+    def upsert(self, vectors, namespace=None, batch_size: int = 100):
+        for i in range(0, len(vectors), batch_size):
+            self.index.upsert(vectors=vectors[i:i+batch_size], namespace=namespace or "")
+        return len(vectors)
+
+    def query(self, vector, top_k=5, filter=None, include_values=False, namespace=None):
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=include_values,
+            filter=filter,
+            namespace=namespace or ""
+        )
+        return [Match(m.id, m.score, m.metadata, getattr(m, "values", None) or None) for m in results.matches]
+
+    def fetch(self, ids, namespace=None):
+        if not ids:
+            return {}
+        result = self.index.fetch(ids=ids, namespace=namespace or "")
+        return {vid: Match(vid, 0.0, v.metadata, v.values) for vid, v in result.vectors.items()}
+
+    def delete_by_source(self, db_name, source, namespace=None):
+        # Serverless indexes cannot delete by metadata filter; vector ids are prefixed "<db>_<file>_"
+        deleted, prefix = 0, f"{db_name}_{source}_"
+        for ids in self.index.list(prefix=prefix, namespace=namespace or ""):
+            # "a.pdf_" is also a prefix of "a.pdf_2_0", the ids of another file
+            ids = [i for i in ids if i[len(prefix):].isdigit()]
+            if ids:
+                self.index.delete(ids=ids, namespace=namespace or "")
+                deleted += len(ids)
+        return deleted
+
+    def delete_namespace(self, namespace):
+        try:
+            self.index.delete(delete_all=True, namespace=namespace)
+        except Exception as e:
+            # Deleting a namespace that was never written to is a 404
+            if "not found" not in str(e).lower():
+                raise
+
+    def count(self, namespace=None):
+        stats = self.index.describe_index_stats()
+        if namespace is None:
+            return stats.total_vector_count
+        entry = stats.namespaces.get(namespace)
+        return entry.vector_count if entry else 0
+
+    def has_shared_vectors(self, db_name):
+        # Ids are "<db>_<file>_<n>": a longer database name with the same prefix can also match,
+        # which only keeps this one on the (filtered) shared partition
+        for ids in self.index.list(prefix=f"{db_name}_", namespace="", limit=1):
+            return bool(ids)
+        return False
+
+# --- Local (embedded) ---
+
+LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    slot INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    db_name TEXT,
+    source TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_vectors_db_source ON vectors(db_name, source);
+CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO state (key, value) VALUES ('next_slot', 0), ('version', 0);
+"""
+
+def namespace_dir(namespace: str) -> str:
+    """Directory name of a namespace: readable prefix plus a hash, so distinct names never collide."""
+    return unique_slug(namespace)
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded vector index for offline use and local benchmarks.
+
+    - vectors: L2-normalized float32 rows in a memory-mapped file (vectors.f32), so cosine = dot product
+    - metadata: SQLite sidecar (meta.sqlite3) mapping row slot <-> id, db_name, source, metadata
+    - search: exact NumPy top-k over the rows matching the filter, or an IVF index
+      (k-means lists, probe the `nprobe` closest) once a collection has `ann_min_vectors` rows
+
+    Several processes may share one directory (e.g. worker writes, backend reads):
+    readers notice the version counter in the sidecar and remap.
+
+    Namespaces are child stores under <path>/ns/, each with its own files and dimension
+    (recorded in its sidecar), so a query only maps and scans the rows of one database.
+    """
+
+    def __init__(self, path: str, dimension: int = 1536, ann: bool = True, ann_min_vectors: int = 50_000,
+                 nprobe: int = 8):
+        if np is None:
+            raise RuntimeError("numpy is required for the local vector store")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.ann = ann
+        self.ann_min_vectors = ann_min_vectors
+        self.nprobe = nprobe
+        self._vectors_path = os.path.join(path, "vectors.f32")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "meta.sqlite3"), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(LOCAL_SCHEMA)
+        columns = {r[1] for r in self._conn.execute("PRAGMA table_info(vectors)")}
+        if "written" not in columns:
+            # Store version that last wrote the row; the IVF index only reassigns rows written since it caught up
+            self._conn.execute("ALTER TABLE vectors ADD COLUMN written INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_written ON vectors(written)")
+        # The dimension a store was created with wins over the one it is opened with
+        self._conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('dimension', ?)", (dimension,))
+        self._conn.commit()
+        self.dimension = self._state("dimension")
+        if not os.path.exists(self._vectors_path):
+            open(self._vectors_path, "wb").close()
+
+        self._mmap = None
+        self._version = None
+        self._slot_cache = {}
+        self._ivf = None
+        self._namespaces: Dict[str, "LocalVectorStore"] = {}
+
+    # --- Namespaces ---
+
+    def _namespace(self, namespace: str, dimension: Optional[int] = None, create: bool = False):
+        """Child store of a namespace; None if it does not exist and create is False."""
+        path = os.path.join(self.path, "ns", namespace_dir(namespace))
+        with self._lock:
+            child = self._namespaces.get(namespace)
+            if child is not None and not os.path.isdir(path):
+                # Dropped by another process
+                child.close()
+                child = self._namespaces[namespace] = None
+            if child is None:
+                if not create and not os.path.isdir(path):
+                    return None
+                child = self._namespaces[namespace] = LocalVectorStore(
+                    path, dimension=dimension or self.dimension, ann=self.ann,
+                    ann_min_vectors=self.ann_min_vectors, nprobe=self.nprobe)
+            return child
+
+    def namespaces(self) -> List[str]:
+        """Directory names of the existing namespaces."""
+        root = os.path.join(self.path, "ns")
+        return sorted(os.listdir(root)) if os.path.isdir(root) else []
+
+    def delete_namespace(self, namespace):
+        path = os.path.join(self.path, "ns", namespace_dir(namespace))
+        with self._lock:
+            child = self._namespaces.pop(namespace, None)
+            if child is not None:
+                child.close()
+            shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        with self._lock:
+            for child in self._namespaces.values():
+                if child is not None:
+                    child.close()
+            self._namespaces = {}
+            self._mmap = None
+            self._conn.close()
+
+    # --- Storage ---
+
+    def _state(self, key: str) -> int:
+        return self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()[0]
+
+    def _capacity(self) -> int:
+        return os.path.getsize(self._vectors_path) // (self.dimension * 4)
+
+    def _map(self, writable: bool = False):
+        capacity = self._capacity()
+        if capacity == 0:
+            return None
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+" if writable else "r",
+                         shape=(capacity, self.dimension))
+
+    def _ensure_capacity(self, needed: int):
+        capacity = self._capacity()
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        self._mmap = None
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(new_capacity * self.dimension * 4)
+
+    def _refresh(self):
+        """Drops cached maps/slot lists when another writer (or we) changed the store."""
+        version = self._state("version")
+        if version != self._version:
+            self._mmap = None
+            self._slot_cache = {}
+            self._version = version
+        if self._mmap is None or self._mmap.shape[0] != self._capacity():
+            self._mmap = self._map()
+
+    def _bump_version(self):
+        self._conn.execute("UPDATE state SET value = value + 1 WHERE key = 'version'")
+
+    # --- VectorStore API ---
+
+    def upsert(self, vectors, namespace=None):
+        if not vectors:
+            return 0
+        if namespace is not None:
+            return self._namespace(namespace, dimension=len(vectors[0]["values"]), create=True).upsert(vectors)
+        # Last write wins for repeated ids within one batch
+        vectors = list({v["id"]: v for v in vectors}.values())
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Expected dimension {self.dimension}, got {values.shape[1]}")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                slots = []
+                for v in vectors:
+                    row = conn.execute("SELECT slot FROM vectors WHERE id = ?", (v["id"],)).fetchone()
+                    if row:
+                        slots.append(row[0])
+                        continue
+                    free = conn.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+                    if free:
+                        conn.execute("DELETE FROM free_slots WHERE slot = ?", (free[0],))
+                        slots.append(free[0])
+                    else:
+                        slot = self._state("next_slot")
+                        conn.execute("UPDATE state SET value = value + 1 WHERE key = 'next_slot'")
+                        slots.append(slot)
+
+                written = self._state("version") + 1  # the version this commit bumps to
+                self._ensure_capacity(max(slots) + 1)
+                mm = self._map(writable=True)
+                mm[np.asarray(slots)] = values
+                mm.flush()
+                del mm
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO vectors (slot, id, db_name, source, metadata, written) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (slot, v["id"], v.get("metadata", {}).get("db_name"), v.get("metadata", {}).get("source"),
+                         json.dumps(v.get("metadata", {})), written)
+                        for slot, v in zip(slots, vectors)
+                    ],
+                )
+                self._bump_version()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(vectors)
+
+    def delete_by_source(self, db_name, source, namespace=None):
+        if namespace is not None:
+            child = self._namespace(namespace)
+            return child.delete_by_source(db_name, source) if child else 0
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                slots = [r[0] for r in conn.execute(
+                    "SELECT slot FROM vectors WHERE db_name = ? AND source = ?", (db_name, source))]
+                conn.execute("DELETE FROM vectors WHERE db_name = ? AND source = ?", (db_name, source))
+                conn.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(s,) for s in slots])
+                self._bump_version()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(slots)
+
+    def fetch(self, ids, namespace=None):
+        if not ids:
+            return {}
+        if namespace is not None:
+            child = self._namespace(namespace)
+            return child.fetch(ids) if child else {}
+        with self._lock:
+            self._refresh()
+            marks = ",".join("?" for _ in ids)
+            rows = self._conn.execute(f"SELECT slot, id, metadata FROM vectors WHERE id IN ({marks})", list(ids)).fetchall()
+            return {
+                vid: Match(vid, 0.0, json.loads(m), self._mmap[slot].tolist())
+                for slot, vid, m in rows
+            }
+
+    def count(self, namespace: Optional[str] = None, db_name: Optional[str] = None) -> int:
+        if namespace is not None:
+            child = self._namespace(namespace)
+            return child.count() if child else 0
+        if db_name:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors WHERE db_name = ?", (db_name,)).fetchone()[0]
+        return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def has_shared_vectors(self, db_name):
+        return self._conn.execute("SELECT 1 FROM vectors WHERE db_name = ? LIMIT 1", (db_name,)).fetchone() is not None
+
+    def _candidate_slots(self, equals: Dict[str, Any]):
+        key = tuple((k, equals[k]) for k in INDEXED_FILTER_KEYS if k in equals)
+        slots = self._slot_cache.get(key)
+        if slots is None:
+            sql = "SELECT slot FROM vectors"
+            if key:
+                sql += " WHERE " + " AND ".join(f"{k} = ?" for k, _ in key)
+            rows = self._conn.execute(sql, [v for _, v in key]).fetchall()
+            slots = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+            self._slot_cache[key] = slots
+        return slots
+
+    def query(self, vector, top_k=5, filter=None, include_values=False, namespace=None):
+        if namespace is not None:
+            child = self._namespace(namespace)
+            return child.query(vector, top_k, filter, include_values) if child else []
+        equals = _filter_equals(filter)
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+
+        with self._lock:
+            self._refresh()
+            if self._mmap is None:
+                return []
+            slots = self._candidate_slots(equals)
+            if self.ann and len(slots) >= self.ann_min_vectors:
+                slots = self._ivf_index().probe(q, slots, self.nprobe)
+            if len(slots) == 0:
+                return []
+
+            scores = self._mmap[slots] @ q
+            # Extra rows for filters the SQL side could not apply
+            extra = [k for k in equals if k not in INDEXED_FILTER_KEYS]
+            k = min(len(slots), top_k * 4 if extra else top_k)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            top_slots = [int(slots[i]) for i in top]
+            marks = ",".join("?" for _ in top_slots)
+            meta = {
+                slot: (vid, json.loads(m))
+                for slot, vid, m in self._conn.execute(
+                    f"SELECT slot, id, metadata FROM vectors WHERE slot IN ({marks})", top_slots)
+            }
+
+            matches = []
+            for i, slot in zip(top, top_slots):
+                vid, metadata = meta[slot]
+                if any(metadata.get(key) != value for key, value in equals.items() if key in extra):
+                    continue
+                values = self._mmap[slot].tolist() if include_values else None
+                matches.append(Match(vid, float(scores[i]), metadata, values))
+                if len(matches) >= top_k:
+                    break
+            return matches
+
+    def _ivf_index(self):
+        all_slots = self._candidate_slots({})
+        if self._ivf is None or self._ivf.needs_rebuild(len(all_slots)):
+            self._ivf = IVFIndex.train(self._mmap, all_slots)
+            self._ivf.version = self._version
+        elif self._ivf.version != self._version:
+            # Only rows written since the last update: new, reused or overwritten slots
+            rows = self._conn.execute("SELECT slot FROM vectors WHERE written > ?", (self._ivf.version,)).fetchall()
+            self._ivf.update(self._mmap, np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+            self._ivf.version = self._version
+        return self._ivf
+
+class IVFIndex:
+    """Inverted-file ANN index: spherical k-means centroids + slot -> list assignment."""
+
+    def __init__(self, centroids, assign, trained_size):
+        self.centroids = centroids
+        self.assign = assign          # int32 per slot, -1 = unassigned
+        self.trained_size = trained_size
+        self.version = None           # store version the assignments reflect
+
+    @classmethod
+    def train(cls, mmap, slots, iterations: int = 10, sample_size: int = 50_000, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        nlist = int(min(max(np.sqrt(len(slots)), 1), 4096))
+        sample = slots if len(slots) <= sample_size else rng.choice(slots, sample_size, replace=False)
+        data = np.asarray(mmap[np.sort(sample)])
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        index = cls(centroids, np.full(mmap.shape[0], -1, dtype=np.int32), len(slots))
+        index.update(mmap, slots)
+        return index
+
+    def needs_rebuild(self, size: int) -> bool:
+        # Retrain when the collection doubled since training
+        return size > 2 * self.trained_size
+
+    def update(self, mmap, slots, block: int = 65_536):
+        """Assigns the given slots to their nearest centroid."""
+        if self.assign.shape[0] < mmap.shape[0]:
+            grown = np.full(mmap.shape[0], -1, dtype=np.int32)
+            grown[:self.assign.shape[0]] = self.assign
+            self.assign = grown
+        for start in range(0, len(slots), block):
+            part = slots[start:start + block]
+            self.assign[part] = np.argmax(np.asarray(mmap[part]) @ self.centroids.T, axis=1)
+
+    def probe(self, q, slots, nprobe: int):
+        lists = np.argpartition(-(self.centroids @ q), min(nprobe, len(self.centroids)) - 1)[:nprobe]
+        return slots[np.isin(self.assign[slots], lists)]
+
+# --- Factory ---
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE", "pinecone")  # pinecone | local
+PINECONE_INDEX_NAME = "rag-system-index"
+LOCAL_VECTOR_PATH = os.getenv("LOCAL_VECTOR_PATH", "./local_storage/vector_index")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1536"))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_vector_store(log=print) -> Optional[VectorStore]:
+    """Process-wide vector store selected by VECTOR_STORE. None if the backend is not configured."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if VECTOR_STORE_BACKEND == "local":
+                _store = LocalVectorStore(LOCAL_VECTOR_PATH, dimension=EMBEDDING_DIMENSION)
+            else:
+                api_key = os.getenv("PINECONE_API_KEY")
+                if not api_key:
+                    log("❌ ERROR: PINECONE_API_KEY missing.")
+                    return None
+                _store = PineconeVectorStore(api_key, PINECONE_INDEX_NAME, dimension=EMBEDDING_DIMENSION, log=log)
+        return _store
@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from api import files, ocr, images, tables, queue, llm, drive, db
+from core import metrics
 import os
+import time
 
 app = FastAPI(title="RAG System Backend")
 
@@ -19,8 +21,33 @@ app.include_router(files.router, prefix="/api/files", tags=["Files"])
 app.include_router(queue.router, prefix="/api/queue", tags=["Queue"])
 app.include_router(llm.router, prefix="/api/query", tags=["Query"])
 app.include_router(db.router, prefix="/api/db", tags=["Database"])
+app.include_router(tables.router, prefix="/api/tables", tags=["Tables"])
+app.include_router(images.router, prefix="/api/images", tags=["Images"])
 app.include_router(drive.router, prefix="/api/drive", tags=["Drive"])
 
+HTTP_SECONDS = metrics.histogram("rag_http_request_seconds", "HTTP request duration until the response starts", ["method", "route", "status"])
+
+def route_template(request: Request) -> str:
+    """/api/files/multipart/{upload_id} instead of the raw path, keeps the label set small."""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI keeps included routers nested; their route.path lacks the include prefix
+    context = (request.scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(context, "path", None) or route.path
+
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = route_template(request)
+    HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route, status=response.status_code)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 def read_root():
     return {"status": "online", "system": "RAG-1 Backend"}
@@ -6,28 +6,104 @@ import platform
 from typing import List, Dict
 import shutil
 import sys
+import threading
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
-# Library imports
-try:
-    import pdfplumber
-    from pdf2image import convert_from_path
-    from PIL import Image
-    import pytesseract
-    from paddleocr import PaddleOCR
-    import camelot
-    from pydrive2.auth import GoogleAuth
-    from pydrive2.drive import GoogleDrive
-    from pinecone import Pinecone, ServerlessSpec
-    from openai import OpenAI 
-except ImportError as e:
-    print(f"Warning: Missing dependency {e}. Please install requirements.txt")
+from core.pipeline import IngestPipeline, PipelineCancelled
+from core.embedding_cache import EmbeddingCache
+from core.embeddings import EmbeddingExecutor, EmbeddingError, TokenCounter, request_dimensions
+from core.chunking import chunk_pages
+from core.vector_store import get_vector_store, VECTOR_STORE_BACKEND
+from core.lexical import get_lexical_index
+from core.chunk_store import get_chunk_store
+from core.table_store import get_table_store, format_rows
+from core.db_registry import get_db_registry
+from core.image_assets import get_image_assets
+from core import ocr
+from core import extractors
+from core.blob_storage import get_blob_storage
+from core.blob_cache import BlobCache
+from core import metrics
+
+# Parsers and OCR libraries are imported by core.extractors on first use
 
 # Configuration
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY") 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-PINECONE_INDEX_NAME = "rag-system-index"
 LOCAL_STORAGE_PATH = "./local_storage"
+WORKER_ID = os.getenv("WORKER_ID", f"{platform.node()}-{os.getpid()}")
+LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "60"))
+# Long-poll wait per claim request; 0 disables long-polling
+LONG_POLL_SECONDS = int(os.getenv("WORKER_LONG_POLL_SECONDS", "25"))
+POLL_INTERVAL = 5
+
+# Ingestion pipeline concurrency (per stage)
+EXTRACT_WORKERS = int(os.getenv("WORKER_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+EMBED_WORKERS = int(os.getenv("WORKER_EMBED_THREADS", "4"))
+UPSERT_WORKERS = int(os.getenv("WORKER_UPSERT_THREADS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("WORKER_PIPELINE_QUEUE_SIZE", "8"))
+BATCH_SIZE = 50
+# Chunks are packed from whole sentences/paragraphs up to this many tokens
+CHUNK_TOKENS = int(os.getenv("WORKER_CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("WORKER_CHUNK_OVERLAP_TOKENS", "0"))
+# PDFs are extracted in page ranges of this size, spread over the extract processes
+PDF_PAGES_PER_TASK = int(os.getenv("WORKER_PDF_PAGES_PER_TASK", "16"))
+
+# OCR: default language (jobs may override it with ocr_lang); engines are loaded
+# once per extract process and kept warm, optionally at startup
+OCR_LANG = ocr.OCR_LANG
+OCR_WARMUP = os.getenv("WORKER_OCR_WARMUP", "1") != "0"
+# Page triage: only pages with too little text, or mostly covered by images, are rendered and OCR'd
+OCR_MIN_CHARS = int(os.getenv("WORKER_OCR_MIN_CHARS", "50"))
+OCR_IMAGE_AREA_RATIO = float(os.getenv("WORKER_OCR_IMAGE_AREA_RATIO", "0.5"))
+OCR_DPI = int(os.getenv("WORKER_OCR_DPI", "200"))
+OCR_RENDER_THREADS = int(os.getenv("WORKER_OCR_RENDER_THREADS", "1"))
+
+# Formats this worker extracts: "all", a list like "text,docx,pdf", or "max:medium" (no OCR models loaded)
+ENABLED_EXTRACTORS = extractors.enabled_names(os.getenv("WORKER_EXTRACTORS", "all"))
+OCR_ENABLED = extractors.uses("pdf_ocr", ENABLED_EXTRACTORS) or extractors.uses("image", ENABLED_EXTRACTORS)
+# Tables: camelot runs only on PDF pages with at least this many long horizontal rules;
+# extracted tables go to the table store and are embedded in groups of rows
+TABLES_ENABLED = os.getenv("WORKER_TABLES", "1") != "0" and extractors.uses("tables", ENABLED_EXTRACTORS)
+TABLE_MIN_RULINGS = int(os.getenv("WORKER_TABLE_MIN_RULINGS", "3"))
+TABLE_ROWS_PER_CHUNK = int(os.getenv("WORKER_TABLE_ROWS_PER_CHUNK", "20"))
+# Rendered page images go to the image assets index (IMAGE_ASSETS_PATH, shared with the backend);
+# these size variants are made at extraction time, the others on their first request
+IMAGE_VARIANTS = [v.strip() for v in os.getenv("WORKER_IMAGE_VARIANTS", "thumb").split(",") if v.strip()]
+
+# Per-database BM25 index, updated on every upsert (used for hybrid retrieval)
+LEXICAL_INDEX_ENABLED = os.getenv("WORKER_LEXICAL_INDEX", "1") != "0"
+# Chunk text goes to the chunk store and, by default, also into vector metadata: a backend that
+# cannot open this worker's CHUNK_STORE_PATH (e.g. backend on Render, worker on a local machine)
+# reads it from there. Set to 0 only when both share the chunk store file.
+VECTOR_METADATA_TEXT = os.getenv("WORKER_VECTOR_METADATA_TEXT", "1") != "0"
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+# Token budget per embeddings request and max requests in flight (shared by all embed threads)
+EMBED_BATCH_TOKENS = int(os.getenv("WORKER_EMBED_BATCH_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("WORKER_EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("WORKER_EMBED_MAX_RETRIES", "6"))
+# Persistent embedding cache; set WORKER_EMBEDDING_CACHE=0 to disable
+EMBEDDING_CACHE_ENABLED = os.getenv("WORKER_EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_PATH = os.getenv("WORKER_EMBEDDING_CACHE_PATH", os.path.join(LOCAL_STORAGE_PATH, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("WORKER_EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Read-through cache of uploaded files (keyed by content hash), filled in parallel when a job is claimed
+BLOB_CACHE_PATH = os.getenv("WORKER_BLOB_CACHE_PATH", os.path.join(LOCAL_STORAGE_PATH, "blob_cache"))
+BLOB_CACHE_MAX_BYTES = int(os.getenv("WORKER_BLOB_CACHE_MAX_BYTES", str(5 * 1024**3)))
+DOWNLOAD_THREADS = int(os.getenv("WORKER_DOWNLOAD_THREADS", "4"))
+
+# Prometheus /metrics on this port (0 = off); per-job stage timings are always stored in the job result
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+STAGE_SECONDS = metrics.histogram("rag_worker_stage_seconds", "Worker stage durations (per page, batch or job fetch)", ["stage"])
+JOBS_TOTAL = metrics.counter("rag_worker_jobs_total", "Jobs processed by status", ["status"])
+FILES_TOTAL = metrics.counter("rag_worker_files_total", "Files processed by status", ["status"])
+CHUNKS_TOTAL = metrics.counter("rag_worker_chunks_total", "Chunks generated")
+VECTORS_TOTAL = metrics.counter("rag_worker_vectors_total", "Vectors upserted")
 
 # Ensure directories
 os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
@@ -35,169 +111,520 @@ os.makedirs(LOCAL_STORAGE_PATH, exist_ok=True)
 def log(msg):
     print(f"[{time.strftime('%X')}] [Worker] {msg}")
 
-# --- Drive Helpers ---
-def get_drive():
-    # Drive auth logic (Skipped for brevity as we focus on Pinecone)
-    pass
+def job_timings():
+    """Stage timings of one job; every stage duration also goes to the worker histogram."""
+    return metrics.StageTimings(STAGE_SECONDS)
 
-# --- Pinecone Helper ---
-def get_pinecone_index():
-    if not PINECONE_API_KEY:
-        log("❌ ERROR: PINECONE_API_KEY missing.")
-        return None
-    
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    existing_indexes = [i.name for i in pc.list_indexes()]
-    if PINECONE_INDEX_NAME not in existing_indexes:
-        log(f"Creating Pinecone Index: {PINECONE_INDEX_NAME}")
+# --- Blob Storage Helpers ---
+_blob_cache = None
+_blob_cache_lock = threading.Lock()
+
+def get_blob_cache():
+    global _blob_cache
+    with _blob_cache_lock:
+        if _blob_cache is None:
+            _blob_cache = BlobCache(BLOB_CACHE_PATH, get_blob_storage(log=log), max_bytes=BLOB_CACHE_MAX_BYTES,
+                                    download_workers=DOWNLOAD_THREADS, log=log)
+        return _blob_cache
+
+def fetch_job_files(job):
+    """
+    Returns ([(local_path, filename)], {filename: failed stats}, pinned hashes).
+    Files referenced by content hash are downloaded in parallel through the cache;
+    legacy jobs (names only) are looked up under LOCAL_STORAGE_PATH.
+    """
+    files, failed = [], {}
+    refs = job.get('file_refs')
+    if not refs:
+        for f in job['files']:
+            local_f_path = os.path.join(LOCAL_STORAGE_PATH, f)
+            if os.path.exists(local_f_path):
+                files.append((local_f_path, f))
+            else:
+                log(f"File {f} not found locally.")
+                failed[f] = {"status": "failed", "chunks": 0, "vectors": 0, "error": "download: file not found"}
+        return files, failed, []
+
+    cache = get_blob_cache()
+    hits_before = cache.hits
+    futures = cache.prefetch(refs)
+    for ref in refs:
         try:
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=1536, 
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
-            )
-            time.sleep(10) # Wait for init
+            files.append((futures[ref['sha256']].result(), ref['filename']))
         except Exception as e:
-            log(f"Index creation error: {e}")
-            
-    return pc.Index(PINECONE_INDEX_NAME)
+            log(f"❌ Download failed for {ref['filename']}: {e}")
+            failed[ref['filename']] = {"status": "failed", "chunks": 0, "vectors": 0, "error": f"download: {e}"}
+    log(f"Fetched {len(files)} files ({cache.hits - hits_before} from cache).")
+    return files, failed, list(futures)
+
+# --- Vector Store Helper ---
+def get_index():
+    # Pinecone or the local embedded index (VECTOR_STORE=local), shared by the upsert threads
+    return get_vector_store(log=log)
 
 # --- Processing Logic ---
 
-def perform_ocr(image_path, lang='en'):
-    try:
-        ocr = PaddleOCR(use_angle_cls=True, lang=lang, show_log=False)
-        result = ocr.ocr(image_path, cls=True)
-        if not result or not result[0]: return ""
-        text = "\n".join([line[1][0] for line in result[0]])
-        return text
-    except:
-        return pytesseract.image_to_string(Image.open(image_path))
-
-def extract_images_from_pdf(pdf_path, db_name):
-    try:
-        images = convert_from_path(pdf_path)
-        for i, img in enumerate(images):
-            img_name = f"{db_name}_page{i+1:03d}_img001.jpg" 
-            save_path = os.path.join(LOCAL_STORAGE_PATH, "images", img_name)
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            img.save(save_path, "JPEG")
-    except Exception as e:
-        log(f"Image extraction error: {e}")
+def page_image_saver(db_name, filename):
+    def save(page_no, img):
+        try:
+            get_image_assets().add(db_name, filename, page_no, img, variants=IMAGE_VARIANTS)
+        except Exception as e:
+            log(f"Could not store image of {filename} page {page_no}: {e}")
+    return save
+
+def extract_options(db_name, ocr_lang, filename=""):
+    return extractors.ExtractOptions(
+        db_name=db_name,
+        ocr_lang=ocr_lang,
+        ocr=extractors.uses("pdf_ocr", ENABLED_EXTRACTORS),
+        ocr_min_chars=OCR_MIN_CHARS,
+        ocr_image_area_ratio=OCR_IMAGE_AREA_RATIO,
+        ocr_dpi=OCR_DPI,
+        ocr_render_threads=OCR_RENDER_THREADS,
+        save_page_image=page_image_saver(db_name, filename),
+        tables=TABLES_ENABLED,
+        table_min_rulings=TABLE_MIN_RULINGS,
+        log=log,
+    )
+
+_embedding_executors = {}
+_embedding_executor_lock = threading.Lock()
+
+def get_embedding_executor(model=EMBEDDING_MODEL, dimensions=None):
+    # One pooled executor per embedding model (and output size) per worker process
+    with _embedding_executor_lock:
+        executor = _embedding_executors.get((model, dimensions))
+        if executor is None:
+            executor = _embedding_executors[(model, dimensions)] = EmbeddingExecutor(
+                OPENAI_API_KEY,
+                model=model,
+                base_url=OPENAI_BASE_URL,
+                max_batch_tokens=EMBED_BATCH_TOKENS,
+                concurrency=EMBED_CONCURRENCY,
+                max_retries=EMBED_MAX_RETRIES,
+                dimensions=dimensions,
+                log=log,
+            )
+        return executor
 
-def get_openai_embeddings(texts: List[str]):
+def get_openai_embeddings(texts: List[str], model=EMBEDDING_MODEL, dimensions=None):
+    """Raises EmbeddingError when a batch still fails after retries, so the file is marked failed instead of silently dropped."""
     if not OPENAI_API_KEY:
-        log("❌ OPENAI_API_KEY missing. Cannot embed.")
-        return None
-    
-    try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        response = client.embeddings.create(input=texts, model="text-embedding-3-small")
-        return [data.embedding for data in response.data]
-    except Exception as e:
-        log(f"Embedding Error: {e}")
+        raise EmbeddingError("OPENAI_API_KEY missing. Cannot embed.")
+    return get_embedding_executor(model, dimensions).embed(texts)
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
         return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        return _embedding_cache
 
-def process_file_logic(db_name, file_path, filename):
-    log(f"Processing {filename}...")
-    full_text = ""
-    
-    ext = filename.lower().split('.')[-1]
-    
-    if ext == 'pdf':
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text: full_text += text + "\n"
-        extract_images_from_pdf(file_path, db_name)
-    elif ext in ['jpg', 'png', 'jpeg']:
-        full_text = perform_ocr(file_path)
-    elif ext == 'txt':
-        with open(file_path, 'r', encoding='utf-8') as f:
-            full_text = f.read()
-
-    if not full_text.strip():
-        log("⚠️ No text extracted. Skipping embedding.")
-        return
-
-    chunk_size = 800 
-    chunks = [full_text[i:i+chunk_size] for i in range(0, len(full_text), chunk_size)]
-    
-    log(f"Generating Embeddings for {len(chunks)} chunks...")
-    embeddings = get_openai_embeddings(chunks)
-    
-    if not embeddings: return
+def get_embeddings_cached(texts: List[str], model=EMBEDDING_MODEL, dimensions=None):
+    """Only cache misses go to the embeddings API."""
+    cache = get_embedding_cache()
+    if cache is None:
+        return get_openai_embeddings(texts, model, dimensions)
+
+    cache_key = f"{model}:{dimensions}" if dimensions else model
+    found = cache.get_many(cache_key, texts)
+    missing = [i for i in range(len(texts)) if i not in found]
+    if missing:
+        fresh = get_openai_embeddings([texts[i] for i in missing], model, dimensions)
+        cache.put_many(cache_key, [texts[i] for i in missing], fresh)
+        found.update(zip(missing, fresh))
+    return [found[i] for i in range(len(texts))]
+
+def split_document(item, ocr_lang=OCR_LANG):
+    """
+    Splits a file into extraction tasks: page ranges for paged formats (PDF), the whole file otherwise.
+    Raises ExtractorUnavailable for formats this worker has no (installed) extractor for.
+    """
+    db_name, file_path, filename = item
+    extractor = extractors.for_file(filename, enabled=ENABLED_EXTRACTORS)
+    if extractor.paged:
+        page_count = extractor.page_count(file_path)
+        step = max(PDF_PAGES_PER_TASK, 1)
+        return [(db_name, file_path, filename, first, min(first + step - 1, page_count), ocr_lang)
+                for first in range(1, page_count + 1, step)]
+    return [(db_name, file_path, filename, 1, 1, ocr_lang)]
+
+def extract_pages(task):
+    """
+    Extraction stage (runs in a worker process).
+    task = (db_name, file_path, filename, first_page, last_page, ocr_lang)
+    returns {"pages": [(page_number, text)], "timings": [(stage, seconds)]}; the timings are
+    recorded by the parent process (metrics of the extract processes are not scraped).
+    """
+    db_name, file_path, filename, first_page, last_page, ocr_lang = task
+    # Resolved (and imported) inside the extract process, on the first file of its type
+    extractor = extractors.for_file(filename, enabled=ENABLED_EXTRACTORS)
+    return extractor.extract(file_path, first_page, last_page, extract_options(db_name, ocr_lang, filename))
+
+_token_counter = None
+
+def count_tokens(text):
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(EMBEDDING_MODEL)
+    return _token_counter.count(text)
 
-    index = get_pinecone_index()
-    if not index: return
+def chunk_text(item, parts, timings=None):
+    """Chunking stage: packs the pages of a file into chunks and yields batches ready for embedding."""
+    db_name, file_path, filename = item
+    timings = timings or job_timings()
 
-    vectors = []
-    for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-        vectors.append({
+    tables = None  # stays None when the extractor did not look for tables
+
+    def pages():
+        nonlocal tables
+        for part in parts:
+            for stage, seconds in part["timings"]:
+                timings.add(stage, seconds)
+            if "tables" in part:
+                tables = (tables or []) + part["tables"]
+            yield from part["pages"]
+
+    def text_chunks():
+        for chunk in chunk_pages(pages(), max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, count_tokens=count_tokens):
+            yield chunk["text"], chunk["page_start"], chunk["page_end"]
+        # All parts are consumed by now
+        if tables is not None:
+            yield from table_chunks(db_name, filename, tables)
+
+    batch = []
+    count = 0
+    for i, (text, page_start, page_end) in enumerate(text_chunks()):
+        batch.append({
             "id": f"{db_name}_{filename}_{i}",
-            "values": emb,
+            "text": text,
             "metadata": {
-                "text": chunk,
+                "text": text,
                 "source": filename,
                 "db_name": db_name,
-                "page": i
+                "page": page_start,
+                "page_end": page_end
             }
         })
-        
-    batch_size = 50
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i:i+batch_size]
-        index.upsert(vectors=batch)
-        
-    log(f"✅ Finished processing {filename}.")
+        count += 1
+        if len(batch) >= BATCH_SIZE:
+            if count == len(batch):
+                clear_source(db_name, filename)  # before the first batch: nothing of the file is upserted yet
+            yield batch
+            batch = []
+    if batch:
+        if count == len(batch):
+            clear_source(db_name, filename)
+        yield batch
+
+    CHUNKS_TOTAL.inc(count)
+    if count:
+        log(f"Generated {count} chunks for {filename}.")
+    else:
+        log(f"⚠️ No text extracted from {filename}. Skipping embedding.")
+
+def clear_source(db_name, filename):
+    """
+    Removes what an earlier ingestion of the file left in the vector store, chunk store and
+    BM25 index. Chunk ids are "<db>_<file>_<n>": a file that now yields fewer chunks would
+    otherwise keep its stale trailing chunks.
+    """
+    index = get_index()
+    if not index:
+        raise RuntimeError("Vector store unavailable")
+    index.delete_by_source(db_name, filename, namespace=db_entry(db_name)["namespace"])
+    get_chunk_store().delete_source(db_name, filename)
+    if LEXICAL_INDEX_ENABLED:
+        get_lexical_index(db_name).remove_source(filename)
+
+def table_chunks(db_name, filename, tables):
+    """Stores the file's tables (replacing earlier ones) and yields (text, page, page) row-group chunks."""
+    stored = get_table_store().replace_source(db_name, filename, tables)
+    if stored:
+        log(f"Stored {len(stored)} tables for {filename}.")
+    for table in stored:
+        title = f"Tablo ({filename}, sayfa {table['page']}): {' | '.join(table['header'])}"
+        rows = table["rows"]
+        start = 0
+        while start < len(rows):
+            # Row groups up to TABLE_ROWS_PER_CHUNK rows, fewer if the token budget is reached
+            end = min(start + max(TABLE_ROWS_PER_CHUNK, 1), len(rows))
+            while end - start > 1 and count_tokens(format_rows(table["header"], rows[start:end])) > CHUNK_TOKENS:
+                end = start + (end - start) // 2
+            yield f"{title}\n{format_rows(table['header'], rows[start:end])}", table["page"], table["page"]
+            start = end
+
+def vector_metadata(chunk_meta):
+    # Page span is always kept: a backend without the chunk store cites from this metadata
+    meta = {"db_name": chunk_meta["db_name"], "source": chunk_meta["source"],
+            "page": chunk_meta["page"], "page_end": chunk_meta["page_end"]}
+    if VECTOR_METADATA_TEXT:
+        meta["text"] = chunk_meta["text"]
+    return meta
+
+# Database settings the backend sent with the claimed jobs (its registry is the source of truth)
+_job_databases = {}
+
+def db_entry(db_name):
+    """
+    Vector namespace, embedding model and dimension of a database, as sent with the job.
+    Backends that do not send them: the worker's own registry.
+    """
+    entry = _job_databases.get(db_name)
+    return entry if entry is not None else get_db_registry().ensure(db_name)
+
+def embed_chunks(item, batch, timings=None):
+    """Embedding stage: turns a chunk batch into vectors for the vector store."""
+    entry = db_entry(item[0])
+    model = entry["embedding_model"]
+    with (timings or job_timings()).time("embed_batch"):
+        embeddings = get_embeddings_cached([c["text"] for c in batch], model, request_dimensions(model, entry["dimension"]))
+    if not embeddings:
+        return None
+    return [
+        {"id": c["id"], "values": emb, "metadata": vector_metadata(c["metadata"]), "chunk": c["metadata"]}
+        for c, emb in zip(batch, embeddings)
+    ]
+
+def upsert_vectors(item, vectors, timings=None):
+    index = get_index()
+    if not index:
+        raise RuntimeError("Vector store unavailable")
+    with (timings or job_timings()).time("upsert_batch"):
+        # Chunk text first, so a vector is never visible without it
+        get_chunk_store().put_many([{"id": v["id"], **v["chunk"]} for v in vectors])
+        index.upsert([{"id": v["id"], "values": v["values"], "metadata": v["metadata"]} for v in vectors],
+                     namespace=db_entry(item[0])["namespace"])
+        if LEXICAL_INDEX_ENABLED:
+            get_lexical_index(item[0]).add(
+                [v["id"] for v in vectors],
+                [v["chunk"]["text"] for v in vectors],
+                [v["chunk"]["source"] for v in vectors],
+            )
+    VECTORS_TOTAL.inc(len(vectors))
+
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def get_extract_pool():
+    """
+    Long-lived extraction processes shared by all jobs, so loaded OCR engines stay warm.
+    Recreated if a process died (the pool is then unusable).
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None and getattr(_extract_pool, "_broken", False):
+            log("⚠️ Extract pool broken, restarting it.")
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+        if _extract_pool is None and EXTRACT_WORKERS > 0:
+            # Workers without OCR extractors never load an OCR model
+            warm_up = OCR_WARMUP and OCR_ENABLED
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                initializer=ocr.warm_up if warm_up else None,
+                initargs=(OCR_LANG,) if warm_up else (),
+            )
+        return _extract_pool
+
+def build_pipeline(ocr_lang=OCR_LANG, timings=None, cancel=None):
+    timings = timings or job_timings()
+    return IngestPipeline(
+        extract_pages,
+        functools.partial(chunk_text, timings=timings),
+        functools.partial(embed_chunks, timings=timings),
+        functools.partial(upsert_vectors, timings=timings),
+        split_fn=functools.partial(split_document, ocr_lang=ocr_lang),
+        executor=get_extract_pool(),
+        extract_workers=EXTRACT_WORKERS,
+        embed_workers=EMBED_WORKERS,
+        upsert_workers=UPSERT_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        log=log,
+        cancel=cancel,
+    )
+
+def process_files(db_name, files, ocr_lang=None, timings=None, cancel=None):
+    """
+    Runs all (file_path, filename) pairs of a job through the staged pipeline. Returns per-file stats.
+    Raises PipelineCancelled if `cancel` is set (lease lost) before the files are done.
+    """
+    items = [(db_name, file_path, filename) for file_path, filename in files]
+    for _, _, filename in items:
+        log(f"Processing {filename}...")
+    stats = build_pipeline(ocr_lang or OCR_LANG, timings, cancel).run(items)
+    for filename, st in stats.items():
+        FILES_TOTAL.inc(status=st["status"])
+        if st["status"] == "ok":
+            log(f"✅ Finished processing {filename}.")
+    return stats
+
+def count_db_stats(db_name):
+    """Counts the database's vectors and chunks; sent in the job result, the backend records them."""
+    entry = db_entry(db_name)
+    chunks = get_chunk_store().count(db_name)
+    # Legacy databases share the default partition; there every chunk has exactly one vector
+    vectors = get_index().count(namespace=entry["namespace"]) if entry["namespace"] else chunks
+    return {"vectors": vectors, "chunks": chunks}
+
+def process_file_logic(db_name, file_path, filename, timings=None):
+    return process_files(db_name, [(file_path, filename)], timings=timings)[filename]
 
 # --- Main Loop ---
 
-def fetch_job():
-    url = f"{BACKEND_URL}/api/queue/pending"
+def fetch_job(wait=LONG_POLL_SECONDS):
+    """
+    Claims the next pending job under a lease, so no other worker gets it.
+    The backend holds the request open for up to `wait` seconds until a job arrives.
+    """
+    url = f"{BACKEND_URL}/api/queue/claim"
     try:
-        # log(f"Checking queue at: {url}") # Verbose log
-        resp = requests.get(url, timeout=5)
+        resp = requests.post(
+            url,
+            params={"wait": wait},
+            json={"worker_id": WORKER_ID, "lease_seconds": LEASE_SECONDS},
+            timeout=wait + 10,
+        )
         if resp.status_code == 200:
-            jobs = resp.json()
-            if jobs: return jobs[0]
+            return resp.json()
     except Exception as e:
         log(f"Connection Error: {e}")
     return None
 
+def update_job_status(job_id, status, result=None):
+    try:
+        resp = requests.post(
+            f"{BACKEND_URL}/api/queue/update/{job_id}",
+            params={"status": status, "worker_id": WORKER_ID},
+            json=result,
+            timeout=10,
+        )
+        if resp.status_code == 409:
+            log(f"⚠️ Lease for job {job_id} was lost; update '{status}' ignored by backend.")
+    except Exception as e:
+        log(f"Status update error: {e}")
+
+class LeaseHeartbeat:
+    """
+    Renews the job lease in the background while the job is being processed.
+    `lost` is set when the backend refuses a renewal: the job now belongs to another worker.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(LEASE_SECONDS / 3, 1)
+        while not self._stop.wait(interval):
+            try:
+                resp = requests.post(
+                    f"{BACKEND_URL}/api/queue/heartbeat/{self.job_id}",
+                    json={"worker_id": WORKER_ID, "lease_seconds": LEASE_SECONDS},
+                    timeout=10,
+                )
+                if resp.status_code == 409:
+                    log(f"⚠️ Lease lost for job {self.job_id}.")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                log(f"Heartbeat error: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+def process_job(job):
+    """Fetches a claimed job's files, runs them through the pipeline and reports the result to the backend."""
+    log(f"📥 Received Job: {job['id']} (DB: {job['db']}, attempt {job.get('attempts', 1)})")
+
+    timings = job_timings()
+    job_started = time.time()
+    if job.get("database"):
+        _job_databases[job["db"]] = job["database"]
+    db_stats = None
+    try:
+        with LeaseHeartbeat(job['id']) as lease:
+            with timings.time("fetch_files"):
+                files, stats, pinned = fetch_job_files(job)
+            try:
+                cache = get_embedding_cache()
+                cache_before = cache.counters() if cache else None
+                if files:
+                    stats.update(process_files(job['db'], files, ocr_lang=job.get('ocr_lang'), timings=timings,
+                                               cancel=lease.lost))
+                    try:
+                        db_stats = count_db_stats(job['db'])
+                    except Exception as e:
+                        log(f"⚠️ Could not count stats of {job['db']}: {e}")
+            finally:
+                if pinned:
+                    get_blob_cache().unpin(pinned)
+
+        if lease.lost.is_set():
+            raise PipelineCancelled()
+        result = {"files": stats, "timings": timings.summary(), "seconds": round(time.time() - job_started, 3)}
+        if db_stats:
+            result["db_stats"] = db_stats
+        if cache:
+            cache_after = cache.counters()
+            result["embedding_cache"] = {k: cache_after[k] - cache_before[k] for k in cache_after}
+            log(f"Embedding cache: {result['embedding_cache']['hits']} hits, {result['embedding_cache']['misses']} misses")
+
+        failed = [name for name, st in stats.items() if st["status"] == "failed"]
+        if failed and len(failed) == len(stats):
+            JOBS_TOTAL.inc(status="failed")
+            update_job_status(job['id'], "failed", result)
+            log(f"Job {job['id']} Failed ❌")
+        else:
+            JOBS_TOTAL.inc(status="completed")
+            update_job_status(job['id'], "completed", result)
+            log(f"Job {job['id']} Completed! ✅ ({result['seconds']:.1f}s)")
+    except PipelineCancelled:
+        # Requeued and possibly claimed by another worker: stop without reporting a status
+        log(f"⚠️ Job {job['id']} abandoned, its lease was lost.")
+        JOBS_TOTAL.inc(status="abandoned")
+    except Exception as e:
+        log(f"Error processing job: {e}")
+        JOBS_TOTAL.inc(status="failed")
+        update_job_status(job['id'], "failed", {"error": str(e), "timings": timings.summary()})
+
 def main():
-    log(f"🚀 Worker started. Connecting to: {BACKEND_URL}")
+    log(f"🚀 Worker {WORKER_ID} started. Connecting to: {BACKEND_URL}")
     log("Waiting for jobs...")
     
-    if not PINECONE_API_KEY: log("⚠️ PINECONE_API_KEY missing!")
+    if VECTOR_STORE_BACKEND == "pinecone" and not PINECONE_API_KEY: log("⚠️ PINECONE_API_KEY missing!")
     if not OPENAI_API_KEY: log("⚠️ OPENAI_API_KEY missing!")
+    for name in ENABLED_EXTRACTORS:
+        missing = extractors.EXTRACTORS[name].missing()
+        if missing:
+            log(f"⚠️ Extractor '{name}' disabled, missing: {', '.join(missing)}")
+    log(f"Extractors: {', '.join(ENABLED_EXTRACTORS)}")
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, log=log)
 
     while True:
+        started = time.time()
         job = fetch_job()
-        if job:
-            log(f"📥 Received Job: {job['id']} (DB: {job['db']})")
-            requests.post(f"{BACKEND_URL}/api/queue/update/{job['id']}", params={"status": "processing"})
-            
-            try:
-                files = job['files']
-                for f in files:
-                    local_f_path = os.path.join(LOCAL_STORAGE_PATH, f)
-                    # In a real scenario, we would download the file from Drive here.
-                    # For now, we assume it's uploaded or we create a dummy if testing.
-                    if not os.path.exists(local_f_path):
-                        log(f"File {f} not found locally. Creating dummy content for testing.")
-                        with open(local_f_path, 'w') as df: df.write("Dummy content for RAG testing.")
-                        
-                    process_file_logic(job['db'], local_f_path, f)
-                
-                requests.post(f"{BACKEND_URL}/api/queue/update/{job['id']}", params={"status": "completed"})
-                log(f"Job {job['id']} Completed! ✅")
-            except Exception as e:
-                log(f"Error processing job: {e}")
-                requests.post(f"{BACKEND_URL}/api/queue/update/{job['id']}", params={"status": "failed", "result": str(e)})
-        
-        time.sleep(5)
+        if not job:
+            # Long-poll returned early (connection error or backend without long-poll support):
+            # fall back to fixed interval polling.
+            if time.time() - started < 1:
+                time.sleep(POLL_INTERVAL)
+            continue
+
+        process_job(job)
 
 if __name__ == "__main__":
     main()
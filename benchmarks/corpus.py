@@ -0,0 +1,140 @@
+"""
+Synthetic corpus: deterministic text, PDF and image files of several sizes.
+
+Text is built from a fixed pseudo-word vocabulary, so every run (and machine) ingests
+exactly the same content. PDFs are written directly (one text layer per page, no
+dependencies); images need Pillow and are skipped without it.
+"""
+import os
+import json
+import random
+from typing import Dict, List
+
+# Pages per document for each size class
+SIZES = {"small": 1, "medium": 10, "large": 50}
+WORDS_PER_PAGE = 350
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "ba", "de", "fi", "go", "hu", "ja", "ko",
+              "la", "me", "no", "pa", "re", "si", "to", "un", "ve", "ya", "zu", "ar", "el", "in", "or", "us"]
+
+def vocabulary(size: int = 3000, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+class TextGenerator:
+    """Zipf-like word frequencies, sentences of 6-20 words, paragraphs of 3-7 sentences."""
+
+    def __init__(self, seed: int = 7):
+        self.rng = random.Random(seed)
+        self.words = vocabulary(seed=seed)
+        self.weights = [1.0 / (rank + 1) for rank in range(len(self.words))]
+
+    def sentence(self) -> str:
+        words = self.rng.choices(self.words, self.weights, k=self.rng.randint(6, 20))
+        return " ".join(words).capitalize() + "."
+
+    def page(self, words: int = WORDS_PER_PAGE) -> str:
+        paragraphs, count = [], 0
+        while count < words:
+            sentences = [self.sentence() for _ in range(self.rng.randint(3, 7))]
+            count += sum(len(s.split()) for s in sentences)
+            paragraphs.append(" ".join(sentences))
+        return "\n\n".join(paragraphs)
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(text: str, width: int = 90) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n\n"):
+        line = ""
+        for word in paragraph.split():
+            if len(line) + len(word) + 1 > width:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        lines.extend([line, ""])
+    return lines
+
+def write_pdf(path: str, pages: List[str]):
+    """Minimal PDF 1.4 with a Helvetica text layer on every A4 page."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, text in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        lines = _wrap(text)
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in lines[:70]) + " ET"
+        data = stream.encode("latin-1")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n" % num + objects[num] + b"\nendobj\n"
+    xref = len(out)
+    count = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % count
+    for num in range(1, count):
+        out += b"%010d 00000 n \n" % offsets[num]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_image(path: str, text: str) -> bool:
+    """Renders text onto a white page-sized PNG (for the OCR path). False without Pillow."""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return False
+    img = Image.new("L", (1240, 1754), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(_wrap(text, width=70)[:60]):
+        draw.text((60, 60 + i * 27), line, fill=0)
+    img.save(path, "PNG")
+    return True
+
+def generate(out_dir: str, sizes: Dict[str, int] = None, kinds=("txt", "pdf", "png"),
+             files_per_size: int = 2, seed: int = 7) -> List[Dict]:
+    """
+    Writes the corpus and returns its manifest:
+    [{"filename", "path", "kind", "size", "pages", "bytes"}]; also saved as manifest.json.
+    """
+    sizes = sizes or SIZES
+    os.makedirs(out_dir, exist_ok=True)
+    gen = TextGenerator(seed)
+    manifest = []
+    for size, page_count in sizes.items():
+        for n in range(files_per_size):
+            pages = [gen.page() for _ in range(page_count)]
+            for kind in kinds:
+                filename = f"{size}_{n:02d}.{kind}"
+                path = os.path.join(out_dir, filename)
+                if kind == "txt":
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write("\n\n".join(pages))
+                    doc_pages = 1  # a text file is a single page for the worker
+                elif kind == "pdf":
+                    write_pdf(path, pages)
+                    doc_pages = page_count
+                elif kind == "png":
+                    # One image is one page; large scans are represented by their first page
+                    if not write_image(path, pages[0]):
+                        continue
+                    doc_pages = 1
+                else:
+                    raise ValueError(f"Unknown kind {kind}")
+                manifest.append({"filename": filename, "path": path, "kind": kind, "size": size,
+                                 "pages": doc_pages, "bytes": os.path.getsize(path)})
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
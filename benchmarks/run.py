@@ -0,0 +1,334 @@
+"""
+Offline benchmarks: ingestion throughput and chat query latency.
+
+Everything runs locally and deterministically: a stub OpenAI-compatible server stands in
+for the embeddings and chat APIs, the embedded local vector store (VECTOR_STORE=local)
+for Pinecone, and a synthetic corpus for real documents.
+
+    python benchmarks/run.py                                   # ingest + query, default settings
+    python benchmarks/run.py ingest --sizes small,medium --kinds txt,pdf
+    python benchmarks/run.py query --concurrency 1,8,32 --requests 200
+    python benchmarks/run.py --output benchmarks/baseline.json  # save a baseline
+    python benchmarks/run.py --compare benchmarks/baseline.json # compare against it
+
+Results are written as JSON (--output, default benchmarks/results/<timestamp>.json).
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+sys.path.insert(0, BENCH_DIR)
+
+DB_NAME = "bench"
+
+# Metrics where a larger value is an improvement (everything else: smaller is better)
+HIGHER_IS_BETTER = ("files_per_min", "pages_per_sec", "requests_per_sec", "tokens_per_sec")
+
+def percentile(values, p):
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def latency_summary(values):
+    return {
+        "p50": _ms(percentile(values, 50)),
+        "p95": _ms(percentile(values, 95)),
+        "p99": _ms(percentile(values, 99)),
+        "mean": _ms(sum(values) / len(values)) if values else None,
+        "max": _ms(max(values)) if values else None,
+    }
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+def configure_environment(workdir, stub_url, args):
+    """Points backend and worker at the stub and at fresh local stores. Must run before their import."""
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": stub_url,
+        "VECTOR_STORE": "local",
+        "EMBEDDING_DIMENSION": str(args.dimension),
+        "LOCAL_VECTOR_PATH": os.path.join(workdir, "vector_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index"),
+        "CHUNK_STORE_PATH": os.path.join(workdir, "chunk_store.sqlite3"),
+        "QUEUE_DB_PATH": os.path.join(workdir, "queue_db.sqlite3"),
+        "FILE_REGISTRY_PATH": os.path.join(workdir, "file_registry.sqlite3"),
+        "BLOB_STORAGE_PATH": os.path.join(workdir, "blobs"),
+        "WORKER_BLOB_CACHE_PATH": os.path.join(workdir, "blob_cache"),
+        # Cold runs: every chunk is embedded, every question is answered
+        "WORKER_EMBEDDING_CACHE": "1" if args.embedding_cache else "0",
+        "ANSWER_CACHE_SIMILARITY": "0",
+        "WORKER_OCR_WARMUP": "0",
+    })
+    if args.extract_processes is not None:
+        os.environ["WORKER_EXTRACT_PROCESSES"] = str(args.extract_processes)
+    # The worker keeps its files under ./local_storage
+    os.chdir(workdir)
+
+def missing_dependency(kind):
+    if kind == "pdf" and importlib.util.find_spec("pdfplumber") is None:
+        return "pdfplumber not installed"
+    if kind == "png":
+        if importlib.util.find_spec("PIL") is None:
+            return "Pillow not installed"
+        if importlib.util.find_spec("paddleocr") is None and importlib.util.find_spec("pytesseract") is None:
+            return "no OCR engine installed"
+    return None
+
+def bench_ingest(manifest, log):
+    """files/min and pages/sec of process_file_logic, per kind and size, files processed one after another."""
+    import worker_local
+    from core import metrics
+
+    groups, skipped = {}, {}
+    totals = {"files": 0, "pages": 0, "seconds": 0.0, "failed": 0, "chunks": 0}
+    timings = metrics.StageTimings()
+    for entry in manifest:
+        reason = missing_dependency(entry["kind"])
+        if reason:
+            skipped[entry["kind"]] = reason
+            continue
+        started = time.perf_counter()
+        stats = worker_local.process_file_logic(DB_NAME, entry["path"], entry["filename"], timings=timings)
+        elapsed = time.perf_counter() - started
+
+        group = groups.setdefault(f"{entry['kind']}/{entry['size']}",
+                                  {"files": 0, "pages": 0, "seconds": 0.0, "failed": 0, "chunks": 0, "bytes": 0})
+        ok = stats["status"] != "failed"
+        for target in (group, totals):
+            target["files"] += 1
+            target["seconds"] += elapsed
+            target["chunks"] += stats.get("chunks", 0)
+            target["failed"] += 0 if ok else 1
+            target["pages"] += entry["pages"] if ok else 0
+        group["bytes"] += entry["bytes"]
+        if not ok:
+            log(f"ingest failed for {entry['filename']}: {stats.get('error')}")
+
+    for group in [*groups.values(), totals]:
+        seconds = group["seconds"] or 1e-9
+        group["seconds"] = round(group["seconds"], 3)
+        group["files_per_min"] = round(group["files"] / seconds * 60, 2)
+        group["pages_per_sec"] = round(group["pages"] / seconds, 2)
+    return {"total": totals, "groups": groups, "stages": timings.summary(), "skipped": skipped}
+
+def start_backend(log):
+    """Runs the FastAPI app with uvicorn in a background thread; returns (server, base_url)."""
+    import socket
+    import uvicorn
+    import main
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True, name="backend").start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("backend did not start")
+        time.sleep(0.05)
+    log(f"backend on http://127.0.0.1:{port}")
+    return server, f"http://127.0.0.1:{port}"
+
+def questions(n, seed=11):
+    """Questions made of corpus words (so retrieval finds chunks), unique so no answer cache hits."""
+    from corpus import TextGenerator
+    gen = TextGenerator(seed)
+    return [f"{gen.sentence()[:-1]} {i}?" for i in range(n)]
+
+async def _chat(client, url, question, provider, model):
+    payload = {"db_name": DB_NAME, "messages": [{"role": "user", "content": question}],
+               "llm_provider": provider, "llm_model": model}
+    started = time.perf_counter()
+    first = None
+    error = None
+    cited = False
+    async with client.stream("POST", url, json=payload) as resp:
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[6:]
+            if data.startswith("Error"):
+                error = data
+            cited = cited or "Kaynaklar" in data  # citations: retrieval found context
+            if first is None:
+                first = time.perf_counter() - started
+            if data == "[DONE]":
+                break
+    if error is None and resp.status_code != 200:
+        error = f"HTTP {resp.status_code}"
+    return first, time.perf_counter() - started, error, cited
+
+async def _load(base_url, concurrency, total, provider, model):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+    results = []
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def one(q):
+            async with sem:
+                results.append(await _chat(client, f"{base_url}/api/query/chat", q, provider, model))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in questions(total, seed=concurrency)))
+        wall = time.perf_counter() - started
+    return results, wall
+
+def bench_query(base_url, levels, total, provider, model, log):
+    """p50/p95/p99 latency and time-to-first-token of /api/query/chat per concurrency level."""
+    report = {}
+    for concurrency in levels:
+        results, wall = asyncio.run(_load(base_url, concurrency, total, provider, model))
+        errors = [e for _, _, e, _ in results if e]
+        ok = [(ttft, latency) for ttft, latency, e, _ in results if not e and ttft is not None]
+        report[str(concurrency)] = {
+            "requests": len(results),
+            "errors": len(errors),
+            "answers_with_sources": sum(1 for *_, cited in results if cited),
+            "requests_per_sec": round(len(ok) / wall, 2) if wall else None,
+            "latency_ms": latency_summary([l for _, l in ok]),
+            "ttft_ms": latency_summary([t for t, _ in ok]),
+        }
+        if errors:
+            log(f"concurrency {concurrency}: {len(errors)} errors, first: {errors[0]}")
+        log(f"concurrency {concurrency}: p50 {report[str(concurrency)]['latency_ms']['p50']} ms, "
+            f"ttft p50 {report[str(concurrency)]['ttft_ms']['p50']} ms")
+    return report
+
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+def compare(current, baseline, tolerance):
+    """Relative change of every shared metric; regressions are changes for the worse beyond the tolerance (%)."""
+    cur, base = flatten(current["results"]), flatten(baseline["results"])
+    rows, regressions = [], []
+    for key in sorted(set(cur) & set(base)):
+        old, new = base[key], cur[key]
+        if not old:
+            continue
+        change = (new - old) / abs(old) * 100
+        better = change > 0 if key.split(".")[-1] in HIGHER_IS_BETTER else change < 0
+        rows.append((key, old, new, change))
+        relevant = any(k in key for k in ("per_min", "per_sec", "latency_ms", "ttft_ms"))
+        if relevant and not better and abs(change) > tolerance:
+            regressions.append(key)
+    return rows, regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="all", choices=["all", "ingest", "query"])
+    parser.add_argument("--sizes", default="small,medium,large", help="corpus size classes (see corpus.SIZES)")
+    parser.add_argument("--kinds", default="txt,pdf,png", help="file kinds to generate")
+    parser.add_argument("--files-per-size", type=int, default=2)
+    parser.add_argument("--concurrency", default="1,4,16", help="query concurrency levels")
+    parser.add_argument("--requests", type=int, default=50, help="chat requests per concurrency level")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--dimension", type=int, default=256, help="embedding dimension of the stub")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="stub seconds per embeddings request")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="stub seconds before the first token")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="stub seconds between tokens")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--extract-processes", type=int, default=None, help="WORKER_EXTRACT_PROCESSES override")
+    parser.add_argument("--embedding-cache", action="store_true", help="keep the worker embedding cache enabled")
+    parser.add_argument("--workdir", default=None, help="where stores and corpus go (default: a temp dir)")
+    parser.add_argument("--output", default=None, help="result JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed regression in percent")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    log = lambda msg: print(f"[bench] {msg}", flush=True)
+    output = os.path.abspath(args.output or os.path.join(BENCH_DIR, "results", time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="rag-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+
+    from stubs import StubConfig, start_stub
+    import corpus
+
+    stub, stub_url = start_stub(StubConfig(
+        dimension=args.dimension, embed_latency=args.embed_latency, first_token_latency=args.first_token_latency,
+        token_interval=args.token_interval, answer_tokens=args.answer_tokens,
+    ))
+    configure_environment(workdir, stub_url, args)
+    log(f"workdir {workdir}, stub {stub_url}")
+
+    sizes = {s: corpus.SIZES[s] for s in args.sizes.split(",") if s}
+    kinds = [k for k in args.kinds.split(",") if k]
+    if args.mode == "query":
+        # Only something to search in; not measured
+        sizes, kinds = {"medium": corpus.SIZES["medium"]}, ["txt"]
+    manifest = corpus.generate(os.path.join(workdir, "corpus"), sizes, kinds, files_per_size=args.files_per_size)
+    log(f"corpus: {len(manifest)} files, {sum(e['pages'] for e in manifest)} pages")
+
+    results = {}
+    ingest = bench_ingest(manifest, log)
+    if args.mode in ("all", "ingest"):
+        results["ingest"] = ingest
+        t = ingest["total"]
+        log(f"ingest: {t['files']} files in {t['seconds']}s, {t['files_per_min']} files/min, {t['pages_per_sec']} pages/s")
+        for kind, reason in ingest["skipped"].items():
+            log(f"ingest: skipped {kind} ({reason})")
+
+    if args.mode in ("all", "query"):
+        server, base_url = start_backend(log)
+        try:
+            levels = [int(c) for c in args.concurrency.split(",") if c]
+            results["query"] = bench_query(base_url, levels, args.requests, args.provider, args.model, log)
+        finally:
+            server.should_exit = True
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")},
+        "stub": dict(stub.RequestHandlerClass.counters),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    log(f"results written to {output}")
+    stub.shutdown()
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.tolerance)
+        if not rows:
+            log("no metrics in common with the baseline (different modes or concurrency levels?)")
+        for key, old, new, change in rows:
+            mark = "  <-- regression" if key in regressions else ""
+            print(f"{key:60s} {old:>12} -> {new:>12} ({change:+.1f}%){mark}")
+        if regressions:
+            log(f"{len(regressions)} regressions beyond {args.tolerance}%")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Deterministic local stand-in for the OpenAI-compatible APIs used by the backend and the worker.
+
+POST /v1/embeddings          feature-hashed bag-of-words vectors (same text -> same vector)
+POST /v1/chat/completions    streamed (or plain) answer with a configurable time to first token
+"""
+import json
+import math
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.lexical import tokenize
+
+# Shared component of every vector: unrelated texts score ~0.67, texts sharing words clear
+# the backend's 0.70 dense score threshold, like real embeddings of one domain do.
+BIAS = math.sqrt(2.0)
+
+def embed(text: str, dimension: int) -> list:
+    vec = [0.0] * dimension
+    for term in tokenize(text):
+        h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big")
+        vec[1 + h % (dimension - 1)] += 1.0 if (h >> 63) else -1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    if not norm:
+        return [1.0] + [0.0] * (dimension - 1)
+    # cosine(a, b) = (cosine of the word parts + BIAS^2) / (1 + BIAS^2)
+    scale = 1.0 / math.sqrt(1.0 + BIAS * BIAS)
+    vec = [v / norm * scale for v in vec]
+    vec[0] = BIAS * scale
+    return vec
+
+class StubConfig:
+    def __init__(self, dimension=1536, embed_latency=0.02, embed_latency_per_input=0.0005,
+                 first_token_latency=0.3, token_interval=0.01, answer_tokens=60):
+        self.dimension = dimension
+        self.embed_latency = embed_latency
+        self.embed_latency_per_input = embed_latency_per_input
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.answer_tokens = answer_tokens
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = StubConfig()
+    counters = {"embedding_requests": 0, "embedding_inputs": 0, "chat_requests": 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if self.path.endswith("/embeddings"):
+            return self._embeddings(body)
+        if self.path.endswith("/chat/completions"):
+            return self._chat(body)
+        self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _embeddings(self, body):
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        with self.lock:
+            self.counters["embedding_requests"] += 1
+            self.counters["embedding_inputs"] += len(inputs)
+        cfg = self.config
+        time.sleep(cfg.embed_latency + cfg.embed_latency_per_input * len(inputs))
+        dimension = body.get("dimensions") or cfg.dimension
+        data = [{"object": "embedding", "index": i, "embedding": embed(str(t), dimension)} for i, t in enumerate(inputs)]
+        self._json(200, {"object": "list", "data": data, "model": body.get("model"),
+                         "usage": {"prompt_tokens": 0, "total_tokens": 0}})
+
+    def _chat(self, body):
+        with self.lock:
+            self.counters["chat_requests"] += 1
+        cfg = self.config
+        model = body.get("model", "stub")
+        words = [f" word{i}" for i in range(cfg.answer_tokens)]
+        time.sleep(cfg.first_token_latency)
+        if not body.get("stream"):
+            return self._json(200, {
+                "id": "stub", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(cfg.token_interval)
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                self._chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self._chunk(b"data: [DONE]\n\n")
+            self._chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _json(self, status, payload):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(config: StubConfig):
+    """Starts the stub on a free port; returns (server, base_url ending in /v1)."""
+    handler = type("Handler", (StubHandler,), {"config": config, "counters": dict(StubHandler.counters)})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="openai-stub").start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
@@ -37,7 +37,9 @@ export default function ImagesPage() {
       <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mt-6">
         {images.map(img => (
           <div key={img.id} className="border rounded p-2 bg-white">
-            <img src={img.url} alt={img.name} className="w-full h-40 object-cover mb-2" />
+            <a href={img.preview_url || img.url} target="_blank" rel="noreferrer">
+              <img src={img.thumb_url || img.url} alt={img.name} loading="lazy" className="w-full h-40 object-cover mb-2" />
+            </a>
             <p className="text-xs truncate">{img.name}</p>
           </div>
         ))}
@@ -5,21 +5,44 @@ export default function Dashboard() {
   const [queue, setQueue] = useState([]);
 
   useEffect(() => {
-    // Poll queue status
-    const fetchQueue = async () => {
+    const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+    let events = null;
+    let retryTimer = null;
+    let cancelled = false;
+
+    // Merge changed jobs into the list (newest first)
+    const mergeJob = (job) => {
+      setQueue(prev => {
+        const rest = prev.filter(j => j.id !== job.id);
+        return [job, ...rest].sort((a, b) => b.created_at.localeCompare(a.created_at)).slice(0, 50);
+      });
+    };
+
+    // Latest page once, then only changes: the server pushes every job update.
+    // If the first fetch fails (backend not up yet), retry with backoff up to 30s.
+    const loadQueue = async (attempt = 0) => {
       try {
-        const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-        const res = await fetch(`${API_URL}/api/queue`);
+        const res = await fetch(`${API_URL}/api/queue?limit=50&order=desc`);
+        if (!res.ok) throw new Error(`Queue request failed: ${res.status}`);
         const data = await res.json();
+        if (cancelled) return;
         setQueue(data.jobs || []);
+        events = new EventSource(`${API_URL}/api/queue/events?since=${data.seq || 0}`);
+        events.addEventListener('job', (e) => mergeJob(JSON.parse(e.data)));
       } catch (e) {
         console.error(e);
+        if (!cancelled) {
+          retryTimer = setTimeout(() => loadQueue(attempt + 1), Math.min(1000 * 2 ** attempt, 30000));
+        }
       }
     };
-    
-    fetchQueue();
-    const interval = setInterval(fetchQueue, 5000);
-    return () => clearInterval(interval);
+
+    loadQueue();
+    return () => {
+      cancelled = true;
+      clearTimeout(retryTimer);
+      if (events) events.close();
+    };
   }, []);
 
   return (
@@ -0,0 +1,63 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core import lru
+from core.answer_cache import AnswerCache, history_digest
+
+EVENTS = ['data: {"type": "token", "content": "Merhaba"}\n\n', "data: [DONE]\n\n"]
+
+def test_exact_and_similar_questions_hit():
+    cache = AnswerCache(maxsize=10, ttl=60, similarity=0.95)
+    cache.put("db", "gpt-4o", "Fatura ne zaman kesilir?", EVENTS, embedding=[1.0, 0.0, 0.0])
+    # Exact: case, whitespace and punctuation do not matter
+    assert cache.get("db", "gpt-4o", "  fatura NE zaman kesilir ") == EVENTS
+    # Similar: cosine >= 0.95 with a stored question of the same group
+    assert cache.get("db", "gpt-4o", "Faturalar ne zaman kesiliyor?", embedding=[0.99, 0.1, 0.0]) == EVENTS
+    assert cache.get("db", "gpt-4o", "Başka bir soru", embedding=[0.0, 1.0, 0.0]) is None
+    # Other database or model: no hit
+    assert cache.get("db2", "gpt-4o", "Fatura ne zaman kesilir?", embedding=[1.0, 0.0, 0.0]) is None
+    assert cache.get("db", "claude", "Fatura ne zaman kesilir?") is None
+
+def test_history_isolates_follow_up_questions():
+    cache = AnswerCache(maxsize=10, ttl=60)
+    history = history_digest(["Ankara şubesi hakkında bilgi ver"])
+    cache.put("db", "m", "Telefon numarası nedir?", EVENTS, history=history, embedding=[1.0, 0.0])
+    assert cache.get("db", "m", "Telefon numarası nedir?", history=history) == EVENTS
+    assert cache.get("db", "m", "Telefon numarası nedir?") is None
+    other = history_digest(["İzmir şubesi hakkında bilgi ver"])
+    assert cache.get("db", "m", "Telefon numarası nedir?", history=other, embedding=[1.0, 0.0]) is None
+
+def test_new_generation_invalidates_answers():
+    cache = AnswerCache(maxsize=10, ttl=60)
+    generation = cache.generation("db")
+    cache.put("db", "m", "Soru?", EVENTS, embedding=[1.0, 0.0])
+    cache.invalidate_db("db")  # new vectors landed
+    assert cache.get("db", "m", "Soru?") is None
+    assert cache.get("db", "m", "Soru", embedding=[1.0, 0.0]) is None
+    # An answer retrieved before the invalidation is never served as fresh
+    cache.put("db", "m", "Soru?", EVENTS, generation=generation)
+    assert cache.get("db", "m", "Soru?") is None
+    cache.put("db", "m", "Soru?", EVENTS)
+    assert cache.get("db", "m", "Soru?") == EVENTS
+
+def test_ttl_expiry_drops_answer_and_embedding(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(maxsize=10, ttl=60)
+    cache.put("db", "m", "Soru?", EVENTS, embedding=[1.0, 0.0])
+    now[0] += 30
+    assert cache.get("db", "m", "Soru?") == EVENTS
+    now[0] += 61
+    assert cache.get("db", "m", "Soru?") is None
+    assert cache._vectors == {}
+
+def test_embeddings_are_bounded_by_entries():
+    cache = AnswerCache(maxsize=5, ttl=60)
+    # Every conversation has its own history, i.e. its own group
+    for i in range(50):
+        cache.put("db", "m", f"Soru {i}?", EVENTS, history=history_digest([f"tur {i}"]), embedding=[1.0, float(i)])
+    assert len(cache._vectors) == 5
+    assert sum(len(g) for g in cache._vectors.values()) == 5
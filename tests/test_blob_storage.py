@@ -0,0 +1,85 @@
+import sys
+import os
+import io
+import hashlib
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.blob_storage import DriveBlobStorage, LocalBlobStorage
+from core.blob_cache import BlobCache
+
+class CountingStorage(LocalBlobStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = 0
+        self._count_lock = threading.Lock()
+
+    def get(self, ref, dest_path):
+        with self._count_lock:
+            self.downloads += 1
+        super().get(ref, dest_path)
+
+def test_local_storage_is_content_addressed(tmp_path):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    ref = storage.put("db", "a.txt", io.BytesIO(b"hello"))
+    assert ref == hashlib.sha256(b"hello").hexdigest()
+    assert storage.put("other", "b.txt", io.BytesIO(b"hello")) == ref
+
+    storage.get(ref, str(tmp_path / "out"))
+    assert (tmp_path / "out").read_bytes() == b"hello"
+
+def test_blob_cache_read_through_prefetch_and_eviction(tmp_path):
+    storage = CountingStorage(str(tmp_path / "blobs"))
+    blobs = []
+    for i in range(3):
+        ref = storage.put("db", f"{i}.bin", io.BytesIO(bytes([i]) * 100))
+        blobs.append({"sha256": ref, "storage_id": ref})
+
+    cache = BlobCache(str(tmp_path / "cache"), storage, max_bytes=250, download_workers=3)
+    futures = cache.prefetch(blobs[:2] + blobs[:1])
+    paths = {sha: f.result() for sha, f in futures.items()}
+    assert storage.downloads == 2
+    assert open(paths[blobs[0]["sha256"]], "rb").read() == bytes([0]) * 100
+
+    # Second job with the same content: served from the cache
+    cache.unpin(list(futures))
+    cache.get(blobs[0]["sha256"], blobs[0]["storage_id"])
+    assert storage.downloads == 2 and cache.hits == 1
+
+    # Over the size limit: the least recently used blob (1) goes
+    cache.get(blobs[2]["sha256"], blobs[2]["storage_id"])
+    assert cache.size() == 200
+    assert not os.path.exists(os.path.join(str(tmp_path / "cache"), blobs[1]["sha256"]))
+
+    # Restart keeps the cached files
+    assert BlobCache(str(tmp_path / "cache"), storage, max_bytes=250).size() == 200
+
+def test_blob_cache_redownload_of_a_removed_file_keeps_the_size(tmp_path):
+    storage = CountingStorage(str(tmp_path / "blobs"))
+    ref = storage.put("db", "a.bin", io.BytesIO(b"x" * 100))
+    cache = BlobCache(str(tmp_path / "cache"), storage, max_bytes=250)
+    for _ in range(3):
+        path = cache.get(ref, ref)
+        os.remove(path)  # e.g. cleaned up by hand
+    assert storage.downloads == 3
+    assert cache.size() == 100
+
+def test_drive_folder_query_escapes_quotes():
+    queries = []
+
+    class FakeList:
+        def __init__(self, params):
+            queries.append(params["q"])
+
+        def GetList(self):
+            return [{"id": "folder-1"}]
+
+    class FakeDrive:
+        ListFile = FakeList
+
+    storage = DriveBlobStorage()
+    storage._drive = FakeDrive()
+    assert storage._folder("O'Brien \\ docs", "root") == "folder-1"
+    assert queries[0].startswith("title = 'O\\'Brien \\\\ docs' and 'root' in parents")
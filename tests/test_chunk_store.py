@@ -0,0 +1,25 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.chunk_store import ChunkStore
+
+def test_chunk_store_roundtrip_and_source_delete(tmp_path):
+    store = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    store.put_many([
+        {"id": f"db_a.pdf_{i}", "text": f"Bölüm {i} metni. " * 20, "db_name": "db", "source": "a.pdf", "page": i + 1, "page_end": i + 2}
+        for i in range(3)
+    ] + [{"id": "db_b.txt_0", "text": "other", "db_name": "db", "source": "b.txt", "page": 1, "page_end": 1}])
+
+    found = store.get_many(["db_a.pdf_2", "missing", "db_b.txt_0", "db_a.pdf_2"])
+    assert set(found) == {"db_a.pdf_2", "db_b.txt_0"}
+    assert found["db_a.pdf_2"] == {"db_name": "db", "source": "a.pdf", "page": 3, "page_end": 4, "text": "Bölüm 2 metni. " * 20}
+
+    # Re-chunking replaces by id without touching the vector index
+    store.put_many([{"id": "db_b.txt_0", "text": "rechunked", "db_name": "db", "source": "b.txt", "page": 1, "page_end": 1}])
+    assert store.get_many(["db_b.txt_0"])["db_b.txt_0"]["text"] == "rechunked"
+
+    assert store.delete_source("db", "a.pdf") == 3
+    assert store.count("db") == 1
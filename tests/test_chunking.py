@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.chunking import chunk_pages
+
+def test_chunk_pages_boundaries_and_page_spans():
+    pages = [(1, "First sentence here. Second one follows."), (2, "Third sentence.\n\nNew paragraph on page two.")]
+    chunks = list(chunk_pages(pages, max_tokens=7, count_tokens=lambda t: len(t.split())))
+
+    assert [c["text"] for c in chunks] == [
+        "First sentence here. Second one follows.",
+        "Third sentence. New paragraph on page two.",
+    ]
+    assert [(c["page_start"], c["page_end"]) for c in chunks] == [(1, 1), (2, 2)]
+
+    # Chunks may span pages, and overlap repeats trailing sentences
+    chunks = list(chunk_pages(pages, max_tokens=6, overlap_tokens=3, count_tokens=lambda t: len(t.split())))
+    assert chunks[1]["text"].startswith("Second one follows. Third sentence.")
+    assert (chunks[1]["page_start"], chunks[1]["page_end"]) == (1, 2)
@@ -0,0 +1,33 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.context import Candidate, select_context, unique_sources
+
+def words(text):
+    return len(text.split())
+
+def test_mmr_drops_duplicates_and_respects_budget():
+    candidates = [
+        Candidate("a", 1.0, {"text": "kira bedeli her ay peşin ödenir", "source": "k.pdf", "page": 1}, [1.0, 0.0, 0.0]),
+        Candidate("a_copy", 0.9, {"text": "kira bedeli her ay peşin ödenir", "source": "k2.pdf", "page": 4}, [0.99, 0.01, 0.0]),
+        Candidate("b", 0.8, {"text": "depozito iki aylık kira tutarındadır", "source": "k.pdf", "page": 1}, [0.0, 1.0, 0.0]),
+        Candidate("long", 0.7, {"text": "uzun " * 50, "source": "x.pdf", "page": 9}, [0.0, 0.0, 1.0]),
+        # Lexical-only hit without a vector: compared by word overlap
+        Candidate("lex", 0.6, {"text": "kira bedeli her ay peşin ödenir mi", "source": "k3.pdf", "page": 2}),
+    ]
+    picked = select_context(candidates, budget_tokens=20, count_tokens=words, duplicate_threshold=0.8)
+
+    assert [c.id for c in picked] == ["a", "b"]
+    assert unique_sources(picked) == [{"source": "k.pdf", "page": 1, "page_end": None}]
+
+def test_mmr_prefers_diverse_chunk_over_similar_one():
+    candidates = [
+        Candidate("a", 1.0, {"text": "one"}, [1.0, 0.0]),
+        Candidate("similar", 0.95, {"text": "two"}, [0.9, 0.43]),
+        Candidate("different", 0.7, {"text": "three"}, [0.0, 1.0]),
+    ]
+    picked = select_context(candidates, budget_tokens=100, count_tokens=words, mmr_lambda=0.5, max_chunks=2)
+    assert [c.id for c in picked] == ["a", "different"]
@@ -0,0 +1,51 @@
+import sys
+import os
+
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.db_registry import DatabaseRegistry, DatabaseError
+
+def test_registry_persists_databases_and_counters(tmp_path):
+    path = str(tmp_path / "dbs.sqlite3")
+    registry = DatabaseRegistry(path)
+    entry = registry.create("Proje", embedding_model="text-embedding-3-large", dimension=1024)
+    assert (entry["namespace"], entry["embedding_model"], entry["dimension"]) == ("Proje", "text-embedding-3-large", 1024)
+    with pytest.raises(DatabaseError):
+        registry.create("Proje")
+
+    # Databases seen before the registry existed keep using the shared partition
+    legacy = registry.ensure("Eski", legacy=True)
+    assert legacy["namespace"] is None and legacy["dimension"] == 1536
+    assert registry.ensure("Eski", legacy=False)["namespace"] is None
+
+    registry.add_files("Proje", 2, 300)
+    registry.add_files("Proje", 1, 50)
+    registry.set_counts("Proje", ingested=True, vectors=40, chunks=40)
+
+    # Survives a restart
+    reopened = DatabaseRegistry(path)
+    assert reopened.names() == ["Proje", "Eski"]
+    stats = reopened.get("Proje")
+    assert (stats["files"], stats["bytes"], stats["vectors"], stats["chunks"]) == (3, 350, 40, 40)
+    assert stats["last_ingest_at"]
+
+    # Rebuild: counters cleared and the legacy database moves into its own namespace
+    rebuilt = reopened.reset("Eski")
+    assert rebuilt["namespace"] == "Eski" and rebuilt["vectors"] == 0
+    with pytest.raises(DatabaseError):
+        reopened.reset("Yok")
+    assert reopened.delete("Proje") and reopened.get("Proje") is None
+
+def test_unregistered_databases_with_shared_vectors_stay_legacy(tmp_path):
+    # e.g. DefaultDB after an upgrade: vectors in the shared partition, no chunk store rows
+    legacy_names = {"DefaultDB", "Eski"}
+    registry = DatabaseRegistry(str(tmp_path / "dbs.sqlite3"), has_legacy_data=lambda name: name in legacy_names)
+    assert registry.ensure("DefaultDB")["namespace"] is None
+    assert registry.create("Eski")["namespace"] is None
+    assert registry.ensure("Yeni")["namespace"] == "Yeni"
+    assert registry.create("Proje")["namespace"] == "Proje"
+    # Only /rebuild moves a legacy database into its own namespace
+    assert registry.reset("DefaultDB")["namespace"] == "DefaultDB"
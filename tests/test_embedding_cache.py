@@ -0,0 +1,21 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.embedding_cache import EmbeddingCache
+
+def test_embedding_cache_hits_and_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite3"), max_entries=2)
+    cache.put_many("m", ["hello  world", "foo"], [[1.0, 2.0], [3.0, 4.0]])
+
+    # Whitespace differences hit the same entry; other models do not
+    assert cache.get_many("m", ["hello world", "bar"]) == {0: [1.0, 2.0]}
+    assert cache.get_many("other", ["foo"]) == {}
+    assert cache.counters() == {"hits": 1, "misses": 2}
+
+    # "foo" is least recently used and gets evicted
+    cache.put_many("m", ["baz"], [[5.0, 6.0]])
+    assert len(cache) == 2
+    assert cache.get_many("m", ["foo", "baz", "hello world"]) == {1: [5.0, 6.0], 2: [1.0, 2.0]}
@@ -0,0 +1,80 @@
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.embeddings import EmbeddingExecutor, EmbeddingError, parse_retry_after
+
+class StubEmbeddings(BaseHTTPRequestHandler):
+    """OpenAI-compatible /embeddings stub. Inputs starting with 'flaky' fail once with 429, 'broken' always 500."""
+    calls = []
+    failed_once = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        inputs = body["input"]
+        self.calls.append(list(inputs))
+        first = inputs[0]
+        if first.startswith("broken"):
+            return self._send(500, {"error": "boom"})
+        if first.startswith("flaky") and first not in self.failed_once:
+            self.failed_once.add(first)
+            return self._send(429, {"error": "rate limited"}, {"Retry-After": "0"})
+        data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(inputs)]
+        self._send(200, {"data": list(reversed(data))})
+
+    def _send(self, status, payload, headers=None):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEmbeddings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+def test_batches_retries_and_order():
+    StubEmbeddings.calls = []
+    server, url = start_stub()
+    try:
+        executor = EmbeddingExecutor("test", base_url=url, max_batch_tokens=10, concurrency=3, backoff_base=0.01)
+        executor.tokens._enc = None  # use the ~4 chars/token estimate even if tiktoken is installed
+        texts = ["aaaa" * 8, "bb", "flaky-" + "c" * 30, "dddd"]
+        batches = executor.make_batches(texts)
+        assert batches == [[0, 1], [2], [3]]
+
+        vectors = executor.embed(texts)
+        assert vectors == [[float(len(t))] for t in texts]
+        # Only the rate limited batch was sent twice
+        assert len(StubEmbeddings.calls) == 4
+        assert sum(1 for c in StubEmbeddings.calls if c[0].startswith("flaky")) == 2
+    finally:
+        server.shutdown()
+
+def test_permanent_failure_raises():
+    server, url = start_stub()
+    try:
+        executor = EmbeddingExecutor("test", base_url=url, max_retries=2, backoff_base=0.01)
+        try:
+            executor.embed(["broken text"])
+            assert False, "expected EmbeddingError"
+        except EmbeddingError as e:
+            assert "1/1" in str(e)
+    finally:
+        server.shutdown()
+
+def test_parse_retry_after():
+    assert parse_retry_after({"Retry-After": "2"}) == 2.0
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({}) is None
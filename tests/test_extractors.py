@@ -0,0 +1,73 @@
+import sys
+import os
+import zipfile
+
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core import extractors
+from core.extractors import ExtractOptions, ExtractorUnavailable
+
+DOCX_BODY = """<?xml version="1.0" encoding="UTF-8"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>
+<w:p><w:r><w:t>Birinci sayfa.</w:t></w:r></w:p>
+<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Ürün</w:t></w:r></w:p></w:tc><w:tc><w:p><w:r><w:t>Fiyat</w:t></w:r></w:p></w:tc></w:tr>
+<w:tr><w:tc><w:p><w:r><w:t>Kalem</w:t></w:r></w:p></w:tc><w:tc><w:p><w:r><w:t>12</w:t></w:r></w:p></w:tc></w:tr></w:tbl>
+<w:p><w:r><w:br w:type="page"/><w:t>İkinci sayfa.</w:t></w:r></w:p>
+</w:body></w:document>"""
+
+def test_lookup_is_lazy_and_respects_enabled_extractors():
+    sys.modules.pop("core.extractors.word", None)
+    extractor = extractors.for_file("Rapor.DOCX")
+    assert extractor.name == "docx" and not extractor.loaded
+    assert "core.extractors.word" not in sys.modules
+
+    assert extractors.for_file("notes", mime_type="text/markdown").name == "text"
+    light = extractors.enabled_names("max:light")
+    assert "text" in light and "image" not in light and "pdf" not in light
+    with pytest.raises(ExtractorUnavailable, match="No enabled extractor"):
+        extractors.for_file("scan.png", enabled=light)
+    with pytest.raises(ExtractorUnavailable, match="Unsupported"):
+        extractors.for_file("archive.zip")
+    with pytest.raises(ValueError):
+        extractors.enabled_names("text,nope")
+
+def test_docx_pages_and_tables(tmp_path):
+    path = str(tmp_path / "rapor.docx")
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", DOCX_BODY)
+
+    result = extractors.for_file(path).extract(path, 1, 1, ExtractOptions())
+    assert result["pages"] == [(1, "Birinci sayfa.\n\nÜrün | Fiyat\n\nKalem | 12"), (2, "İkinci sayfa.")]
+    assert extractors.EXTRACTORS["docx"].loaded
+
+# As saved by Word: the explicit break is recorded again as a rendered break where page 2 starts,
+# and a paragraph flowing over a page boundary gets a rendered break in the middle
+DOCX_TWO_PAGES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>
+<w:p w:rsidR="00A1"><w:r><w:t>Birinci sayfa.</w:t></w:r></w:p>
+<w:p w:rsidR="00A1"><w:r><w:t xml:space="preserve">Son cümle. </w:t></w:r><w:r><w:br w:type="page"/></w:r></w:p>
+<w:p w:rsidR="00A1"><w:r><w:lastRenderedPageBreak/><w:t>İkinci sayfa.</w:t></w:r></w:p>
+<w:p w:rsidR="00A1"><w:r><w:t xml:space="preserve">Uzun paragraf </w:t></w:r><w:r><w:lastRenderedPageBreak/><w:t>üçüncü sayfada biter.</w:t></w:r></w:p>
+<w:sectPr><w:pgSz w:w="11906" w:h="16838"/></w:sectPr>
+</w:body></w:document>"""
+
+def test_docx_counts_each_page_break_once(tmp_path):
+    path = str(tmp_path / "iki.docx")
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", DOCX_TWO_PAGES)
+
+    result = extractors.for_file(path).extract(path, 1, 1, ExtractOptions())
+    assert result["pages"] == [(1, "Birinci sayfa.\n\nSon cümle. "), (2, "İkinci sayfa.\n\nUzun paragraf "),
+                               (3, "üçüncü sayfada biter.")]
+
+def test_ocr_extractors_declare_an_ocr_engine(monkeypatch):
+    assert extractors.Extractor("x", "x", requires=("json|no_such_pkg", "no_a|no_b")).missing() == ["no_a|no_b"]
+
+    real_find_spec = extractors.importlib.util.find_spec
+    monkeypatch.setattr(extractors.importlib.util, "find_spec",
+                        lambda name: None if name in ("paddleocr", "pytesseract") else real_find_spec(name))
+    assert extractors.EXTRACTORS["image"].missing() == ["paddleocr|pytesseract"]
+    assert "paddleocr|pytesseract" in extractors.EXTRACTORS["pdf_ocr"].missing()
@@ -0,0 +1,81 @@
+import sys
+import os
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.image_assets import ImageAssets, ImageNameTaken
+from core.text import unique_slug
+
+def write_file(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+def test_images_are_indexed_listed_and_renamed(tmp_path):
+    assets = ImageAssets(str(tmp_path / "images"))
+    page = write_file(tmp_path / "page.jpg", b"render-1")
+    for source, page_no in [("b.pdf", 1), ("a.pdf", 2), ("a.pdf", 1)]:
+        assets.add("db", source, page_no, page)
+    assets.add("other", "a.pdf", 1, page)
+
+    first = assets.list("db", limit=2)
+    assert [(i["source"], i["page"]) for i in first] == [("a.pdf", 1), ("a.pdf", 2)]
+    last = first[-1]
+    assert [i["name"] for i in assets.list("db", after=(last["source"], last["page"], last["id"]))] == ["b.pdf_page001.jpg"]
+    assert assets.count("db") == 3
+
+    # Rename only touches metadata: same id, same file, same ETag
+    entry = assets.find("db", "a.pdf_page001.jpg")
+    renamed = assets.rename("db", "a.pdf_page001.jpg", "kapak.jpg")
+    assert renamed["id"] == entry["id"] and renamed["path"] == entry["path"]
+    assert assets.etag(renamed) == assets.etag(entry)
+    assert assets.rename("db", "a.pdf_page001.jpg", "x.jpg") is None
+    with pytest.raises(ImageNameTaken):
+        assets.rename("db", "kapak.jpg", "a.pdf_page002.jpg")
+
+    # Re-rendering a page keeps its name and changes its ETag
+    assets.add("db", "a.pdf", 1, write_file(tmp_path / "page2.jpg", b"render-2"))
+    updated = assets.get(entry["id"])
+    assert updated["name"] == "kapak.jpg" and assets.etag(updated) != assets.etag(entry)
+    with open(assets.variant_path(updated), "rb") as f:
+        assert f.read() == b"render-2"
+
+    assert assets.delete_db("db") == 3
+    assert assets.count("db") == 0 and assets.count("other") == 1
+    assert not os.path.exists(os.path.join(str(tmp_path / "images"), unique_slug("db")))
+
+def test_similar_names_never_share_files(tmp_path):
+    assets = ImageAssets(str(tmp_path / "images"))
+    long_name = "Yillik_Faaliyet_Raporu_" * 4
+    renders = {}
+    # Sources sharing an 80-char slug prefix, names differing only in non-word characters, similar databases
+    for n, (db, source) in enumerate([("db", long_name + "Q1.pdf"), ("db", long_name + "Q2.pdf"),
+                                      ("db", "a b.pdf"), ("db", "a_b.pdf"), ("a b", "x.pdf"), ("a_b", "x.pdf")]):
+        renders[(db, source)] = f"render-{n}".encode()
+        assets.add(db, source, 1, write_file(tmp_path / f"page{n}.jpg", renders[(db, source)]))
+    for (db, source), data in renders.items():
+        with open(assets.variant_path(assets.get(assets.image_id(db, source, 1))), "rb") as f:
+            assert f.read() == data
+
+    assets.delete_db("a b")
+    with open(assets.variant_path(assets.get(assets.image_id("a_b", "x.pdf", 1))), "rb") as f:
+        assert f.read() == renders[("a_b", "x.pdf")]
+
+def test_variants_are_made_once_per_content(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    assets = ImageAssets(str(tmp_path / "images"))
+    entry = assets.add("db", "scan.pdf", 1, Image.new("RGB", (2000, 1000), "white"), variants=["thumb"])
+    assert (entry["width"], entry["height"]) == (2000, 1000)
+
+    thumb = assets.variant_path(entry, "thumb")
+    with Image.open(thumb) as img:
+        assert img.size == (256, 128)
+    assert assets.variant_path(entry, "thumb") == thumb
+    with Image.open(assets.variant_path(entry, "preview")) as img:
+        assert img.size == (1024, 512)
+    assert assets.etag(entry, "thumb") != assets.etag(entry, "preview")
+
+    # New content: stale variants are removed
+    assets.add("db", "scan.pdf", 1, Image.new("RGB", (2000, 1000), "black"))
+    assert not os.path.exists(thumb)
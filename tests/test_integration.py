@@ -1,63 +1,119 @@
 import sys
 import os
-import json
-import time
+import asyncio
 from unittest.mock import MagicMock, patch
 
 # Add backend to path
 sys.path.append(os.path.join(os.getcwd(), 'backend'))
 
-from api.queue import add_job, get_pending_jobs, update_job, JobCreate
+from api import queue
+from api.queue import add_job, get_pending_jobs, claim_job, update_job, get_store, ClaimRequest, JobCreate
+from core.db_registry import DatabaseRegistry
+import worker_local
 from worker_local import process_job
 
-def test_full_flow():
-    print("🚀 Starting Mock Integration Test...")
-
-    # 1. Test Queue Addition (Backend)
-    print("\n[1] Testing Job Queue Addition...")
-    job_data = JobCreate(db="TestDB", files=["mock_document.pdf"])
-    job = add_job(job_data)
-    print(f"    ✅ Job Created: ID={job.id}, Status={job.status}")
-
-    # 2. Verify Pending
-    pending = get_pending_jobs()
-    assert len(pending) > 0
-    print(f"    ✅ Pending jobs found: {len(pending)}")
-
-    # 3. Mock Worker Processing
-    print("\n[2] Testing Worker Processing Logic...")
-    
-    # Mocking requests.post used in worker to update backend
-    with patch('requests.post') as mock_post:
-        with patch('backend.worker_local.process_file_logic') as mock_logic:
-            with patch('backend.worker_local.upload_chroma_to_drive') as mock_sync:
-                
-                # Convert Job object to dict as worker expects JSON from API
-                job_dict = job.dict()
-                
-                # Run Worker Process
-                process_job(job_dict)
-                
-                # Check if worker tried to update status to 'processing'
-                mock_post.assert_any_call(
-                    f"http://localhost:8000/api/queue/update/{job.id}", 
-                    params={"status": "processing"}
-                )
-                print("    ✅ Worker signaled 'processing' state")
-                
-                # Check if worker tried to update status to 'completed'
-                mock_post.assert_any_call(
-                    f"http://localhost:8000/api/queue/update/{job.id}", 
-                    params={"status": "completed"}
-                )
-                print("    ✅ Worker signaled 'completed' state")
-
-    # 4. Verify Final State (Manually updating since mock request didn't actually hit API)
-    update_job(job.id, "completed")
-    print(f"\n[3] Final Job State in Backend: completed")
-
-    print("\n🎉 All Mock Tests Passed!")
-
-if __name__ == "__main__":
-    test_full_flow()
+def fake_backend(url, params=None, json=None, **kwargs):
+    """Routes the worker's status updates into the queue API in this process."""
+    response = MagicMock(status_code=200)
+    if "/api/queue/update/" in url:
+        job_id = url.rsplit("/", 1)[-1]
+        update_job(job_id, params["status"], json, worker_id=params["worker_id"])
+    return response
 
+def test_full_flow(tmp_path, monkeypatch):
+    monkeypatch.setattr(queue, "QUEUE_DB_PATH", str(tmp_path / "queue.sqlite3"))
+    monkeypatch.setattr(queue, "QUEUE_FILE", str(tmp_path / "queue.json"))
+    monkeypatch.setattr(queue, "_store", None)
+    monkeypatch.setattr(worker_local, "EMBEDDING_CACHE_ENABLED", False)
+    registry = DatabaseRegistry(str(tmp_path / "dbs.sqlite3"), embedding_model="text-embedding-3-large", dimension=1024)
+    monkeypatch.setattr(queue, "get_db_registry", lambda: registry)
+    monkeypatch.setattr(worker_local, "_job_databases", {})
+    counted = []
+    monkeypatch.setattr(worker_local, "count_db_stats", lambda db: counted.append(db) or {"vectors": 3, "chunks": 3})
+
+    # 1. Backend: job is queued and pending
+    job = add_job(JobCreate(db="TestDB", files=["mock_document.txt"]))
+    assert job.status == "pending"
+    assert [j["id"] for j in get_pending_jobs()] == [job.id]
+
+    # 2. Worker claims it under a lease
+    claimed = asyncio.run(claim_job(ClaimRequest(worker_id=worker_local.WORKER_ID), wait=0))
+    assert claimed["id"] == job.id and claimed["status"] == "processing"
+    # ...with the database settings of the backend's registry
+    assert claimed["database"] == {"namespace": "TestDB", "embedding_model": "text-embedding-3-large", "dimension": 1024}
+
+    # 3. Worker processes it and reports back
+    stats = {"mock_document.txt": {"status": "ok", "chunks": 3, "vectors": 3}}
+    with patch("worker_local.requests.post", side_effect=fake_backend) as mock_post, \
+            patch("worker_local.fetch_job_files", return_value=([("/tmp/mock_document.txt", "mock_document.txt")], {}, [])), \
+            patch("worker_local.process_files", return_value=stats) as mock_process:
+        process_job(claimed)
+
+    mock_process.assert_called_once()
+    assert counted == ["TestDB"]
+    assert worker_local.db_entry("TestDB")["embedding_model"] == "text-embedding-3-large"
+    assert mock_post.call_args.kwargs["params"] == {"status": "completed", "worker_id": worker_local.WORKER_ID}
+
+    # 4. Final state in the backend, with per-job stage timings
+    final = get_store().get_job(job.id)
+    assert final["status"] == "completed"
+    assert final["result"]["files"] == stats
+    assert "fetch_files" in final["result"]["timings"]
+    assert final["lease_owner"] is None
+    # Counts reported in the result are recorded in the backend's registry
+    entry = registry.get("TestDB")
+    assert (entry["vectors"], entry["chunks"]) == (3, 3) and entry["last_ingest_at"]
+
+def test_lost_lease_stops_the_job_without_reporting(monkeypatch):
+    monkeypatch.setattr(worker_local, "LEASE_SECONDS", 3)  # heartbeat every second
+    monkeypatch.setattr(worker_local, "EMBEDDING_CACHE_ENABLED", False)
+    posted = []
+
+    def backend(url, params=None, json=None, **kwargs):
+        posted.append(url)
+        # Another worker got the job: every renewal is refused
+        return MagicMock(status_code=409 if "/heartbeat/" in url else 200)
+
+    def process_files(db_name, files, ocr_lang=None, timings=None, cancel=None):
+        assert cancel.wait(10)
+        raise worker_local.PipelineCancelled()
+
+    with patch("worker_local.requests.post", side_effect=backend), \
+            patch("worker_local.fetch_job_files", return_value=([("/tmp/a.txt", "a.txt")], {}, [])), \
+            patch("worker_local.process_files", side_effect=process_files):
+        process_job({"id": "job-1", "db": "TestDB", "files": ["a.txt"]})
+
+    assert posted and not any("/api/queue/update/" in url for url in posted)
+
+def test_reingested_file_drops_its_stale_chunks(tmp_path, monkeypatch):
+    from core.vector_store import LocalVectorStore
+    from core.chunk_store import ChunkStore
+    from core.lexical import BM25Index
+
+    index = LocalVectorStore(str(tmp_path / "idx"), dimension=2, ann=False)
+    chunks = ChunkStore(str(tmp_path / "chunks.sqlite3"))
+    lexical = BM25Index(str(tmp_path / "bm25"))
+    monkeypatch.setattr(worker_local, "get_index", lambda: index)
+    monkeypatch.setattr(worker_local, "get_chunk_store", lambda: chunks)
+    monkeypatch.setattr(worker_local, "get_lexical_index", lambda db_name: lexical)
+    monkeypatch.setattr(worker_local, "_job_databases", {"db": {"namespace": "ns", "embedding_model": "m", "dimension": 2}})
+    monkeypatch.setattr(worker_local, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(worker_local, "CHUNK_TOKENS", 3)
+    monkeypatch.setattr(worker_local, "BATCH_SIZE", 2)
+
+    def ingest(filename, text):
+        item = ("db", f"/tmp/{filename}", filename)
+        for batch in worker_local.chunk_text(item, iter([{"timings": [], "pages": [(1, text)]}])):
+            vectors = [{"id": c["id"], "values": [1.0, 0.0], "metadata": worker_local.vector_metadata(c["metadata"]),
+                        "chunk": c["metadata"]} for c in batch]
+            worker_local.upsert_vectors(item, vectors)
+
+    ingest("a.pdf", "Bir iki üç. Dört beş altı. Yedi sekiz dokuz.")
+    ingest("b.pdf", "Başka dosya.")
+    assert index.count(namespace="ns") == 4 and chunks.count("db") == 4
+
+    # Re-chunked into fewer chunks: a.pdf_1 and a.pdf_2 must not linger
+    ingest("a.pdf", "Tek cümle.")
+    assert index.count(namespace="ns") == 2
+    assert sorted(chunks.get_many(["db_a.pdf_0", "db_a.pdf_1", "db_a.pdf_2", "db_b.pdf_0"])) == ["db_a.pdf_0", "db_b.pdf_0"]
+    assert lexical.search("dört") == [] and lexical.n_live == 2
@@ -0,0 +1,72 @@
+import sys
+import os
+import multiprocessing
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core import lexical
+from core.lexical import BM25Index, tokenize, reciprocal_rank_fusion
+from core.vector_store import Match
+
+def test_tokenize_turkish_and_identifiers():
+    assert tokenize("IŞIK İstanbul") == ["ışık", "istanbul"]
+    assert tokenize("Parça AB-1234 v2.1") == ["parça", "ab-1234", "ab", "1234", "v2.1", "v2", "1"]
+
+def test_bm25_incremental_refresh_and_compaction(tmp_path):
+    writer = BM25Index(str(tmp_path / "db"), compact_every=4)
+    writer.add(["d_a_0", "d_a_1"], ["pompa bakım kılavuzu", "AB-1234 conta değişimi"], ["a.pdf", "a.pdf"])
+    writer.add(["d_b_0"], ["genel bakım takvimi bakım"], ["b.pdf"])
+
+    assert writer.search("AB-1234")[0][0] == "d_a_1"
+    assert [doc for doc, _ in writer.search("bakım")] == ["d_b_0", "d_a_0"]
+
+    # A reader in another process sees new journal entries after refresh()
+    reader = BM25Index(str(tmp_path / "db"))
+    writer.remove_source("b.pdf")  # 4th journal entry triggers compaction
+    assert os.path.getsize(tmp_path / "db" / "journal.jsonl") == 0
+    reader.refresh()
+    assert [doc for doc, _ in reader.search("bakım")] == ["d_a_0"]
+
+    # Re-adding an id replaces the old document
+    writer.add(["d_a_0"], ["yeni içerik"], ["a.pdf"])
+    reader.refresh()
+    assert reader.search("pompa") == []
+    assert reader.n_live == 2
+
+def add_documents(path, worker, count):
+    index = BM25Index(path, compact_every=7)
+    for i in range(count):
+        index.add([f"w{worker}_{i}"], [f"belge {worker} numara {i}"], [f"w{worker}.pdf"])
+
+def test_concurrent_writers_lose_no_appends_to_compaction(tmp_path):
+    # Several worker processes appending to one database's journal while each compacts it
+    path = str(tmp_path / "db")
+    ctx = multiprocessing.get_context("fork")
+    writers = [ctx.Process(target=add_documents, args=(path, w, 40)) for w in range(4)]
+    for p in writers:
+        p.start()
+    for p in writers:
+        p.join()
+        assert p.exitcode == 0
+    assert BM25Index(path).n_live == 160
+
+def test_similar_database_names_get_separate_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical, "LEXICAL_INDEX_PATH", str(tmp_path))
+    monkeypatch.setattr(lexical, "_indexes", {})
+    # An index written under the old slug-only name is adopted by its database
+    legacy = BM25Index(str(tmp_path / "a_b"))
+    legacy.add(["a_b_x.pdf_0"], ["eski rapor"], ["x.pdf"])
+
+    lexical.get_lexical_index("a b").add(["a b_y.pdf_0"], ["gizli rapor"], ["y.pdf"])
+    assert [doc for doc, _ in lexical.get_lexical_index("a_b").search("rapor")] == ["a_b_x.pdf_0"]
+    assert [doc for doc, _ in lexical.get_lexical_index("a b").search("rapor")] == ["a b_y.pdf_0"]
+
+    lexical.drop_lexical_index("a b")
+    assert lexical.get_lexical_index("a b", create=False) is None
+    assert lexical.get_lexical_index("a_b", create=False).n_live == 1
+
+def test_reciprocal_rank_fusion():
+    dense = [Match("a", 0.9), Match("b", 0.8)]
+    lexical = [Match("c", 7.0), Match("b", 5.0)]
+    assert [m.id for m in reciprocal_rank_fusion([dense, lexical], top_k=2)] == ["b", "a"]
@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from api import llm
+from core.vector_store import Match
+
+class FakeChunks:
+    def get_many(self, ids):
+        return {"db_a.pdf_0": {"text": "Yerel metin", "source": "a.pdf"}}
+
+class FakeVectors:
+    def fetch(self, ids, namespace=None):
+        # Vector metadata with text (default worker) and without (WORKER_VECTOR_METADATA_TEXT=0)
+        return {"db_b.pdf_0": Match("db_b.pdf_0", 0.0, {"source": "b.pdf", "text": "Metadata metni"}),
+                "db_c.pdf_0": Match("db_c.pdf_0", 0.0, {"source": "c.pdf"})}
+
+def test_hits_without_text_are_dropped(monkeypatch):
+    monkeypatch.setattr(llm, "get_chunk_store", lambda create=False: FakeChunks())
+    monkeypatch.setattr(llm, "get_vector_store", lambda: FakeVectors())
+    matches = [Match(i, 1.0, {"db_name": "db"}) for i in ("db_a.pdf_0", "db_b.pdf_0", "db_c.pdf_0", "db_d.pdf_0")]
+    hydrated = llm.hydrate_matches(matches)
+    assert [(m.id, m.metadata["text"]) for m in hydrated] == [("db_a.pdf_0", "Yerel metin"), ("db_b.pdf_0", "Metadata metni")]
+
+    # Without a readable chunk store everything comes from vector metadata
+    monkeypatch.setattr(llm, "get_chunk_store", lambda create=False: None)
+    assert [m.id for m in llm.hydrate_matches(matches)] == ["db_b.pdf_0"]
+
+def test_malformed_json_settings_are_ignored(monkeypatch):
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", '{"gpt-4": 6000}')
+    assert llm.env_json("CONTEXT_TOKEN_BUDGETS") == {"gpt-4": 6000}
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", "{gpt-4: 6000")
+    assert llm.env_json("CONTEXT_TOKEN_BUDGETS") == {}
+    monkeypatch.setenv("CONTEXT_TOKEN_BUDGETS", "[1, 2]")
+    assert llm.env_json("CONTEXT_TOKEN_BUDGETS") == {}
+    monkeypatch.delenv("CONTEXT_TOKEN_BUDGETS")
+    assert llm.env_json("CONTEXT_TOKEN_BUDGETS") == {}
+
+def test_citations_keep_pages_without_a_chunk_store(monkeypatch):
+    import worker_local
+
+    # What the worker upserts, as seen by a backend that cannot read CHUNK_STORE_PATH
+    chunk = {"text": "Fatura ayın 5'inde kesilir.", "source": "rapor.pdf", "db_name": "db", "page": 3, "page_end": 4}
+    metadata = worker_local.vector_metadata(chunk)
+    monkeypatch.setattr(llm, "get_chunk_store", lambda create=False: None)
+    [match] = llm.hydrate_matches([Match("db_rapor.pdf_0", 1.0, metadata)])
+    _, sources = llm.assemble_context([(match, 1.0)], model="gpt-4")
+    assert [llm.format_citation(s) for s in sources] == ["• rapor.pdf (Sayfa 3-4)"]
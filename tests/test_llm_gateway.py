@@ -0,0 +1,155 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.llm_gateway import LLMGateway, LLMGatewayError, Provider, TokenBucket
+
+class StubChat(BaseHTTPRequestHandler):
+    """OpenAI-compatible streaming /chat/completions stub. Model 'ok' streams, 'broken' fails, 'slow' stalls first."""
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        self.calls.append(model)
+        if model == "broken":
+            raw = b'{"error": "boom"}'
+            self.send_response(500)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        if model == "slow":
+            time.sleep(1.0)
+        try:
+            for text in ["Hello", " world"]:
+                chunk = {"id": "x", "object": "chat.completion.chunk", "created": 0, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the gateway gave up on this call
+
+    def log_message(self, *args):
+        pass
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChat)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+def collect(gateway, model):
+    async def run():
+        try:
+            return "".join([t async for t in gateway.stream_chat("stub", model, [{"role": "user", "content": "hi"}])])
+        finally:
+            await gateway.aclose()
+    return asyncio.run(run())
+
+def test_failover_to_next_model():
+    StubChat.calls = []
+    server, url = start_stub()
+    try:
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, fallbacks={"stub/broken": ["stub/ok"]})
+        assert collect(gateway, "broken") == "Hello world"
+        assert StubChat.calls == ["broken", "ok"]
+    finally:
+        server.shutdown()
+
+def test_first_token_timeout_and_errors():
+    StubChat.calls = []
+    server, url = start_stub()
+    try:
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, first_token_timeout=0.2,
+                             fallbacks={"*": ["stub/ok"]})
+        assert collect(gateway, "slow") == "Hello world"
+
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, fallbacks={"stub/broken": ["none/ok"]})
+        try:
+            collect(gateway, "broken")
+            assert False, "expected LLMGatewayError"
+        except LLMGatewayError as e:
+            assert "stub/broken" in str(e)
+
+        gateway = LLMGateway({"stub": Provider("stub", url, None)})
+        try:
+            collect(gateway, "ok")
+            assert False, "expected LLMGatewayError"
+        except LLMGatewayError as e:
+            assert "Missing API Key" in str(e)
+    finally:
+        server.shutdown()
+
+def test_hedged_request_wins():
+    StubChat.calls = []
+    server, url = start_stub()
+    try:
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, hedge_after=0.1,
+                             fallbacks={"stub/slow": ["stub/ok"]})
+        started = time.monotonic()
+        assert collect(gateway, "slow") == "Hello world"
+        assert time.monotonic() - started < 0.9
+        assert StubChat.calls == ["slow", "ok"]
+    finally:
+        server.shutdown()
+
+def collect_many(gateway, model, n):
+    """n concurrent requests; each result is the answer text or the LLMGatewayError."""
+    async def one():
+        try:
+            return "".join([t async for t in gateway.stream_chat("stub", model, [{"role": "user", "content": "hi"}])])
+        except LLMGatewayError as e:
+            return e
+
+    async def run():
+        try:
+            return await asyncio.gather(*[one() for _ in range(n)])
+        finally:
+            await gateway.aclose()
+    return asyncio.run(run())
+
+def test_model_concurrency_queues_without_eating_first_token_budget():
+    StubChat.calls = []
+    server, url = start_stub()
+    try:
+        # The second call waits ~1s for the slot, then ~1s for its token: only the first-token part is timed
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, model_concurrency=1, first_token_timeout=1.5)
+        started = time.monotonic()
+        assert collect_many(gateway, "slow", 2) == ["Hello world", "Hello world"]
+        assert time.monotonic() - started >= 1.9  # served one after the other
+
+        gateway = LLMGateway({"stub": Provider("stub", url, "key")}, model_concurrency=1, queue_timeout=0.3)
+        results = collect_many(gateway, "slow", 2)
+        assert results.count("Hello world") == 1
+        errors = [r for r in results if isinstance(r, LLMGatewayError)]
+        assert len(errors) == 1 and "no free slot within" in str(errors[0])
+    finally:
+        server.shutdown()
+
+def test_token_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(600)  # 10 tokens per second
+        started = time.monotonic()
+        await bucket.acquire(600)
+        assert time.monotonic() - started < 0.05
+        await bucket.acquire(3)
+        waited = time.monotonic() - started
+        assert 0.25 <= waited < 0.6
+
+        # Requests larger than the capacity are capped to it instead of waiting forever
+        bucket = TokenBucket(60_000)
+        started = time.monotonic()
+        await bucket.acquire(10**9)
+        assert time.monotonic() - started < 0.05
+    asyncio.run(run())
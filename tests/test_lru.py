@@ -0,0 +1,71 @@
+import sys
+import os
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core import lru
+from core.lru import LRUCache
+from core.text import normalize_text
+
+def test_least_recently_used_is_evicted_first():
+    evicted = []
+    cache = LRUCache(maxsize=2, on_evict=lambda k, v: evicted.append((k, v)))
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert evicted == [("b", 2)]
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    assert cache.pop("a") == 1
+    assert evicted[-1] == ("a", 1)
+    assert cache.pop("a", "gone") == "gone"
+    assert len(cache) == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(lru.time, "monotonic", lambda: now[0])
+    evicted = []
+    cache = LRUCache(maxsize=10, ttl=5, on_evict=lambda k, v: evicted.append(k))
+    cache.put("a", 1)
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a", "expired") == "expired"
+    assert evicted == ["a"] and len(cache) == 0
+    # Re-putting starts a new lifetime
+    cache.put("a", 2)
+    now[0] += 4.9
+    assert cache.get("a") == 2
+
+def test_concurrent_get_and_put_stay_bounded():
+    cache = LRUCache(maxsize=50)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(2000):
+                key = (n * 7 + i) % 120
+                cache.put(key, key)
+                value = cache.get((key + 1) % 120)
+                assert value is None or value == (key + 1) % 120
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 8 * 2000
+
+def test_normalize_text_unifies_whitespace_and_unicode():
+    # "é" precomposed vs. "e" + combining accent, tabs/newlines vs. spaces
+    assert normalize_text("  Cafe\u0301\tmenü\n") == normalize_text("Caf\u00e9 menü")
+    assert normalize_text("a \n\n b") == "a b"
@@ -0,0 +1,51 @@
+import sys
+import os
+import urllib.request
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.metrics import Registry, StageTimings, serve
+
+def test_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("test_requests_total", "Requests", ["status"])
+    latency = registry.histogram("test_latency_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    requests.inc(status="ok")
+    requests.inc(2, status="ok")
+    latency.observe(0.05, stage="embed")
+    latency.observe(0.5, stage="embed")
+    latency.observe(3, stage="embed")
+    assert registry.counter("test_requests_total", "Requests", ["status"]) is requests
+
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{status="ok"} 3' in text
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="embed",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_sum{stage="embed"} 3.55' in text
+    assert 'test_latency_seconds_count{stage="embed"} 3' in text
+
+def test_stage_timings_and_endpoint():
+    registry = Registry()
+    histogram = registry.histogram("test_stage_seconds", "Stages", ["stage"])
+    timings = StageTimings(histogram)
+    timings.add("extract_page", 0.2)
+    timings.add("extract_page", 0.4)
+    with timings.time("upsert_batch"):
+        pass
+
+    summary = timings.summary()
+    assert summary["extract_page"] == {"count": 2, "seconds": 0.6, "max": 0.4}
+    assert summary["upsert_batch"]["count"] == 1
+    assert histogram.count(stage="extract_page") == 2
+
+    server = serve(0, host="127.0.0.1", registry=registry, log=lambda msg: None)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            assert 'test_stage_seconds_count{stage="extract_page"} 2' in resp.read().decode()
+    finally:
+        server.shutdown()
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.notify import ChangeSignal
+
+def test_notify_from_another_thread_wakes_the_waiter():
+    signal = ChangeSignal()
+
+    async def wait():
+        version = signal.version
+        threading.Timer(0.05, signal.notify).start()  # e.g. a sync endpoint in the threadpool
+        started = time.monotonic()
+        woke = await signal.wait(version, 5)
+        return woke, time.monotonic() - started
+
+    woke, waited = asyncio.run(wait())
+    assert woke and waited < 1
+
+def test_wait_times_out_and_sees_earlier_changes():
+    signal = ChangeSignal()
+
+    async def wait():
+        version = signal.version
+        timed_out = await signal.wait(version, 0.05)
+        signal.notify()
+        # Changed between reading the version and waiting: returns at once
+        return timed_out, await signal.wait(version, 5)
+
+    assert asyncio.run(wait()) == (False, True)
+    assert signal._waiters == set()
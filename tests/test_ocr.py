@@ -0,0 +1,73 @@
+import sys
+import os
+import types
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core import ocr
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, image, cls=True):
+        self.calls += 1
+        if image == "broken.png":
+            raise RuntimeError("bad image")
+        return [[(None, ("Merhaba", 0.9)), (None, ("dünya", 0.7))]]
+
+def test_ocr_page_reuses_engine_and_reports_pages(monkeypatch):
+    engine = FakeEngine()
+    monkeypatch.setitem(ocr._engines, "tr", engine)
+    logs = []
+
+    results = [ocr.ocr_page(n, image, "tr", log=logs.append) for n, image in [(1, "a.png"), (2, "b.png")]]
+
+    assert engine.calls == 2
+    assert [r["page"] for r in results] == [1, 2]
+    assert results[0]["text"] == "Merhaba\ndünya"
+    assert abs(results[0]["confidence"] - 0.8) < 1e-6
+    assert results[0]["engine"] == "paddle" and results[0]["seconds"] >= 0
+    assert len(logs) == 2 and "confidence 0.80" in logs[0]
+
+def test_ocr_fallback_reason_is_reported(monkeypatch):
+    monkeypatch.setitem(ocr._engines, "tr", FakeEngine())
+    monkeypatch.setattr(ocr, "_tesseract", lambda image, lang: ("fallback text", None))
+    logs = []
+
+    result = ocr.ocr_page(3, "broken.png", "tr", log=logs.append)
+
+    assert result["engine"] == "tesseract" and result["text"] == "fallback text"
+    assert "bad image" in result["fallback"] and "bad image" in logs[0]
+
+def test_tesseract_reads_each_image_once(monkeypatch):
+    calls = []
+
+    def image_to_data(image, lang, output_type):
+        calls.append(lang)
+        return {"text": ["", "Fatura", "no:", "12", "Toplam", "  ", "Not"],
+                "conf": ["-1", "90", "80", "70", "60", "-1", "40"],
+                "block_num": [1, 1, 1, 1, 1, 1, 2], "par_num": [1, 1, 1, 1, 1, 1, 1],
+                "line_num": [0, 1, 1, 1, 2, 2, 1]}
+
+    def image_to_string(*args, **kwargs):
+        raise AssertionError("the image must not be OCR'd a second time")
+
+    fake = types.SimpleNamespace(image_to_data=image_to_data, image_to_string=image_to_string,
+                                 Output=types.SimpleNamespace(DICT="dict"))
+    monkeypatch.setitem(sys.modules, "pytesseract", fake)
+
+    text, confidence = ocr._tesseract(object(), "tr")
+    assert text == "Fatura no: 12\nToplam\n\nNot"
+    assert abs(confidence - 0.68) < 1e-6
+    assert calls == ["tur"]
+
+def test_page_triage():
+    text = "A born-digital page with a proper text layer. " * 3
+    assert not ocr.needs_ocr(text, 100.0, [])
+    assert ocr.needs_ocr("", 100.0, [])
+    assert ocr.needs_ocr("  page 3 ", 100.0, [])
+    # Mostly covered by an embedded scan
+    assert ocr.needs_ocr(text, 100.0, [30.0, 40.0])
+    assert not ocr.needs_ocr(text, 100.0, [10.0])
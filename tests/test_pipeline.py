@@ -0,0 +1,112 @@
+import sys
+import os
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+import pytest
+
+from core.pipeline import IngestPipeline, PipelineCancelled
+
+def fake_extract(item):
+    db_name, text, filename = item
+    if filename == "broken.pdf":
+        raise ValueError("corrupt file")
+    return text
+
+def fake_chunk(item, parts):
+    words = " ".join(parts).split()
+    for i in range(0, len(words), 2):
+        yield [{"text": w} for w in words[i:i+2]]
+
+def test_pipeline_stages_and_errors():
+    upserted = []
+    lock = threading.Lock()
+
+    def embed(item, batch):
+        return [{"id": c["text"], "values": [float(len(c["text"]))]} for c in batch]
+
+    def upsert(item, vectors):
+        if item[-1] == "bad_upsert.txt":
+            raise RuntimeError("index down")
+        with lock:
+            upserted.extend(v["id"] for v in vectors)
+
+    items = [
+        ("db", "one two three four five", "a.txt"),
+        ("db", "six seven", "b.txt"),
+        ("db", "", "empty.txt"),
+        ("db", "x", "broken.pdf"),
+        ("db", "y z", "bad_upsert.txt"),
+    ]
+    pipeline = IngestPipeline(fake_extract, fake_chunk, embed, upsert,
+                              extract_workers=2, embed_workers=3, upsert_workers=2, queue_size=1)
+    stats = pipeline.run(items)
+
+    assert sorted(upserted) == sorted("one two three four five six seven".split())
+    assert stats["a.txt"] == {"status": "ok", "chunks": 5, "vectors": 5}
+    assert stats["empty.txt"]["status"] == "empty"
+    assert stats["broken.pdf"]["status"] == "failed" and "corrupt file" in stats["broken.pdf"]["error"]
+    assert stats["bad_upsert.txt"]["status"] == "failed"
+
+def test_pipeline_inline_extraction():
+    stats = IngestPipeline(fake_extract, fake_chunk, lambda item, b: b, lambda item, v: None,
+                           extract_workers=0).run([("db", "a b c", "a.txt")])
+    assert stats["a.txt"]["vectors"] == 3
+
+def extract_unless_bad(item):
+    if item[1] == "bad":
+        raise ValueError("corrupt file")
+    return item[1]
+
+def test_pipeline_keeps_files_with_the_same_name_apart():
+    # Same filename from two folders: one fails, the other still counts as ok
+    items = [("db", "bad", "report.pdf"), ("db", "a b c", "report.pdf"), ("db", "d", "a.txt")]
+    for workers in (0, 2):
+        stats = IngestPipeline(extract_unless_bad, fake_chunk, lambda item, b: b, lambda item, v: None,
+                               extract_workers=workers).run(items)
+        assert list(stats) == ["report.pdf", "report.pdf (2)", "a.txt"]
+        assert stats["report.pdf"]["status"] == "failed"
+        assert stats["report.pdf (2)"] == {"status": "ok", "chunks": 3, "vectors": 3}
+        assert stats["a.txt"]["vectors"] == 1
+
+def split_words(item):
+    # One extraction task per word, like page ranges of a PDF
+    db_name, text, filename = item
+    return [(db_name, w, filename) for w in text.split()]
+
+def test_pipeline_split_keeps_task_order():
+    seen = []
+
+    def chunk(item, parts):
+        words = list(parts)
+        seen.append(words)
+        yield [{"text": w} for w in words]
+
+    items = [("db", " ".join(str(i) for i in range(40)), "long.txt"), ("db", "x", "broken.pdf"), ("db", "a b", "b.txt")]
+    stats = IngestPipeline(fake_extract, chunk, lambda item, b: b, lambda item, v: None, split_fn=split_words,
+                           extract_workers=2, queue_size=2).run(items)
+
+    assert seen[0] == [str(i) for i in range(40)]
+    assert stats["long.txt"]["vectors"] == 40
+    assert stats["broken.pdf"]["status"] == "failed" and stats["broken.pdf"]["error"].startswith("extract")
+    assert stats["b.txt"]["vectors"] == 2
+
+def test_pipeline_cancel_stops_embedding_and_upserts():
+    cancel = threading.Event()
+    embedded, upserted = [], []
+
+    def embed(item, batch):
+        embedded.append(item[-1])
+        if item[-1] == "b.txt":
+            cancel.set()  # e.g. the lease is lost while b.txt is being embedded
+        return batch
+
+    items = [("db", " ".join(str(i) for i in range(20)), name) for name in ("a.txt", "b.txt", "c.txt", "d.txt")]
+    pipeline = IngestPipeline(fake_extract, fake_chunk, embed, lambda item, v: upserted.append(item[-1]),
+                              split_fn=split_words, extract_workers=2, embed_workers=1, queue_size=1, cancel=cancel)
+    with pytest.raises(PipelineCancelled):
+        pipeline.run(items)
+    assert "c.txt" not in embedded and "d.txt" not in embedded
+    assert "c.txt" not in upserted and "d.txt" not in upserted
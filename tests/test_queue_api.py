@@ -0,0 +1,141 @@
+import sys
+import os
+import time
+import json
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException, Request, Response
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from api import queue
+from api.queue import add_job, claim_job, get_queue, job_events, update_job, ClaimRequest, JobCreate
+from core.db_registry import DatabaseRegistry
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setattr(queue, "QUEUE_DB_PATH", str(tmp_path / "queue.sqlite3"))
+    monkeypatch.setattr(queue, "QUEUE_FILE", str(tmp_path / "queue.json"))
+    monkeypatch.setattr(queue, "_store", None)
+    registry = DatabaseRegistry(str(tmp_path / "dbs.sqlite3"))
+    monkeypatch.setattr(queue, "get_db_registry", lambda: registry)
+    return queue
+
+def timed_claim(worker_id, wait, lease_seconds=60):
+    async def claim():
+        started = time.monotonic()
+        job = await claim_job(ClaimRequest(worker_id=worker_id, lease_seconds=lease_seconds), wait=wait)
+        return job, time.monotonic() - started
+    return asyncio.run(claim())
+
+def test_long_poll_claim_returns_when_a_job_is_added(api):
+    threading.Timer(0.2, add_job, args=(JobCreate(db="db", files=["a.txt"]),)).start()
+    job, waited = timed_claim("w1", wait=10)
+    assert job["files"] == ["a.txt"] and job["lease_owner"] == "w1"
+    assert waited < 2
+
+def test_long_poll_claim_gets_a_job_whose_lease_expired(api):
+    add_job(JobCreate(db="db", files=["a.txt"]))
+    first, _ = timed_claim("w1", wait=0, lease_seconds=1)
+    # w1 stops renewing; w2 is already waiting and gets the job when the lease runs out
+    job, waited = timed_claim("w2", wait=10)
+    assert job["id"] == first["id"] and job["lease_owner"] == "w2" and job["attempts"] == 2
+    assert waited < 3
+
+def test_empty_long_poll_times_out(api):
+    response, waited = timed_claim("w1", wait=0.2)
+    assert response.status_code == 204 and waited >= 0.2
+
+def make_request(headers=None, path="/api/queue/"):
+    async def receive():
+        await asyncio.Event().wait()  # the client never disconnects
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": path, "headers": raw, "query_string": b""}, receive)
+
+def list_jobs(headers=None, **params):
+    response = Response()
+    params = {"status": None, "db": None, "limit": queue.DEFAULT_PAGE_SIZE, "cursor": None, "since": None,
+              "order": "asc", **params}
+    return get_queue(make_request(headers), response, **params), response
+
+def test_unchanged_listing_is_a_304(api):
+    add_job(JobCreate(db="db", files=["a.txt"]))
+    body, response = list_jobs()
+    etag = response.headers["etag"]
+    assert len(body["jobs"]) == 1
+
+    not_modified, _ = list_jobs({"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+    # Other parameters or a new change give another ETag
+    _, other = list_jobs(status="pending")
+    assert other.headers["etag"] != etag
+    add_job(JobCreate(db="db", files=["b.txt"]))
+    body, response = list_jobs({"If-None-Match": etag})
+    assert len(body["jobs"]) == 2 and response.headers["etag"] != etag
+
+def test_cursor_pages_and_invalid_cursor(api):
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        add_job(JobCreate(db="db", files=[name]))
+    first, _ = list_jobs(limit=2)
+    second, _ = list_jobs(limit=2, cursor=first["next_cursor"])
+    assert [j["files"][0] for j in first["jobs"] + second["jobs"]] == ["a.txt", "b.txt", "c.txt"]
+    assert second["next_cursor"] is None
+
+    with pytest.raises(HTTPException) as e:
+        list_jobs(cursor="not-a-cursor")
+    assert e.value.status_code == 400
+
+def test_since_returns_only_later_changes(api):
+    job = add_job(JobCreate(db="db", files=["a.txt"]))
+    body, _ = list_jobs()
+    seq = body["seq"]
+    unchanged, _ = list_jobs(since=seq)
+    assert unchanged["jobs"] == [] and unchanged["seq"] == seq and not unchanged["has_more"]
+
+    add_job(JobCreate(db="db", files=["b.txt"]))
+    update_job(job.id, "completed")
+    changes, _ = list_jobs(since=seq)
+    assert [j["files"][0] for j in changes["jobs"]] == ["b.txt", "a.txt"]  # change order
+    assert changes["seq"] == changes["jobs"][-1]["seq"] > seq
+
+    # A full page reports its last seq so the next poll continues from there
+    page, _ = list_jobs(since=seq, limit=1)
+    assert page["has_more"] and page["seq"] == page["jobs"][0]["seq"]
+    rest, _ = list_jobs(since=page["seq"], limit=1)
+    assert rest["jobs"][0]["files"] == ["a.txt"]
+
+def read_events(headers=None, since=None, count=1):
+    """The first `count` job events of /events as (id, job)."""
+    async def run():
+        response = await job_events(make_request(headers, "/api/queue/events"), since=since)
+        stream = response.body_iterator
+        events = []
+        try:
+            while len(events) < count:
+                chunk = await asyncio.wait_for(stream.__anext__(), 5)
+                if chunk.startswith("id: "):
+                    lines = chunk.strip().split("\n")
+                    events.append((int(lines[0][4:]), json.loads(lines[2][6:])))
+        finally:
+            await stream.aclose()
+        return events
+    return asyncio.run(run())
+
+def test_events_resume_from_last_event_id(api):
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        add_job(JobCreate(db="db", files=[name]))
+    events = read_events(since=0, count=3)
+    assert [job["files"][0] for _, job in events] == ["a.txt", "b.txt", "c.txt"]
+
+    # A reconnecting EventSource sends the id of the last event it saw
+    resumed = read_events({"Last-Event-ID": str(events[0][0])}, count=2)
+    assert [job["files"][0] for _, job in resumed] == ["b.txt", "c.txt"]
+    assert [seq for seq, _ in resumed] == [seq for seq, _ in events[1:]]
+
+    # Without since/Last-Event-ID only new changes are streamed
+    threading.Timer(0.2, add_job, args=(JobCreate(db="db", files=["d.txt"]),)).start()
+    [(_, job)] = read_events(count=1)
+    assert job["files"] == ["d.txt"]
@@ -0,0 +1,121 @@
+import sys
+import os
+import json
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.queue_store import QueueStore, LeaseError
+
+def make_job(job_id, status="pending", db="TestDB", created_at="2024-01-01T00:00:00"):
+    return {"id": job_id, "db": db, "files": ["a.pdf"], "status": status, "created_at": created_at}
+
+def test_add_update_and_filter(tmp_path):
+    store = QueueStore(str(tmp_path / "queue.sqlite3"))
+    store.add_job(make_job("j1"))
+    store.add_job(make_job("j2", db="OtherDB"))
+
+    assert [j["id"] for j in store.list_jobs(status="pending")] == ["j1", "j2"]
+    assert [j["id"] for j in store.list_jobs(db="OtherDB")] == ["j2"]
+
+    job = store.update_job("j1", "completed", {"chunks": 3})
+    assert job["status"] == "completed"
+    assert job["result"] == {"chunks": 3}
+    assert job["files"] == ["a.pdf"]
+
+    # Result is kept when a later update has none
+    job = store.update_job("j1", "completed")
+    assert job["result"] == {"chunks": 3}
+
+    assert store.update_job("missing", "failed") is None
+
+def test_upsert_keeps_the_whole_job(tmp_path):
+    store = QueueStore(str(tmp_path / "queue.sqlite3"))
+    store.add_job(dict(make_job("j1"), ocr_lang="tur", file_refs=[{"name": "a.pdf", "sha256": "abc"}]))
+    job = store.claim_job("w1", lease_seconds=60, max_attempts=3)
+
+    # Saving a job read from the queue (api.queue.save_queue) keeps its lease, OCR language and file refs,
+    # also when the row has to be inserted
+    other = QueueStore(str(tmp_path / "other.sqlite3"))
+    for target in (store, other):
+        assert target.upsert_jobs([job]) == 1
+        saved = target.get_job("j1")
+        for key in ("attempts", "lease_owner", "lease_expires_at", "ocr_lang", "file_refs"):
+            assert saved[key] == job[key]
+        assert target.heartbeat("j1", "w1", 60) is not None
+
+def test_archive_and_migrate(tmp_path):
+    legacy = tmp_path / "queue_db.json"
+    legacy.write_text(json.dumps([
+        make_job("old", status="completed", created_at="2020-01-01T00:00:00"),
+        make_job("new", status="completed", created_at="2099-01-01T00:00:00"),
+        make_job("busy", status="processing", created_at="2020-01-01T00:00:00"),
+    ]))
+
+    store = QueueStore(str(tmp_path / "queue.sqlite3"))
+    assert store.import_json(str(legacy)) == 3
+    assert not legacy.exists()
+
+    assert store.archive_jobs("2024-01-01T00:00:00") == 1
+    assert sorted(j["id"] for j in store.list_jobs()) == ["busy", "new"]
+    store.compact()
+    assert store.count_jobs() == 2
+
+def test_claim_lease_and_requeue(tmp_path):
+    requeues = []
+    store = QueueStore(str(tmp_path / "queue.sqlite3"), on_pending=lambda: requeues.append(1))
+    store.add_job(make_job("j1"))
+    assert store.next_lease_expiry() is None
+
+    job = store.claim_job("w1", lease_seconds=60, max_attempts=2)
+    assert job["lease_expires_at"] == store.next_lease_expiry()
+    assert job["id"] == "j1" and job["lease_owner"] == "w1" and job["attempts"] == 1
+    # Nothing left for a second worker
+    assert store.claim_job("w2", lease_seconds=60, max_attempts=2) is None
+
+    assert store.heartbeat("j1", "w1", 60) is not None
+    assert store.heartbeat("j1", "w2", 60) is None
+
+    # Expired lease goes back to pending and is claimed again
+    store.heartbeat("j1", "w1", -1)
+    job = store.claim_job("w2", lease_seconds=60, max_attempts=2)
+    assert job["lease_owner"] == "w2" and job["attempts"] == 2
+    assert requeues == [1]  # long-polling workers are woken up
+
+    # The old owner can no longer complete it
+    try:
+        store.update_job("j1", "completed", worker_id="w1")
+        assert False, "expected LeaseError"
+    except LeaseError:
+        pass
+
+    # Second expiry exceeds max_attempts and fails the job
+    store.heartbeat("j1", "w2", -1)
+    assert store.requeue_expired(max_attempts=2) == 1
+    job = store.get_job("j1")
+    assert job["status"] == "failed" and job["lease_owner"] is None
+
+def test_change_feed_and_pages(tmp_path):
+    changes = []
+    store = QueueStore(str(tmp_path / "queue.sqlite3"), on_change=lambda: changes.append(1))
+    for i in range(5):
+        store.add_job(make_job(f"j{i}", created_at=f"2024-01-0{i + 1}T00:00:00"))
+    seq = store.current_seq()
+    assert seq == 5 and len(changes) == 5
+
+    # Keyset pages, both directions
+    first = store.list_page(limit=2)
+    second = store.list_page(limit=2, after=(first[-1]["created_at"], first[-1]["id"]))
+    assert [j["id"] for j in first + second] == ["j0", "j1", "j2", "j3"]
+    assert [j["id"] for j in store.list_page(limit=2, descending=True)] == ["j4", "j3"]
+
+    # Only changed jobs after the cursor, in change order; lease renewals are no changes
+    store.update_job("j3", "completed")
+    job = store.claim_job("w1", 60, 3)
+    store.heartbeat(job["id"], "w1", 60)
+    assert [j["id"] for j in store.list_changes(seq)] == ["j3", "j0"]
+    assert [j["id"] for j in store.list_changes(seq, status="completed")] == ["j3"]
+    assert store.current_seq() == 7
+
+    # Reopening a store keeps the sequence
+    assert QueueStore(str(tmp_path / "queue.sqlite3")).current_seq() == 7
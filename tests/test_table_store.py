@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.table_store import TableStore, split_header
+import worker_local
+
+PRICES = [["Ürün", "Adet", "Fiyat"]] + [[f"Kalem {i}", str(i), f"{i * 2.5:.2f}"] for i in range(1, 46)]
+
+def test_tables_are_stored_by_column_and_paged(tmp_path):
+    store = TableStore(str(tmp_path / "tables.sqlite3"))
+    stored = store.replace_source("db", "rapor.pdf", [
+        {"page": 3, "rows": PRICES},
+        {"page": 3, "rows": [["1", "2"], ["3"]]},  # numeric first row: no header, short rows padded
+        {"page": 4, "rows": [["Sadece başlık"]]},  # no data rows: skipped
+    ])
+    assert [t["id"] for t in stored] == ["db_rapor.pdf_p3_t1", "db_rapor.pdf_p3_t2"]
+    assert split_header([["1", "2"], ["3"]]) == (["col1", "col2"], [["1", "2"], ["3", ""]])
+
+    first = store.list("db", limit=1)
+    assert first[0]["header"] == ["Ürün", "Adet", "Fiyat"] and first[0]["n_rows"] == 45
+    rest = store.list("db", after=("rapor.pdf", 3, 1))
+    assert [t["table_no"] for t in rest] == [2]
+
+    page = store.rows("db_rapor.pdf_p3_t1", offset=40, limit=10)
+    assert page["rows"] == [[f"Kalem {i}", str(i), f"{i * 2.5:.2f}"] for i in range(41, 46)]
+
+    # Re-ingesting the file replaces its tables
+    store.replace_source("db", "rapor.pdf", [{"page": 1, "rows": PRICES[:3]}])
+    assert [t["id"] for t in store.list("db")] == ["db_rapor.pdf_p1_t1"]
+    assert store.delete_db("db") == 1 and store.count() == 0
+
+def test_table_rows_become_row_group_chunks(tmp_path, monkeypatch):
+    store = TableStore(str(tmp_path / "tables.sqlite3"))
+    monkeypatch.setattr(worker_local, "get_table_store", lambda: store)
+    monkeypatch.setattr(worker_local, "TABLE_ROWS_PER_CHUNK", 20)
+    monkeypatch.setattr(worker_local, "clear_source", lambda db_name, filename: None)
+    parts = [{"pages": [(1, "Fiyat listesi aşağıdadır.")], "timings": [], "tables": []},
+             {"pages": [(2, "")], "timings": [], "tables": [{"page": 2, "rows": PRICES}]}]
+
+    batches = list(worker_local.chunk_text(("db", "/tmp/rapor.pdf", "rapor.pdf"), iter(parts)))
+    chunks = [c for batch in batches for c in batch]
+    assert [c["id"] for c in chunks] == [f"db_rapor.pdf_{i}" for i in range(len(chunks))]
+    table_chunks = [c for c in chunks if c["text"].startswith("Tablo")]
+    assert all(c["metadata"]["page"] == 2 for c in table_chunks)
+    assert sum(c["text"].count("Ürün: ") for c in table_chunks) == 45
+    assert "Ürün: Kalem 7; Adet: 7; Fiyat: 17.50" in table_chunks[0]["text"]
+    assert store.count("db") == 1
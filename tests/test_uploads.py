@@ -0,0 +1,55 @@
+import sys
+import os
+import io
+import hashlib
+import pytest
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.uploads import FileRegistry, MultipartUploads, UploadError, hash_fileobj
+
+def test_file_registry_detects_duplicates(tmp_path):
+    registry = FileRegistry(str(tmp_path / "files.sqlite3"))
+    digest = hash_fileobj(io.BytesIO(b"hello"))
+    assert digest == {"sha256": hashlib.sha256(b"hello").hexdigest(), "size": 5}
+
+    registry.add("db", digest["sha256"], "a.txt", 5, "drive-1")
+    assert registry.get("db", digest["sha256"])["filename"] == "a.txt"
+    assert registry.get("other", digest["sha256"]) is None
+    # First upload wins
+    assert registry.add("db", digest["sha256"], "b.txt", 5, "drive-2")["storage_id"] == "drive-1"
+
+def test_multipart_upload_resumes_and_streams_in_order(tmp_path):
+    uploads = MultipartUploads(str(tmp_path / "multipart"))
+    data = bytes(range(256)) * 10
+    session = uploads.create("db", "big.bin", len(data), part_size=1000)
+    upload_id = session["upload_id"]
+    assert session["parts_total"] == 3
+
+    uploads.write_part(upload_id, 3, [data[2000:]])
+    uploads.write_part(upload_id, 1, [data[:500], data[500:1000]])
+    assert uploads.missing_parts(upload_id) == [2]
+    with pytest.raises(UploadError):
+        uploads.hash_content(upload_id)
+
+    # An oversized part is rejected as soon as it passes part_size and leaves nothing behind
+    with pytest.raises(UploadError):
+        uploads.write_part(upload_id, 2, [b"x" * 1001])
+    sent = []
+    def endless():
+        while True:
+            sent.append(1)
+            yield b"x" * 300
+    with pytest.raises(UploadError):
+        uploads.write_part(upload_id, 2, endless())
+    assert len(sent) == 4
+    assert uploads.missing_parts(upload_id) == [2]
+
+    uploads.write_part(upload_id, 2, [data[1000:2000]])
+    assert b"".join(uploads.iter_content(upload_id, chunk_size=300)) == data
+    assert uploads.hash_content(upload_id)["sha256"] == hashlib.sha256(data).hexdigest()
+
+    uploads.abort(upload_id)
+    with pytest.raises(UploadError):
+        uploads.get(upload_id)
@@ -0,0 +1,110 @@
+import sys
+import os
+import threading
+
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from core.vector_store import LocalVectorStore
+
+def make_vectors(n, dim, db_name, source, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, dim)).astype(np.float32)
+    return [
+        {"id": f"{db_name}_{source}_{i}", "values": values[i].tolist(),
+         "metadata": {"db_name": db_name, "source": source, "page": i % 3}}
+        for i in range(n)
+    ], values
+
+def test_exact_query_filter_and_delete(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "idx"), dimension=8, ann=False)
+    a, a_values = make_vectors(20, 8, "A", "a.pdf", seed=1)
+    b, _ = make_vectors(20, 8, "B", "b.pdf", seed=2)
+    store.upsert(a)
+    store.upsert(b)
+
+    matches = store.query(a_values[3].tolist(), top_k=3, filter={"db_name": "A"})
+    assert matches[0].id == "A_a.pdf_3"
+    assert abs(matches[0].score - 1.0) < 1e-5
+    assert all(m.metadata["db_name"] == "A" for m in matches)
+    assert store.has_shared_vectors("A") and not store.has_shared_vectors("C")
+
+    # Non-indexed metadata keys are filtered after scoring
+    matches = store.query(a_values[3].tolist(), top_k=5, filter={"db_name": {"$eq": "A"}, "page": 1})
+    assert matches and all(m.metadata["page"] == 1 for m in matches)
+
+    # A second handle on the same directory sees deletes and reuses freed slots
+    reader = LocalVectorStore(str(tmp_path / "idx"), dimension=8, ann=False)
+    assert store.delete_by_source("A", "a.pdf") == 20
+    assert reader.query(a_values[3].tolist(), top_k=3, filter={"db_name": "A"}) == []
+    store.upsert(a[:5])
+    assert reader.count() == 25
+    assert reader.query(a_values[2].tolist(), top_k=1, filter={"db_name": "A"})[0].id == "A_a.pdf_2"
+
+def test_ivf_mode_finds_exact_vectors(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "idx"), dimension=16, ann=True, ann_min_vectors=100, nprobe=4)
+    vectors, values = make_vectors(2000, 16, "A", "big.pdf", seed=3)
+    store.upsert(vectors)
+    hits = sum(
+        store.query(values[i].tolist(), top_k=1, filter={"db_name": "A"})[0].id == f"A_big.pdf_{i}"
+        for i in range(0, 2000, 50)
+    )
+    assert store._ivf is not None
+    assert hits == 40
+
+    # Later upserts only assign the rows they wrote, not the whole index
+    updated = []
+    update = store._ivf.update
+    store._ivf.update = lambda mmap, slots: updated.append(len(slots)) or update(mmap, slots)
+    more, more_values = make_vectors(10, 16, "A", "new.pdf", seed=4)
+    store.upsert(more)
+    store.upsert([{**vectors[7], "values": more_values[0].tolist()}])  # overwritten row
+    assert store.query(more_values[3].tolist(), top_k=1)[0].id == "A_new.pdf_3"
+    assert store.query(more_values[3].tolist(), top_k=1)[0].id == "A_new.pdf_3"
+    assert {m.id for m in store.query(more_values[0].tolist(), top_k=2)} == {"A_new.pdf_0", "A_big.pdf_7"}
+    assert updated == [11]
+
+def test_namespaces_are_isolated_and_dropped_alone(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "idx"), dimension=8, ann=False)
+    a, a_values = make_vectors(10, 8, "A", "a.pdf", seed=1)
+    b, _ = make_vectors(10, 4, "B", "b.pdf", seed=2)
+    store.upsert(a, namespace="A")
+    store.upsert(b, namespace="B")  # each namespace has its own dimension
+
+    # No filter needed: a namespace only holds its own database
+    matches = store.query(a_values[3].tolist(), top_k=3, namespace="A")
+    assert matches[0].id == "A_a.pdf_3" and len(matches) == 3
+    assert store.query(a_values[3].tolist(), top_k=3) == []
+    assert not store.has_shared_vectors("A")
+    assert store.query(a_values[3].tolist(), top_k=3, namespace="missing") == []
+    assert set(store.fetch(["A_a.pdf_1", "B_b.pdf_1"], namespace="B")) == {"B_b.pdf_1"}
+    assert store.count(namespace="A") == 10 and store.count(namespace="B") == 10
+
+    # A second process dropping a namespace is noticed by the first
+    other = LocalVectorStore(str(tmp_path / "idx"), dimension=8, ann=False)
+    other.delete_namespace("A")
+    assert store.count(namespace="A") == 0
+    assert store.query(a_values[3].tolist(), top_k=3, namespace="A") == []
+    assert store.count(namespace="B") == 10
+    store.upsert(a[:2], namespace="A")
+    assert other.count(namespace="A") == 2
+
+def test_pinecone_delete_by_source_skips_files_sharing_the_prefix():
+    from core.vector_store import PineconeVectorStore
+
+    class FakeIndex:
+        ids = ["db_a.pdf_0", "db_a.pdf_1", "db_a.pdf_2_0", "db_a.pdf_x_3"]
+        deleted = []
+
+        def list(self, prefix, namespace):
+            yield [i for i in self.ids if i.startswith(prefix)]
+
+        def delete(self, ids, namespace):
+            self.deleted.extend(ids)
+
+    store = PineconeVectorStore.__new__(PineconeVectorStore)
+    store._index, store._lock = FakeIndex(), threading.Lock()
+    assert store.delete_by_source("db", "a.pdf", namespace="ns") == 2
+    assert FakeIndex.deleted == ["db_a.pdf_0", "db_a.pdf_1"]